@@ -0,0 +1,140 @@
+"""
+Grade analytics for School Management System
+
+school_results takes grade rows for any number of classes as parallel numpy
+columns and computes, for every class at once, each student's credit-weighted
+GPA, average and class rank, plus mean, median, standard deviation and
+percentiles for each subject and for the class GPA. Rows are grouped by
+sorting once and reducing over the group boundaries, so there is no Python
+loop over classes, students or rows until the results are turned into dicts.
+Like report_cards.py, it does not import the app.
+"""
+
+import numpy as np
+from grading import DEFAULT_SCALE
+
+PERCENTILES = (10, 25, 75, 90)
+
+def grade_points(percentages, scale=DEFAULT_SCALE):
+    """Grade points for an array of percentages on a grading.Scale"""
+    band = np.searchsorted(np.asarray(scale.minimums), percentages, side='right') - 1
+    return np.asarray(scale.points)[np.maximum(band, 0)]
+
+def group_starts(*keys):
+    """Indexes where a new group begins in arrays already sorted by keys"""
+    change = np.zeros(len(keys[0]), dtype=bool)
+    change[0] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(change)
+
+def start_of_group(starts, length):
+    """For every element, the index its group starts at"""
+    marks = np.zeros(length, dtype=np.int64)
+    marks[starts] = starts
+    return np.maximum.accumulate(marks)
+
+def grouped_distribution(values, starts):
+    """Statistics of values (sorted ascending within each group) per group, as arrays"""
+    counts = np.diff(np.append(starts, len(values)))
+    group = np.repeat(np.arange(len(starts)), counts)
+    mean = np.add.reduceat(values, starts) / counts
+    std = np.sqrt(np.add.reduceat((values - mean[group]) ** 2, starts) / counts)
+
+    def percentile(q):
+        # Linear interpolation between closest ranks, as numpy.percentile does
+        position = starts + (counts - 1) * q / 100
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        return values[low] + (values[high] - values[low]) * (position - low)
+
+    stats = {'count': counts, 'mean': mean, 'median': percentile(50), 'std': std,
+             'min': values[starts], 'max': values[starts + counts - 1]}
+    for q in PERCENTILES:
+        stats[f'p{q}'] = percentile(q)
+    return stats
+
+def distribution_rows(stats):
+    """Turn grouped_distribution arrays into one dict per group"""
+    columns = {name: (values.tolist() if name == 'count' else np.round(values, 2).tolist())
+               for name, values in stats.items()}
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+def scale_points(class_ids, percentages, scales=None):
+    """Grade points for each percentage on its class's scale, one pass per distinct scale"""
+    points = grade_points(percentages)
+    by_scale = {}
+    for class_id, scale in (scales or {}).items():
+        if scale != DEFAULT_SCALE:
+            by_scale.setdefault(scale, []).append(class_id)
+    for scale, scale_classes in by_scale.items():
+        rows = np.isin(class_ids, scale_classes)
+        points[rows] = grade_points(percentages[rows], scale)
+    return points
+
+def school_results(class_ids, student_ids, subject_ids, credits, percentages, scales=None):
+    """{class id: results} from parallel arrays with one entry per grade row
+
+    A student with several rows for a subject (different exam types) gets the
+    mean of them for that subject. GPA is the credit-weighted mean of the
+    subject grade points and average the credit-weighted mean percentage.
+    Students are ranked within their class by GPA, highest first, and equal
+    GPAs share a rank (1, 2, 2, 4). scales maps class ids to the grading.Scale
+    their grade points come from; other classes use the default scale.
+    """
+    class_ids = np.asarray(class_ids, dtype=np.int64)
+    student_ids = np.asarray(student_ids, dtype=np.int64)
+    subject_ids = np.asarray(subject_ids, dtype=np.int64)
+    credits = np.asarray(credits, dtype=float)
+    percentages = np.asarray(percentages, dtype=float)
+    if not len(student_ids):
+        return {}
+
+    # One mark per (student, subject)
+    order = np.lexsort((subject_ids, student_ids))
+    starts = group_starts(student_ids[order], subject_ids[order])
+    rows_per_pair = np.diff(np.append(starts, len(order)))
+    pair_student = student_ids[order][starts]
+    pair_subject = subject_ids[order][starts]
+    pair_class = class_ids[order][starts]
+    pair_credits = credits[order][starts]
+    pair_percentage = np.add.reduceat(percentages[order], starts) / rows_per_pair
+
+    # Per student; pairs are already sorted by student
+    starts = group_starts(pair_student)
+    student = pair_student[starts]
+    student_class = pair_class[starts]
+    credit_total = np.add.reduceat(pair_credits, starts)
+    gpa = np.add.reduceat(scale_points(pair_class, pair_percentage, scales) * pair_credits, starts) / credit_total
+    average = np.add.reduceat(pair_percentage * pair_credits, starts) / credit_total
+
+    # Rank within each class: sort by class, then GPA descending
+    rounded_gpa = np.round(gpa, 6)
+    order = np.lexsort((student, -rounded_gpa, student_class))
+    classes_sorted = student_class[order]
+    class_starts = group_starts(classes_sorted)
+    tie_starts = group_starts(classes_sorted, rounded_gpa[order])
+    rank = start_of_group(tie_starts, len(order)) - start_of_group(class_starts, len(order)) + 1
+
+    # GPA distribution per class, which needs GPAs ascending within each class
+    ascending = np.lexsort((gpa, student_class))
+    gpa_stats = distribution_rows(grouped_distribution(gpa[ascending], group_starts(student_class[ascending])))
+
+    # Per (class, subject), marks ascending within each group
+    order_subject = np.lexsort((pair_percentage, pair_subject, pair_class))
+    subject_starts = group_starts(pair_class[order_subject], pair_subject[order_subject])
+    subject_stats = distribution_rows(grouped_distribution(pair_percentage[order_subject], subject_starts))
+
+    results = {}
+    class_list = classes_sorted[class_starts].tolist()
+    bounds = np.append(class_starts, len(order)).tolist()
+    columns = zip(student[order].tolist(), np.round(gpa[order], 2).tolist(),
+                  np.round(average[order], 2).tolist(), credit_total[order].tolist(), rank.tolist())
+    rows = [{'student_id': s, 'gpa': g, 'average': a, 'credits': c, 'rank': r} for s, g, a, c, r in columns]
+    for i, class_id in enumerate(class_list):
+        results[class_id] = {'students': rows[bounds[i]:bounds[i + 1]], 'subjects': [], 'gpa': gpa_stats[i]}
+    for class_id, subject_id, stats in zip(pair_class[order_subject][subject_starts].tolist(),
+                                           pair_subject[order_subject][subject_starts].tolist(), subject_stats):
+        stats['subject_id'] = subject_id
+        results[class_id]['subjects'].append(stats)
+    return results
@@ -1,29 +1,151 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_from_directory, g, has_request_context, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Numeric
+from flask_sqlalchemy.session import Session as BaseSession
+from sqlalchemy import Float, Numeric, and_, bindparam, case, cast, delete, event, func, literal, or_, insert, update, select, text, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import aliased, joinedload
+from sqlalchemy.sql import Select
+from contextlib import contextmanager
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, date
+from datetime import datetime, date, timedelta, timezone
+from concurrent.futures import ProcessPoolExecutor
+import base64
+import binascii
+import calendar
+import click
+import csv
+import hashlib
+import io
+import json
+import multiprocessing
 import os
+import secrets
+import tempfile
+import time
+import zipfile
+from decimal import Decimal
 from functools import wraps
+from config import config
+from report_cards import render_report_card
+from analytics import school_results
+from grading import DEFAULT_SCALE, Scale
+from timetable import DAYS, booked, find_clashes, generated_slots, result_rank, search_timetable, timetable_problem
 app = Flask(__name__)
 
-# Production configuration for Railway
-if os.environ.get('DATABASE_URL'):
-    # Production environment (Railway)
-    database_url = os.environ.get('DATABASE_URL')
-    if database_url.startswith('postgres://'):
-        database_url = database_url.replace('postgres://', 'postgresql://', 1)
-    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
-    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'railway-production-key-2024')
-else:
-    # Development environment
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///school.db'
-    app.config['SECRET_KEY'] = 'dev-secret-key'
-
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db = SQLAlchemy(app)
+# Settings and engine profiles come from the config class named by FLASK_CONFIG
+Config = config[os.environ.get('FLASK_CONFIG') or ('production' if os.environ.get('DATABASE_URL') else 'development')]
+
+app.config.from_object(Config)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = Config.engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+if not app.config['SECRET_KEY']:
+    # Sessions then only survive this process, so set SECRET_KEY when running several workers
+    app.logger.warning('SECRET_KEY is not set; using a random key for this process')
+    app.config['SECRET_KEY'] = secrets.token_hex(32)
+
+# Optional read replica for GET requests
+replica_url = Config.DATABASE_REPLICA_URL
+if replica_url:
+    app.config['SQLALCHEMY_BINDS'] = {'replica': {'url': replica_url, **Config.engine_options(replica_url)}}
+
+# Read replica routing
+# With DATABASE_REPLICA_URL set, GET and HEAD requests read from the replica.
+# The first write in a request (a flush or an INSERT/UPDATE/DELETE) moves the
+# rest of that request to the primary, and a commit that wrote keeps the user
+# on the primary for READ_YOUR_WRITES_SECONDS so they see their own changes.
+# The replica is skipped while it is unreachable or more than REPLICA_MAX_LAG
+# seconds behind.
+
+replica_health = {'checked_at': float('-inf'), 'healthy': False}
+
+class RoutingSession(BaseSession):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and 'replica' in self._db.engines:
+            if self._flushing or (clause is not None and not isinstance(clause, Select)):
+                if has_request_context():
+                    g.db_wrote = True
+                self.info['wrote'] = True
+            elif use_replica():
+                return self._db.engines['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def use_replica():
+    if not has_request_context() or request.method not in ('GET', 'HEAD'):
+        return False
+    if g.get('db_wrote') or g.get('db_primary'):
+        return False
+    if session.get('primary_until', 0) > time.time():
+        return False
+    return replica_healthy()
+
+@contextmanager
+def primary_reads():
+    """Send reads inside the block to the primary, e.g. before caching or writing derived data"""
+    previous = g.get('db_primary', False)
+    g.db_primary = True
+    try:
+        yield
+    finally:
+        g.db_primary = previous
+
+def replica_lag():
+    """Seconds the replica is behind the primary, or None if it cannot be reached"""
+    try:
+        with db.engines['replica'].connect() as conn:
+            if conn.dialect.name != 'postgresql':
+                conn.execute(text('SELECT 1'))
+                return 0.0
+            return float(conn.execute(text(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+            )).scalar())
+    except SQLAlchemyError:
+        return None
+
+def replica_healthy():
+    now = time.monotonic()
+    if now - replica_health['checked_at'] >= app.config['REPLICA_CHECK_INTERVAL']:
+        lag = replica_lag()
+        replica_health['healthy'] = lag is not None and lag <= app.config['REPLICA_MAX_LAG']
+        replica_health['checked_at'] = now
+    return replica_health['healthy']
+
+def mark_replica_down(context):
+    # A failing replica query fails its own request; later ones go to the primary
+    replica_health.update(healthy=False, checked_at=time.monotonic())
+
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+
+@event.listens_for(RoutingSession, 'after_commit')
+def start_read_your_writes_window(db_session):
+    if db_session.info.pop('wrote', False) and has_request_context():
+        session['primary_until'] = time.time() + app.config['READ_YOUR_WRITES_SECONDS']
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def forget_rolled_back_writes(db_session):
+    db_session.info.pop('wrote', None)
+
+def sqlite_pragma_listener(pragmas):
+    # WAL lets readers run alongside the single writer, and busy_timeout makes
+    # concurrent writers from other workers wait instead of failing with
+    # "database is locked"
+    def apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+    return apply_sqlite_pragmas
+
+with app.app_context():
+    SQLITE_PRAGMAS = Config.sqlite_pragmas(app.config['SQLALCHEMY_DATABASE_URI'])
+    if SQLITE_PRAGMAS:
+        event.listen(db.engine, 'connect', sqlite_pragma_listener(SQLITE_PRAGMAS))
+    if replica_url:
+        replica_pragmas = Config.sqlite_pragmas(replica_url)
+        if replica_pragmas:
+            event.listen(db.engines['replica'], 'connect', sqlite_pragma_listener(dict(replica_pragmas, query_only=1)))
+        event.listen(db.engines['replica'], 'handle_error', mark_replica_down)
+
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -62,6 +184,12 @@ class Student(db.Model):
     parent = db.relationship('User', foreign_keys=[parent_id], backref='children')
     school_class = db.relationship('SchoolClass', backref='students')
 
+    __table_args__ = (
+        db.Index('ix_student_user_id', 'user_id'),
+        db.Index('ix_student_class_id', 'class_id'),
+        db.Index('ix_student_parent_id', 'parent_id'),
+    )
+
 class Teacher(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -77,6 +205,10 @@ class Teacher(db.Model):
     
     user = db.relationship('User', backref='teacher_profile')
 
+    __table_args__ = (
+        db.Index('ix_teacher_user_id', 'user_id'),
+    )
+
 class SchoolClass(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
@@ -106,6 +238,11 @@ class TeacherSubject(db.Model):
     subject = db.relationship('Subject', backref='teacher_assignments')
     school_class = db.relationship('SchoolClass', backref='subject_assignments')
 
+    __table_args__ = (
+        db.Index('ix_teacher_subject_teacher_id', 'teacher_id'),
+        db.Index('ix_teacher_subject_class_id', 'class_id'),
+    )
+
 class Attendance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
@@ -121,6 +258,44 @@ class Attendance(db.Model):
     subject = db.relationship('Subject', backref='attendance_records')
     teacher = db.relationship('Teacher', backref='attendance_marked')
 
+    __table_args__ = (
+        db.Index('uq_attendance_student_date_subject', 'student_id', 'date', 'subject_id', unique=True),
+        # Daily attendance has no subject, and the index above treats every NULL as distinct
+        db.Index('uq_attendance_student_date_daily', 'student_id', 'date', unique=True,
+                 postgresql_where=text('subject_id IS NULL'),
+                 sqlite_where=text('subject_id IS NULL')).ddl_if(dialect=('postgresql', 'sqlite')),
+        db.Index('ix_attendance_subject_date', 'subject_id', 'date'),
+    )
+
+class StudentAttendanceDaily(db.Model):
+    """One student's attendance records for a day, counted by status"""
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    class_id = db.Column(db.Integer, db.ForeignKey('school_class.id'))  # the student's class when marked
+    present = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    late = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('uq_student_attendance_daily', 'student_id', 'date', unique=True),
+        db.Index('ix_student_attendance_daily_class_date', 'class_id', 'date'),
+    )
+
+class ClassAttendanceDaily(db.Model):
+    """A class's attendance records for a day, counted by status"""
+    id = db.Column(db.Integer, primary_key=True)
+    class_id = db.Column(db.Integer, db.ForeignKey('school_class.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    late = db.Column(db.Integer, nullable=False, default=0)
+    students = db.Column(db.Integer, nullable=False, default=0)  # students with a record that day
+
+    __table_args__ = (
+        db.Index('uq_class_attendance_daily', 'class_id', 'date', unique=True),
+    )
+
 class Grade(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
@@ -128,14 +303,44 @@ class Grade(db.Model):
     exam_type = db.Column(db.String(50), nullable=False)  # midterm, final, quiz, assignment
     marks_obtained = db.Column(Numeric(5, 2), nullable=False)
     total_marks = db.Column(Numeric(5, 2), nullable=False)
+    percentage = db.Column(Numeric(5, 2))
     grade_letter = db.Column(db.String(5))
     exam_date = db.Column(db.Date, nullable=False)
     teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id'))
+    # The year of the student's class when the grade was written, so each year keeps its own midterm
+    academic_year = db.Column(db.String(10), nullable=False, default=lambda: app.config['CURRENT_ACADEMIC_YEAR'])
     
     student = db.relationship('Student', backref='grades')
     subject = db.relationship('Subject', backref='grades')
     teacher = db.relationship('Teacher', backref='grades_assigned')
 
+    __table_args__ = (
+        db.Index('uq_grade_student_subject_exam_year', 'student_id', 'subject_id', 'exam_type', 'academic_year',
+                 unique=True),
+    )
+
+class GradingScale(db.Model):
+    """Letter grade bands for an academic year, a grade level, both, or the whole school (neither)"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    academic_year = db.Column(db.String(10))
+    grade_level = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    bands = db.relationship('GradingScaleBand', backref='scale', cascade='all, delete-orphan',
+                            order_by='GradingScaleBand.min_percentage.desc()')
+
+class GradingScaleBand(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    scale_id = db.Column(db.Integer, db.ForeignKey('grading_scale.id'), nullable=False)
+    min_percentage = db.Column(Numeric(5, 2), nullable=False)
+    letter = db.Column(db.String(5), nullable=False)
+    grade_points = db.Column(Numeric(3, 2), nullable=False)
+
+    __table_args__ = (
+        db.Index('uq_grading_scale_band_min', 'scale_id', 'min_percentage', unique=True),
+    )
+
 class Fee(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
@@ -146,9 +351,38 @@ class Fee(db.Model):
     payment_date = db.Column(db.Date)
     payment_method = db.Column(db.String(50))
     academic_year = db.Column(db.String(10), nullable=False)
+    receipt_number = db.Column(db.String(20))  # set once the receipt is stored
     
     student = db.relationship('Student', backref='fees')
 
+    __table_args__ = (
+        db.Index('uq_fee_receipt_number', 'receipt_number', unique=True),
+        db.Index('ix_fee_status', 'status'),
+        db.Index('ix_fee_student_id', 'student_id'),
+        db.Index('ix_fee_student_type_due', 'student_id', 'fee_type', 'due_date'),
+    )
+
+class FeePlan(db.Model):
+    """A named set of fees (each instalment one item) billed together for a year"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    academic_year = db.Column(db.String(10), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    items = db.relationship('FeePlanItem', backref='plan', cascade='all, delete-orphan',
+                            order_by='[FeePlanItem.due_date, FeePlanItem.fee_type]')
+
+class FeePlanItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    plan_id = db.Column(db.Integer, db.ForeignKey('fee_plan.id'), nullable=False)
+    fee_type = db.Column(db.String(50), nullable=False)
+    amount = db.Column(Numeric(10, 2), nullable=False)
+    due_date = db.Column(db.Date, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_fee_plan_item_plan_id', 'plan_id'),
+    )
+
 class Book(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -175,6 +409,16 @@ class BookIssue(db.Model):
     book = db.relationship('Book', backref='issues')
     student = db.relationship('Student', backref='book_issues')
 
+    __table_args__ = (
+        db.Index('ix_book_issue_status_due_date', 'status', 'due_date'),
+        db.Index('ix_book_issue_student_id', 'student_id'),
+    )
+
+# Books still out are 'issued' until the nightly job (scheduler.py) marks them
+# 'overdue'; likewise fees go from 'pending' to 'overdue'
+OPEN_ISSUE_STATUSES = ('issued', 'overdue')
+UNPAID_FEE_STATUSES = ('pending', 'overdue')
+
 class Timetable(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     class_id = db.Column(db.Integer, db.ForeignKey('school_class.id'), nullable=False)
@@ -189,9 +433,93 @@ class Timetable(db.Model):
     subject = db.relationship('Subject', backref='timetable')
     teacher = db.relationship('Teacher', backref='timetable')
 
+    __table_args__ = (
+        db.Index('ix_timetable_class_id', 'class_id'),
+        db.Index('ix_timetable_class_day', 'class_id', 'day_of_week', 'start_time'),
+        db.Index('ix_timetable_teacher_day', 'teacher_id', 'day_of_week', 'start_time'),
+        db.Index('ix_timetable_room_day', 'room_number', 'day_of_week', 'start_time'),
+    )
+
+class ReportRemark(db.Model):
+    """The class teacher's remarks on a student's report card for a year"""
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False)
+    academic_year = db.Column(db.String(10), nullable=False)
+    remarks = db.Column(db.Text, nullable=False)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id'))
+    updated_at = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('uq_report_remark_student_year', 'student_id', 'academic_year', unique=True),
+    )
+
+class DashboardStat(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    reconciled_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime)  # last time the value changed
+
+# Logged-in identity cache
+# load_user runs on every request. The user and their role profile are cached
+# per user for IDENTITY_CACHE_TTL seconds as a plain SessionUser, which saves
+# the User lookup and the Student/Teacher lookup most routes start with. Routes
+# that change a user or profile call invalidate_identity(); other worker
+# processes pick the change up when the TTL runs out.
+
+IDENTITY_CACHE_SIZE = 10000
+identity_cache = {}
+
+class SessionUser(UserMixin):
+    """Snapshot of a user and their role profile, safe to reuse across requests"""
+
+    def __init__(self, user, student=None, teacher=None):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.role = user.role
+        self.first_name = user.first_name
+        self.last_name = user.last_name
+        self.active = user.is_active
+        self.student_profile_id = student.id if student else None
+        self.class_id = student.class_id if student else None
+        self.teacher_profile_id = teacher.id if teacher else None
+
+    @property
+    def is_active(self):
+        return self.active
+
+def load_identity(user_id):
+    # Read from the primary so a lagging replica cannot put a stale profile in the cache
+    with primary_reads():
+        user = db.session.get(User, user_id)
+        if not user:
+            return None
+        if user.role == 'student':
+            return SessionUser(user, student=Student.query.filter_by(user_id=user.id).first())
+        if user.role == 'teacher':
+            return SessionUser(user, teacher=Teacher.query.filter_by(user_id=user.id).first())
+        return SessionUser(user)
+
+def invalidate_identity(*user_ids):
+    for user_id in user_ids:
+        if user_id is not None:
+            identity_cache.pop(int(user_id), None)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    now = time.monotonic()
+    cached = identity_cache.get(user_id)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    identity = load_identity(user_id)
+    if identity:
+        if len(identity_cache) >= IDENTITY_CACHE_SIZE:
+            for key in [key for key, (expires, _) in identity_cache.items() if expires <= now]:
+                del identity_cache[key]
+        identity_cache[user_id] = (now + app.config['IDENTITY_CACHE_TTL'], identity)
+    return identity
 
 def role_required(role):
     def decorator(f):
@@ -204,6 +532,300 @@ def role_required(role):
         return decorated_function
     return decorator
 
+def paginate_list(query, sort_columns, default_sort, key):
+    """Order a list query by ?sort= and ?order= and return the requested ?page=
+
+    key is a unique column appended to the ordering so pages stay stable
+    when the sort column has duplicates.
+    """
+    sort = request.args.get('sort', default_sort)
+    column = sort_columns.get(sort, sort_columns[default_sort])
+    if request.args.get('order') == 'desc':
+        query = query.order_by(column.desc(), key.desc())
+    else:
+        query = query.order_by(column.asc(), key.asc())
+    return query.paginate(
+        page=request.args.get('page', 1, type=int),
+        per_page=app.config['POSTS_PER_PAGE'],
+        error_out=False
+    )
+
+def search_filter(search, *columns):
+    pattern = f'%{search}%'
+    return or_(*[column.ilike(pattern) for column in columns])
+
+UPSERT_CHUNK_SIZE = 500
+
+def bulk_upsert(model, rows, key_columns, update_columns):
+    """Insert rows, updating update_columns where a row with the same key already exists
+
+    On PostgreSQL and SQLite each chunk is a single INSERT ... ON CONFLICT
+    against the unique index over key_columns. Other databases use one
+    SELECT for the existing keys plus one executemany INSERT and UPDATE.
+    """
+    table = model.__table__
+    key_of = lambda row: tuple(row[column] for column in key_columns)
+    # A key may appear only once per statement; the last entry wins
+    rows = list({key_of(row): row for row in rows}.values())
+    if not rows:
+        return
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            stmt = dialect_insert(table).values(rows[start:start + UPSERT_CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=key_columns,
+                set_={column: stmt.excluded[column] for column in update_columns}
+            )
+            db.session.execute(stmt)
+        return
+
+    key_cols = [table.c[column] for column in key_columns]
+    existing = {}
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        keys = [key_of(row) for row in rows[start:start + UPSERT_CHUNK_SIZE]]
+        for found in db.session.execute(select(table.c.id, *key_cols).where(tuple_(*key_cols).in_(keys))):
+            existing[tuple(found[1:])] = found[0]
+    updates = [dict({column: row[column] for column in update_columns}, id=existing[key_of(row)])
+               for row in rows if key_of(row) in existing]
+    inserts = [row for row in rows if key_of(row) not in existing]
+    if updates:
+        db.session.execute(update(model), updates)
+    if inserts:
+        db.session.execute(insert(table), inserts)
+
+# Admin dashboard counters
+# Stored in the dashboard_stat table so every worker shares them. Routes that
+# add or delete counted rows call bump_stat() inside their own transaction, and
+# dashboard_stats() recomputes all counters once they are older than
+# DASHBOARD_STATS_MAX_AGE seconds or date from an earlier day. Bulk jobs such as
+# the nightly overdue run in scheduler.py reconcile when they finish.
+
+def stat_queries():
+    return {
+        'students': select(func.count(Student.id)),
+        'teachers': select(func.count(Teacher.id)),
+        'classes': select(func.count(SchoolClass.id)),
+        'subjects': select(func.count(Subject.id)),
+        'overdue_fees': select(func.count(Fee.id)).where(Fee.status == 'overdue'),
+        'overdue_books': select(func.count(BookIssue.id)).where(BookIssue.status == 'overdue'),
+    }
+
+def reconcile_stats():
+    """Recompute every dashboard counter from the base tables in one query
+
+    Returns {name: {'value': ..., 'updated_at': ...}}; updated_at only moves
+    for counters whose value actually changed.
+    """
+    queries = stat_queries()
+    with primary_reads():
+        counts = db.session.execute(select(*[q.scalar_subquery().label(name) for name, q in queries.items()])).one()
+        current = {row.name: row for row in DashboardStat.query.all()}
+    now = datetime.now()
+    rows = [{
+        'name': name,
+        'value': value,
+        'reconciled_at': now,
+        'updated_at': current[name].updated_at if name in current and current[name].value == value else now
+    } for name, value in counts._mapping.items()]
+    bulk_upsert(DashboardStat, rows, ['name'], ['value', 'reconciled_at', 'updated_at'])
+    return {row['name']: {'value': row['value'], 'updated_at': row['updated_at']} for row in rows}
+
+def bump_stat(name, delta=1):
+    """Adjust a counter in the caller's transaction; a no-op until the first reconcile"""
+    if delta:
+        db.session.execute(update(DashboardStat).where(DashboardStat.name == name)
+                           .values(value=DashboardStat.value + delta, updated_at=datetime.now()))
+
+def dashboard_stat_rows():
+    """Return {name: {'value': ..., 'updated_at': ...}}, reconciling first if stale"""
+    rows = DashboardStat.query.all()
+    oldest = min((row.reconciled_at for row in rows), default=None)
+    if (oldest is None or {row.name for row in rows} != set(stat_queries())
+            or oldest.date() != date.today()
+            or (datetime.now() - oldest).total_seconds() > app.config['DASHBOARD_STATS_MAX_AGE']):
+        stats = reconcile_stats()
+        db.session.commit()
+        return stats
+    return {row.name: {'value': row.value, 'updated_at': row.updated_at} for row in rows}
+
+def dashboard_stats():
+    return {name: row['value'] for name, row in dashboard_stat_rows().items()}
+
+def is_overdue_issue(book_issue):
+    return book_issue.status == 'overdue'
+
+@app.cli.command('reconcile-stats')
+def reconcile_stats_command():
+    """Recompute the admin dashboard counters"""
+    stats = reconcile_stats()
+    db.session.commit()
+    print(', '.join(f"{name}={row['value']}" for name, row in stats.items()))
+
+# Academic-year rollover
+# Classes of the old year are cloned into the new one (same grade, section,
+# class teacher and capacity). Every student moves to the class one grade up
+# with the same section, or any class of that grade if the section is gone.
+# Students in the graduating grade keep their final-year class and have their
+# accounts deactivated, and teaching assignments follow the cloned classes.
+# Each step is one statement for the whole school, all in one transaction,
+# and a second run for the same years changes nothing.
+
+def next_academic_year(year):
+    """'2023-2024' -> '2024-2025'"""
+    start, end = (int(part) for part in year.split('-'))
+    return f'{start + 1}-{end + 1}'
+
+def academic_year_dates(year):
+    """(first day, last day) of an academic year such as '2023-2024'"""
+    start = date(int(year.split('-')[0]), app.config['ACADEMIC_YEAR_START_MONTH'], 1)
+    return start, date(start.year + 1, start.month, 1) - timedelta(days=1)
+
+def rollover_academic_year(from_year, to_year, dry_run=False):
+    """Roll classes, students and teaching assignments from from_year into to_year
+
+    Returns a report with the action taken for each old class and the totals.
+    A dry run executes the same statements and rolls them back, so its report
+    is exactly what a real run would do.
+    """
+    if from_year == to_year:
+        raise ValueError('The new academic year must differ from the current one')
+    started = time.perf_counter()
+    old, new = aliased(SchoolClass), aliased(SchoolClass)
+    # A cloned class keeps the name, grade and section of the class it came from
+    same_class = and_(new.name == old.name, new.grade_level == old.grade_level,
+                      func.coalesce(new.section, '') == func.coalesce(old.section, ''))
+
+    created = db.session.execute(
+        insert(SchoolClass).from_select(
+            ['name', 'grade_level', 'section', 'class_teacher_id', 'academic_year', 'max_students'],
+            select(old.name, old.grade_level, old.section, old.class_teacher_id, literal(to_year), old.max_students)
+            .where(old.academic_year == from_year,
+                   ~select(new.id).where(new.academic_year == to_year, same_class).exists())
+        )
+    ).rowcount
+    bump_stat('classes', created)
+
+    classes = db.session.execute(
+        select(SchoolClass.id, SchoolClass.name, SchoolClass.grade_level, SchoolClass.section, SchoolClass.academic_year)
+        .where(SchoolClass.academic_year.in_((from_year, to_year)))
+        .order_by(SchoolClass.grade_level, SchoolClass.section, SchoolClass.id)
+    ).all()
+    old_classes = [c for c in classes if c.academic_year == from_year]
+    new_by_grade = {}
+    for c in classes:
+        if c.academic_year == to_year:
+            new_by_grade.setdefault(c.grade_level, []).append(c)
+    top_grade = app.config['GRADUATING_GRADE_LEVEL'] or max((c.grade_level for c in old_classes), default=0)
+    student_counts = dict(
+        db.session.query(Student.class_id, func.count(Student.id))
+        .join(SchoolClass, Student.class_id == SchoolClass.id)
+        .filter(SchoolClass.academic_year == from_year)
+        .group_by(Student.class_id)
+        .all()
+    )
+
+    plan = []
+    for c in old_classes:
+        candidates = new_by_grade.get(c.grade_level + 1, [])
+        target = next((t for t in candidates if (t.section or '') == (c.section or '')),
+                      candidates[0] if candidates else None)
+        action = 'graduate' if c.grade_level >= top_grade else ('promote' if target else 'unplaced')
+        plan.append({
+            'class_id': c.id,
+            'name': c.name,
+            'grade_level': c.grade_level,
+            'section': c.section,
+            'students': student_counts.get(c.id, 0),
+            'action': action,
+            'target_id': target.id if action == 'promote' else None,
+            'target': target.name if action == 'promote' else None,
+        })
+
+    affected_users = [] if dry_run else db.session.scalars(
+        select(Student.user_id).where(Student.class_id.in_(list(student_counts)))
+    ).all()
+
+    # One UPDATE per class, each moving the whole class by its class_id index
+    moves = [{'old_class_id': row['class_id'], 'new_class_id': row['target_id']}
+             for row in plan if row['action'] == 'promote' and row['students']]
+    if moves:
+        student = Student.__table__
+        db.session.execute(
+            update(student).where(student.c.class_id == bindparam('old_class_id'))
+            .values(class_id=bindparam('new_class_id')),
+            moves
+        )
+
+    graduated = db.session.execute(
+        update(User)
+        .where(User.is_active.is_(True), User.id.in_(
+            select(Student.user_id).join(SchoolClass, Student.class_id == SchoolClass.id)
+            .where(SchoolClass.academic_year == from_year, SchoolClass.grade_level >= top_grade)))
+        .values(is_active=False)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    existing = aliased(TeacherSubject)
+    carried = db.session.execute(
+        insert(TeacherSubject).from_select(
+            ['teacher_id', 'subject_id', 'class_id'],
+            select(TeacherSubject.teacher_id, TeacherSubject.subject_id, new.id)
+            .join(old, TeacherSubject.class_id == old.id)
+            .join(new, same_class)
+            .where(old.academic_year == from_year, new.academic_year == to_year,
+                   ~select(existing.id).where(existing.teacher_id == TeacherSubject.teacher_id,
+                                              existing.subject_id == TeacherSubject.subject_id,
+                                              existing.class_id == new.id).exists())
+        )
+    ).rowcount
+
+    report = {
+        'from_year': from_year,
+        'to_year': to_year,
+        'dry_run': dry_run,
+        'graduating_grade': top_grade,
+        'classes': plan,
+        'classes_created': created,
+        'students_promoted': sum(row['students'] for row in plan if row['action'] == 'promote'),
+        'students_graduated': graduated,
+        'students_unplaced': sum(row['students'] for row in plan if row['action'] == 'unplaced'),
+        'assignments_carried': carried,
+    }
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+        invalidate_identity(*affected_users)
+        invalidate_grade_analytics()
+    report['seconds'] = time.perf_counter() - started
+    return report
+
+def rollover_summary(report):
+    return (f"{report['classes_created']} classes created, {report['students_promoted']} students promoted, "
+            f"{report['students_graduated']} graduated, {report['students_unplaced']} without a class, "
+            f"{report['assignments_carried']} teaching assignments carried forward")
+
+@app.cli.command('rollover')
+@click.option('--from', 'from_year', help='Academic year to roll over (default: CURRENT_ACADEMIC_YEAR)')
+@click.option('--to', 'to_year', help='New academic year (default: the year after)')
+@click.option('--dry-run', is_flag=True, help='Show what would change without saving it')
+def rollover_command(from_year, to_year, dry_run):
+    """Clone classes into the next academic year and promote every student"""
+    from_year = from_year or app.config['CURRENT_ACADEMIC_YEAR']
+    to_year = to_year or next_academic_year(from_year)
+    report = rollover_academic_year(from_year, to_year, dry_run=dry_run)
+    for row in report['classes']:
+        destination = {'promote': row['target'], 'graduate': 'graduates', 'unplaced': 'no class in ' + to_year}
+        print(f"{row['name']:<20} {row['students']:>6} students -> {destination[row['action']]}")
+    print(f"{'Dry run' if dry_run else 'Rolled over'} {from_year} -> {to_year}: {rollover_summary(report)} "
+          f"in {report['seconds']:.2f}s")
+
 # Routes
 @app.route('/')
 def index():
@@ -219,6 +841,7 @@ def login():
         user = User.query.filter_by(username=username).first()
         
         if user and check_password_hash(user.password_hash, password) and user.is_active:
+            invalidate_identity(user.id)
             login_user(user)
             return redirect(url_for('dashboard'))
         else:
@@ -229,6 +852,7 @@ def login():
 @app.route('/logout')
 @login_required
 def logout():
+    invalidate_identity(current_user.id)
     logout_user()
     return redirect(url_for('index'))
 
@@ -237,39 +861,29 @@ def logout():
 def dashboard():
     if current_user.role == 'admin':
         # Get statistics for admin dashboard
-        total_students = Student.query.count()
-        total_teachers = Teacher.query.count()
-        total_classes = SchoolClass.query.count()
-        total_subjects = Subject.query.count()
+        stats = dashboard_stats()
         
         # Get recent activities (you can expand this)
         recent_students = db.session.query(Student, User).join(User, Student.user_id == User.id).order_by(Student.id.desc()).limit(5).all()
         
-        # Get overdue fees
-        overdue_fees = Fee.query.filter(Fee.status == 'overdue').count()
-        
-        # Get overdue books
-        overdue_books = BookIssue.query.filter(BookIssue.status == 'issued', BookIssue.due_date < date.today()).count()
-        
         return render_template('admin_dashboard.html', 
-                             total_students=total_students,
-                             total_teachers=total_teachers,
-                             total_classes=total_classes,
-                             total_subjects=total_subjects,
+                             total_students=stats['students'],
+                             total_teachers=stats['teachers'],
+                             total_classes=stats['classes'],
+                             total_subjects=stats['subjects'],
                              recent_students=recent_students,
-                             overdue_fees=overdue_fees,
-                             overdue_books=overdue_books)
+                             overdue_fees=stats['overdue_fees'],
+                             overdue_books=stats['overdue_books'])
     elif current_user.role == 'teacher':
-        teacher = Teacher.query.filter_by(user_id=current_user.id).first()
-        assignments = TeacherSubject.query.filter_by(teacher_id=teacher.id).all() if teacher else []
-        return render_template('teacher_dashboard.html', teacher=teacher, assignments=assignments)
+        teacher_id = current_user.teacher_profile_id
+        assignments = TeacherSubject.query.filter_by(teacher_id=teacher_id).all() if teacher_id else []
+        return render_template('teacher_dashboard.html', assignments=assignments)
     elif current_user.role == 'student':
-        student = Student.query.filter_by(user_id=current_user.id).first()
-        recent_grades = Grade.query.filter_by(student_id=student.id).order_by(Grade.id.desc()).limit(5).all() if student else []
-        recent_attendance = Attendance.query.filter_by(student_id=student.id).order_by(Attendance.date.desc()).limit(5).all() if student else []
-        pending_fees = Fee.query.filter_by(student_id=student.id, status='pending').all() if student else []
+        student_id = current_user.student_profile_id
+        recent_grades = Grade.query.filter_by(student_id=student_id).order_by(Grade.id.desc()).limit(5).all() if student_id else []
+        recent_attendance = Attendance.query.filter_by(student_id=student_id).order_by(Attendance.date.desc()).limit(5).all() if student_id else []
+        pending_fees = Fee.query.filter(Fee.student_id == student_id, Fee.status.in_(UNPAID_FEE_STATUSES)).all() if student_id else []
         return render_template('student_dashboard.html', 
-                             student=student, 
                              recent_grades=recent_grades,
                              recent_attendance=recent_attendance,
                              pending_fees=pending_fees)
@@ -307,9 +921,28 @@ def parent_dashboard():
 @login_required
 @role_required('admin')
 def admin_students():
-    students = db.session.query(Student, User).join(User, Student.user_id == User.id).all()
-    classes = SchoolClass.query.all()
-    return render_template('admin/students.html', students=students, classes=classes)
+    query = db.session.query(Student, User).join(User, Student.user_id == User.id).options(
+        joinedload(Student.school_class),
+        joinedload(Student.parent)
+    )
+    search = request.args.get('q', '').strip()
+    if search:
+        query = query.filter(search_filter(search, User.first_name, User.last_name, User.email, Student.student_id))
+    class_id = request.args.get('class_id', type=int)
+    if class_id:
+        query = query.filter(Student.class_id == class_id)
+    status = request.args.get('status')
+    if status in ('active', 'inactive'):
+        query = query.filter(User.is_active.is_(status == 'active'))
+
+    pagination = paginate_list(query, {
+        'student_id': Student.student_id,
+        'name': User.last_name,
+        'class': Student.class_id,
+        'email': User.email,
+    }, 'student_id', Student.id)
+    classes = SchoolClass.query.order_by(SchoolClass.name).all()
+    return render_template('admin/students.html', students=pagination.items, pagination=pagination, classes=classes)
 
 @app.route('/admin/students/add', methods=['POST'])
 @login_required
@@ -342,6 +975,7 @@ def add_student():
         user.phone = request.form.get('phone')
         user.address = request.form.get('address')
         db.session.add(student)
+        bump_stat('students')
         db.session.commit()
         
         flash('Student added successfully!', 'success')
@@ -351,6 +985,36 @@ def add_student():
         flash(f'Error adding student: {str(e)}', 'error')
         return redirect(url_for('admin_students'))
 
+@app.route('/admin/students/import', methods=['POST'])
+@login_required
+@role_required('admin')
+def import_students_upload():
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Choose a CSV or XLSX file to import.', 'error')
+        return redirect(url_for('admin_students'))
+
+    errors_dir = os.path.join(app.instance_path, 'imports')
+    os.makedirs(errors_dir, exist_ok=True)
+    errors_name = f'students-{secrets.token_hex(8)}.errors.csv'
+    try:
+        report = import_students(import_file_rows(upload.stream, upload.filename),
+                                 os.path.join(errors_dir, errors_name),
+                                 progress=lambda r: app.logger.info('Student import: %s', import_progress_message(r)))
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error importing students: {str(e)}', 'error')
+        return redirect(url_for('admin_students'))
+
+    return render_template('admin/import_result.html', report=report,
+                           errors_name=errors_name if report['errors'] else None)
+
+@app.route('/admin/students/import/errors/<path:name>')
+@login_required
+@role_required('admin')
+def import_students_errors(name):
+    return send_from_directory(os.path.join(app.instance_path, 'imports'), name, as_attachment=True)
+
 @app.route('/admin/students/<int:student_id>/delete', methods=['POST'])
 @login_required
 @role_required('admin')
@@ -360,15 +1024,26 @@ def delete_student(student_id):
         user = User.query.get(student.user_id)
         
         # Delete related records first
+        touched_days = attendance_keys(Attendance.student_id == student.id)
         Attendance.query.filter_by(student_id=student.id).delete()
+        refresh_attendance_rollups(touched_days)
         Grade.query.filter_by(student_id=student.id).delete()
+        ReportRemark.query.filter_by(student_id=student.id).delete()
+        bump_stat('overdue_fees', -Fee.query.filter_by(student_id=student.id, status='overdue').count())
+        bump_stat('overdue_books', -BookIssue.query.filter_by(student_id=student.id, status='overdue').count())
+        receipt_numbers = db.session.scalars(select(Fee.receipt_number).where(Fee.student_id == student.id)).all()
         Fee.query.filter_by(student_id=student.id).delete()
         BookIssue.query.filter_by(student_id=student.id).delete()
         
         # Delete student and user
+        user_id = user.id
         db.session.delete(student)
         db.session.delete(user)
+        bump_stat('students', -1)
         db.session.commit()
+        remove_receipt_files(receipt_numbers)
+        invalidate_identity(user_id)
+        invalidate_grade_analytics()
         
         flash('Student deleted successfully!', 'success')
     except Exception as e:
@@ -399,6 +1074,8 @@ def edit_student(student_id):
         student.parent_id = request.form.get('parent_id') if request.form.get('parent_id') else None
         
         db.session.commit()
+        invalidate_identity(user.id)
+        invalidate_grade_analytics()
         flash('Student updated successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -410,8 +1087,25 @@ def edit_student(student_id):
 @login_required
 @role_required('admin')
 def admin_teachers():
-    teachers = db.session.query(Teacher, User).join(User, Teacher.user_id == User.id).all()
-    return render_template('admin/teachers.html', teachers=teachers)
+    query = db.session.query(Teacher, User).join(User, Teacher.user_id == User.id)
+    search = request.args.get('q', '').strip()
+    if search:
+        query = query.filter(search_filter(search, User.first_name, User.last_name, User.email,
+                                           Teacher.teacher_id, Teacher.specialization))
+
+    pagination = paginate_list(query, {
+        'teacher_id': Teacher.teacher_id,
+        'name': User.last_name,
+        'email': User.email,
+        'experience': Teacher.experience_years,
+    }, 'teacher_id', Teacher.id)
+    stats = query.with_entities(
+        func.count(Teacher.id).label('total'),
+        func.count(func.nullif(User.is_active, False)).label('active'),
+        func.count(Teacher.qualification).label('qualified'),
+        func.avg(Teacher.experience_years).label('avg_experience')
+    ).one()
+    return render_template('admin/teachers.html', teachers=pagination.items, pagination=pagination, stats=stats)
 
 @app.route('/admin/teachers/add', methods=['POST'])
 @login_required
@@ -446,6 +1140,7 @@ def add_teacher():
         user.phone = request.form.get('phone')
         user.address = request.form.get('address')
         db.session.add(teacher)
+        bump_stat('teachers')
         db.session.commit()
         
         flash('Teacher added successfully!', 'success')
@@ -478,7 +1173,9 @@ def edit_teacher(teacher_id):
         teacher.hire_date = datetime.strptime(request.form['hire_date'], '%Y-%m-%d').date()
         teacher.date_of_birth = datetime.strptime(request.form['date_of_birth'], '%Y-%m-%d').date() if request.form.get('date_of_birth') else None
         
+        user_id = user.id
         db.session.commit()
+        invalidate_identity(user_id)
         flash('Teacher updated successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -496,13 +1193,20 @@ def delete_teacher(teacher_id):
         
         # Delete related records first
         TeacherSubject.query.filter_by(teacher_id=teacher.id).delete()
+        touched_days = attendance_keys(Attendance.marked_by == teacher.id)
         Attendance.query.filter_by(marked_by=teacher.id).delete()
+        refresh_attendance_rollups(touched_days)
         Grade.query.filter_by(teacher_id=teacher.id).delete()
+        ReportRemark.query.filter_by(teacher_id=teacher.id).delete()
         
         # Delete teacher and user
+        user_id = user.id
         db.session.delete(teacher)
         db.session.delete(user)
+        bump_stat('teachers', -1)
         db.session.commit()
+        invalidate_identity(user_id)
+        invalidate_grade_analytics()
         
         flash('Teacher deleted successfully!', 'success')
     except Exception as e:
@@ -515,9 +1219,20 @@ def delete_teacher(teacher_id):
 @login_required
 @role_required('admin')
 def admin_classes():
-    classes = SchoolClass.query.all()
+    classes = SchoolClass.query.options(
+        joinedload(SchoolClass.class_teacher).joinedload(Teacher.user)
+    ).all()
+    student_counts = dict(
+        db.session.query(Student.class_id, func.count(Student.id))
+        .filter(Student.class_id.isnot(None))
+        .group_by(Student.class_id)
+        .all()
+    )
+    attendance = class_attendance_summaries([c.id for c in classes], attendance_term_start())
     teachers = db.session.query(Teacher, User).join(User, Teacher.user_id == User.id).all()
-    return render_template('admin/classes.html', classes=classes, teachers=teachers)
+    current_year = app.config['CURRENT_ACADEMIC_YEAR']
+    return render_template('admin/classes.html', classes=classes, teachers=teachers, student_counts=student_counts,
+                           attendance=attendance, current_year=current_year, next_year=next_academic_year(current_year))
 
 @app.route('/admin/classes/add', methods=['POST'])
 @login_required
@@ -533,6 +1248,7 @@ def add_class():
             max_students=int(request.form['max_students'])
         )
         db.session.add(school_class)
+        bump_stat('classes')
         db.session.commit()
         
         flash('Class added successfully!', 'success')
@@ -580,8 +1296,12 @@ def delete_class(class_id):
         # Delete related records
         TeacherSubject.query.filter_by(class_id=class_id).delete()
         Timetable.query.filter_by(class_id=class_id).delete()
+        # Attendance history stays on the students; only the class's rollups go
+        ClassAttendanceDaily.query.filter_by(class_id=class_id).delete()
+        StudentAttendanceDaily.query.filter_by(class_id=class_id).update({'class_id': None})
         
         db.session.delete(school_class)
+        bump_stat('classes', -1)
         db.session.commit()
         
         flash('Class deleted successfully!', 'success')
@@ -591,12 +1311,312 @@ def delete_class(class_id):
     
     return redirect(url_for('admin_classes'))
 
+@app.route('/admin/classes/rollover', methods=['POST'])
+@login_required
+@role_required('admin')
+def rollover_classes():
+    """Preview the academic-year rollover, then run it once confirmed"""
+    try:
+        from_year = request.form.get('from_year') or app.config['CURRENT_ACADEMIC_YEAR']
+        to_year = request.form.get('to_year') or next_academic_year(from_year)
+        confirmed = request.form.get('confirm') == 'yes'
+        report = rollover_academic_year(from_year, to_year, dry_run=not confirmed)
+        if not confirmed:
+            return render_template('admin/rollover.html', report=report)
+        
+        flash(f'Rolled over {from_year} to {to_year}: {rollover_summary(report)}.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error rolling over academic year: {str(e)}', 'error')
+    
+    return redirect(url_for('admin_classes'))
+
+# Timetable
+# No teacher, room or class may be booked twice at overlapping times on the
+# same day. A write looks up the slots it could clash with through the
+# (resource, day_of_week, start_time) indexes, a few index seeks however big
+# the timetable is. timetable_audit checks the whole school at once with the
+# sort-and-sweep pass in timetable.find_clashes.
+
+TIMETABLE_COLUMNS = ('id', 'class_id', 'subject_id', 'teacher_id', 'day_of_week', 'start_time', 'end_time', 'room_number')
+
+def timetable_clashes(slot, exclude_id=None):
+    """[(resource, Timetable)] for stored slots of the same academic year that clash with a slot dict"""
+    # One branch per resource so each can seek its own (resource, day, start) index
+    branches = [and_(getattr(Timetable, resource) == value, Timetable.day_of_week == slot['day_of_week'],
+                     Timetable.start_time < slot['end_time'], Timetable.end_time > slot['start_time'])
+                for resource, value in booked(slot)]
+    academic_year = select(SchoolClass.academic_year).where(SchoolClass.id == slot['class_id']).scalar_subquery()
+    stmt = (select(Timetable).join(SchoolClass, Timetable.class_id == SchoolClass.id)
+            .where(or_(*branches), SchoolClass.academic_year == academic_year))
+    if exclude_id:
+        stmt = stmt.where(Timetable.id != exclude_id)
+    return [(resource, row) for row in db.session.scalars(stmt)
+            for resource, value in booked(slot) if getattr(row, resource) == value]
+
+def describe_clash(resource, row):
+    who = {'teacher_id': 'The teacher', 'room_number': f'Room {row.room_number}', 'class_id': 'The class'}[resource]
+    return (f"{who} is already booked for {row.school_class.name} {row.subject.name} on "
+            f"{row.day_of_week.title()} {row.start_time:%H:%M}-{row.end_time:%H:%M}")
+
+def check_timetable_slot(slot, exclude_id=None):
+    """Raise ValueError if a slot dict is malformed or clashes with the stored timetable"""
+    if slot['day_of_week'] not in DAYS:
+        raise ValueError(f"day must be one of {', '.join(DAYS)}")
+    if slot['start_time'] >= slot['end_time']:
+        raise ValueError('a slot must end after it starts')
+    clashes = timetable_clashes(slot, exclude_id)
+    if clashes:
+        raise ValueError('; '.join(describe_clash(resource, row) for resource, row in clashes))
+
+def timetable_audit(academic_year=None, class_id=None):
+    """Every clash in a year's stored timetable as (resource, slot, slot), with slot dicts
+
+    Earlier years' classes keep their slots, so only classes of academic_year
+    (CURRENT_ACADEMIC_YEAR by default) are checked. With class_id, only that
+    class's clashes are returned, read from the slots that share its teachers,
+    rooms or the class itself.
+    """
+    stmt = (select(*[getattr(Timetable, column) for column in TIMETABLE_COLUMNS])
+            .join(SchoolClass, Timetable.class_id == SchoolClass.id)
+            .where(SchoolClass.academic_year == (academic_year or app.config['CURRENT_ACADEMIC_YEAR'])))
+    if class_id is not None:
+        stmt = stmt.where(or_(
+            Timetable.class_id == class_id,
+            Timetable.teacher_id.in_(select(Timetable.teacher_id).where(Timetable.class_id == class_id)),
+            Timetable.room_number.in_(select(Timetable.room_number)
+                                      .where(Timetable.class_id == class_id, Timetable.room_number.is_not(None)))
+        ))
+    rows = db.session.connection().execute(stmt)
+    clashes = find_clashes([dict(zip(TIMETABLE_COLUMNS, row)) for row in rows])
+    if class_id is not None:
+        clashes = [clash for clash in clashes if class_id in (clash[1]['class_id'], clash[2]['class_id'])]
+    return clashes
+
+def timetable_audit_rows(clashes):
+    """Clashes from timetable_audit with class, subject and teacher names, for display"""
+    classes = dict(db.session.execute(select(SchoolClass.id, SchoolClass.name)).all())
+    subjects = dict(db.session.execute(select(Subject.id, Subject.name)).all())
+    teachers = {teacher_id: f'{first} {last}' for teacher_id, first, last in db.session.execute(
+        select(Teacher.id, User.first_name, User.last_name).join(User, Teacher.user_id == User.id))}
+
+    def label(slot):
+        return (f"{classes.get(slot['class_id'], '?')} {subjects.get(slot['subject_id'], '?')} "
+                f"({teachers.get(slot['teacher_id'], '?')}, room {slot['room_number'] or '-'}) "
+                f"{slot['start_time']:%H:%M}-{slot['end_time']:%H:%M}")
+
+    resources = {'teacher_id': 'Teacher', 'room_number': 'Room', 'class_id': 'Class'}
+    return [{'resource': resources[resource], 'day': first['day_of_week'], 'first': label(first), 'second': label(second)}
+            for resource, first, second in clashes]
+
+@app.cli.command('timetable-audit')
+@click.option('--year', 'academic_year', help='Academic year (default: CURRENT_ACADEMIC_YEAR)')
+def timetable_audit_command(academic_year):
+    """List every teacher, room and class that is double-booked in a year."""
+    started = time.perf_counter()
+    clashes = timetable_audit(academic_year)
+    elapsed = time.perf_counter() - started
+    for row in timetable_audit_rows(clashes):
+        click.echo(f"{row['resource']} clash on {row['day'].title()}: {row['first']} / {row['second']}")
+    click.echo(f"{'✅' if not clashes else '❌'} {len(clashes)} clashes found in {elapsed:.2f}s")
+
+def timetable_form_slot(form, class_id):
+    return {
+        'class_id': class_id,
+        'subject_id': int(form['subject_id']),
+        'teacher_id': int(form['teacher_id']),
+        'day_of_week': form['day_of_week'].strip().lower(),
+        'start_time': datetime.strptime(form['start_time'], '%H:%M').time(),
+        'end_time': datetime.strptime(form['end_time'], '%H:%M').time(),
+        'room_number': form.get('room_number', '').strip() or None
+    }
+
+@app.route('/admin/classes/<int:class_id>/timetable')
+@login_required
+@role_required('admin')
+def admin_class_timetable(class_id):
+    school_class = SchoolClass.query.get_or_404(class_id)
+    slots = (Timetable.query.options(joinedload(Timetable.subject), joinedload(Timetable.teacher).joinedload(Teacher.user))
+             .filter_by(class_id=class_id).all())
+    slots.sort(key=lambda slot: (DAYS.index(slot.day_of_week) if slot.day_of_week in DAYS else len(DAYS), slot.start_time))
+    subjects = Subject.query.order_by(Subject.name).all()
+    teachers = db.session.query(Teacher, User).join(User, Teacher.user_id == User.id).order_by(User.first_name, User.last_name).all()
+    clashes = timetable_audit_rows(timetable_audit(school_class.academic_year, class_id))
+    return render_template('admin/timetable.html', school_class=school_class, slots=slots, subjects=subjects,
+                           teachers=teachers, days=DAYS, clashes=clashes)
+
+@app.route('/admin/classes/<int:class_id>/timetable/add', methods=['POST'])
+@login_required
+@role_required('admin')
+def add_timetable_slot(class_id):
+    try:
+        SchoolClass.query.get_or_404(class_id)
+        slot = timetable_form_slot(request.form, class_id)
+        check_timetable_slot(slot)
+        db.session.add(Timetable(**slot))
+        db.session.commit()
+        
+        flash('Timetable slot added successfully!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error adding timetable slot: {str(e)}', 'error')
+    
+    return redirect(url_for('admin_class_timetable', class_id=class_id))
+
+@app.route('/admin/timetable/<int:slot_id>/edit', methods=['POST'])
+@login_required
+@role_required('admin')
+def edit_timetable_slot(slot_id):
+    row = Timetable.query.get_or_404(slot_id)
+    try:
+        slot = timetable_form_slot(request.form, row.class_id)
+        check_timetable_slot(slot, exclude_id=slot_id)
+        for column, value in slot.items():
+            setattr(row, column, value)
+        db.session.commit()
+        
+        flash('Timetable slot updated successfully!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error updating timetable slot: {str(e)}', 'error')
+    
+    return redirect(url_for('admin_class_timetable', class_id=row.class_id))
+
+@app.route('/admin/timetable/<int:slot_id>/delete', methods=['POST'])
+@login_required
+@role_required('admin')
+def delete_timetable_slot(slot_id):
+    row = Timetable.query.get_or_404(slot_id)
+    class_id = row.class_id
+    try:
+        db.session.delete(row)
+        db.session.commit()
+        
+        flash('Timetable slot deleted successfully!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error deleting timetable slot: {str(e)}', 'error')
+    
+    return redirect(url_for('admin_class_timetable', class_id=class_id))
+
+# Timetable generation
+# Lessons come from TeacherSubject (one teacher per class and subject) with
+# Subject.credits as periods a week. Slots of the year's other classes stay
+# as they are and keep their teachers and rooms busy; earlier years' slots
+# are ignored. The
+# search (timetable.search_timetable) runs randomized restarts in
+# TIMETABLE_WORKERS processes for the time budget and the best complete
+# timetable replaces the classes' slots.
+
+def timetable_periods(spec=None):
+    """[(start, end)] from a 'HH:MM-HH:MM,...' list, TIMETABLE_PERIODS by default"""
+    periods = []
+    for period in (spec or app.config['TIMETABLE_PERIODS']).split(','):
+        start, end = (datetime.strptime(part.strip(), '%H:%M').time() for part in period.split('-'))
+        if start >= end:
+            raise ValueError(f'period {period.strip()} must end after it starts')
+        periods.append((start, end))
+    return sorted(periods)
+
+def timetable_lessons(class_ids):
+    """(class_id, teacher_id, subject_id, periods a week) per class subject; the first teacher assigned takes it"""
+    lessons = {}
+    for class_id, teacher_id, subject_id, credits in db.session.execute(
+        select(TeacherSubject.class_id, TeacherSubject.teacher_id, TeacherSubject.subject_id, func.coalesce(Subject.credits, 1))
+        .join(Subject, TeacherSubject.subject_id == Subject.id)
+        .where(TeacherSubject.class_id.in_(class_ids))
+        .order_by(TeacherSubject.id)
+    ):
+        lessons.setdefault((class_id, subject_id), (class_id, teacher_id, subject_id, max(credits, 1)))
+    return list(lessons.values())
+
+def generate_school_timetable(class_ids, academic_year, seconds, workers, days, periods, rooms=(), target_score=100.0):
+    """Search for a timetable for a year's classes; returns (best result, slot dicts, fixed slot dicts)
+
+    Raises ValueError when the lessons cannot fit, e.g. a teacher with more
+    periods than the week has.
+    """
+    rows = db.session.execute(select(*[getattr(Timetable, column) for column in TIMETABLE_COLUMNS])
+                              .join(SchoolClass, Timetable.class_id == SchoolClass.id)
+                              .where(SchoolClass.academic_year == academic_year, Timetable.class_id.notin_(class_ids)))
+    fixed = [dict(zip(TIMETABLE_COLUMNS, row)) for row in rows]
+    problem = timetable_problem(timetable_lessons(class_ids), days, periods, rooms, fixed)
+
+    if workers > 1:
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            # Seeds 0, workers, 2 * workers, ... in the first process, 1, workers + 1, ... in the next
+            futures = [pool.submit(search_timetable, problem, seed, workers, seconds, target_score)
+                       for seed in range(workers)]
+            results = [future.result() for future in futures]
+        finally:
+            pool.shutdown()
+    else:
+        results = [search_timetable(problem, 0, 1, seconds, target_score)]
+    best = max(results, key=result_rank)
+    best['restarts'] = sum(result['restarts'] for result in results)
+    slots = generated_slots(problem, best, days, periods, rooms, fixed) if best['complete'] else []
+    return best, slots, fixed
+
+def replace_timetable(class_ids, slots, fixed):
+    """Swap the classes' slots for generated ones, after checking them against each other and the fixed slots"""
+    clashes = [clash for clash in find_clashes(slots + fixed) if 'id' not in clash[1] or 'id' not in clash[2]]
+    if clashes:
+        raise ValueError(f'{len(clashes)} clashes in the generated timetable')
+    db.session.execute(delete(Timetable).where(Timetable.class_id.in_(class_ids)))
+    if slots:
+        db.session.execute(insert(Timetable), slots)
+
+@app.cli.command('generate-timetable')
+@click.option('--year', 'academic_year', help='Academic year (default: CURRENT_ACADEMIC_YEAR)')
+@click.option('--seconds', type=float, help='Time budget (default: TIMETABLE_SECONDS)')
+@click.option('--workers', type=int, help='Processes running restarts (default: TIMETABLE_WORKERS)')
+@click.option('--rooms', help='Comma-separated room numbers (default: TIMETABLE_ROOMS)')
+@click.option('--target-score', type=float, default=100.0, help='Stop searching once a timetable scores this')
+@click.option('--dry-run', is_flag=True, help='Search and report without writing the timetable')
+def generate_timetable_command(academic_year, seconds, workers, rooms, target_score, dry_run):
+    """Generate a clash-free timetable for every class in a year from its teaching assignments."""
+    academic_year = academic_year or app.config['CURRENT_ACADEMIC_YEAR']
+    days = tuple(day.strip().lower() for day in app.config['TIMETABLE_DAYS'])
+    rooms = [room.strip() for room in rooms.split(',') if room.strip()] if rooms else app.config['TIMETABLE_ROOMS']
+    class_ids = list(db.session.scalars(
+        select(SchoolClass.id).where(SchoolClass.academic_year == academic_year,
+                                     SchoolClass.id.in_(select(TeacherSubject.class_id)))
+    ))
+    if not class_ids:
+        raise click.ClickException(f'No {academic_year} class has teaching assignments')
+
+    started = time.perf_counter()
+    try:
+        result, slots, fixed = generate_school_timetable(
+            class_ids, academic_year, seconds or app.config['TIMETABLE_SECONDS'],
+            workers or app.config['TIMETABLE_WORKERS'], days, timetable_periods(), rooms, target_score)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    penalties = ', '.join(f"{name.replace('_', ' ')} {count}" for name, count in result['penalties'].items())
+    click.echo(f"{result['placed']}/{result['lessons']} lessons placed for {len(class_ids)} classes after "
+               f"{result['restarts']} restarts in {time.perf_counter() - started:.1f}s; "
+               f"quality {result['score']} ({penalties})")
+    if not result['complete']:
+        raise click.ClickException('No complete timetable found; allow more --seconds or add rooms')
+    if dry_run:
+        click.echo('Dry run: nothing written')
+        return
+    replace_timetable(class_ids, slots, fixed)
+    db.session.commit()
+    click.echo(f"✅ {len(slots)} slots written")
+
 @app.route('/admin/subjects')
 @login_required
 @role_required('admin')
 def admin_subjects():
     subjects = Subject.query.all()
-    return render_template('admin/subjects.html', subjects=subjects)
+    assignment_counts = dict(
+        db.session.query(TeacherSubject.subject_id, func.count(TeacherSubject.id))
+        .group_by(TeacherSubject.subject_id)
+        .all()
+    )
+    return render_template('admin/subjects.html', subjects=subjects, assignment_counts=assignment_counts)
 
 @app.route('/admin/subjects/add', methods=['POST'])
 @login_required
@@ -611,6 +1631,7 @@ def add_subject():
             credits=int(request.form['credits']) if request.form.get('credits') else 1
         )
         db.session.add(subject)
+        bump_stat('subjects')
         db.session.commit()
         
         flash('Subject added successfully!', 'success')
@@ -634,6 +1655,7 @@ def edit_subject(subject_id):
         subject.credits = int(request.form['credits']) if request.form.get('credits') else 1
         
         db.session.commit()
+        invalidate_grade_analytics()
         flash('Subject updated successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -650,12 +1672,16 @@ def delete_subject(subject_id):
         
         # Delete related records
         TeacherSubject.query.filter_by(subject_id=subject_id).delete()
+        touched_days = attendance_keys(Attendance.subject_id == subject_id)
         Attendance.query.filter_by(subject_id=subject_id).delete()
+        refresh_attendance_rollups(touched_days)
         Grade.query.filter_by(subject_id=subject_id).delete()
         Timetable.query.filter_by(subject_id=subject_id).delete()
         
         db.session.delete(subject)
+        bump_stat('subjects', -1)
         db.session.commit()
+        invalidate_grade_analytics()
         
         flash('Subject deleted successfully!', 'success')
     except Exception as e:
@@ -668,9 +1694,33 @@ def delete_subject(subject_id):
 @login_required
 @role_required('admin')
 def admin_fees():
-    fees = db.session.query(Fee, Student, User).join(Student, Fee.student_id == Student.id).join(User, Student.user_id == User.id).all()
-    students = db.session.query(Student, User).join(User, Student.user_id == User.id).all()
-    return render_template('admin/fees.html', fees=fees, students=students)
+    query = db.session.query(Fee, Student, User).join(Student, Fee.student_id == Student.id).join(User, Student.user_id == User.id)
+    search = request.args.get('q', '').strip()
+    if search:
+        query = query.filter(search_filter(search, User.first_name, User.last_name, Student.student_id))
+    for field in ('fee_type', 'status', 'academic_year'):
+        value = request.args.get(field)
+        if value:
+            query = query.filter(getattr(Fee, field) == value)
+
+    pagination = paginate_list(query, {
+        'due_date': Fee.due_date,
+        'student': User.last_name,
+        'student_id': Student.student_id,
+        'fee_type': Fee.fee_type,
+        'amount': Fee.amount,
+        'status': Fee.status,
+        'payment_date': Fee.payment_date,
+    }, 'due_date', Fee.id)
+    totals = query.with_entities(Fee.status, func.count(Fee.id), func.sum(Fee.amount)).group_by(Fee.status).all()
+    fee_counts = {status: count for status, count, _ in totals}
+    fee_totals = {status: amount or 0 for status, _, amount in totals}
+
+    return render_template('admin/fees.html',
+                         fees=pagination.items,
+                         pagination=pagination,
+                         fee_counts=fee_counts,
+                         fee_totals=fee_totals)
 
 @app.route('/admin/fees/add', methods=['POST'])
 @login_required
@@ -692,7 +1742,10 @@ def add_fee():
             fee.payment_date = date.today()
             
         db.session.add(fee)
+        bump_stat('overdue_fees', int(fee.status == 'overdue'))
         db.session.commit()
+        if fee.status == 'paid':
+            store_receipt(fee)
         
         flash('Fee record added successfully!', 'success')
         return redirect(url_for('admin_fees'))
@@ -707,6 +1760,7 @@ def add_fee():
 def edit_fee(fee_id):
     try:
         fee = Fee.query.get_or_404(fee_id)
+        was_overdue = fee.status == 'overdue'
         
         fee.fee_type = request.form['fee_type']
         fee.amount = float(request.form['amount'])
@@ -720,8 +1774,16 @@ def edit_fee(fee_id):
             fee.payment_date = date.today()
         elif fee.status != 'paid':
             fee.payment_date = None
+        # An issued receipt is never rewritten; it only goes if the payment is undone
+        voided_receipt = None
+        if fee.status != 'paid':
+            voided_receipt, fee.receipt_number = fee.receipt_number, None
             
+        bump_stat('overdue_fees', int(fee.status == 'overdue') - int(was_overdue))
         db.session.commit()
+        remove_receipt_files([voided_receipt])
+        if fee.status == 'paid' and not fee.receipt_number:
+            store_receipt(fee)
         flash('Fee record updated successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -735,8 +1797,11 @@ def edit_fee(fee_id):
 def delete_fee(fee_id):
     try:
         fee = Fee.query.get_or_404(fee_id)
+        receipt_number = fee.receipt_number
         db.session.delete(fee)
+        bump_stat('overdue_fees', -int(fee.status == 'overdue'))
         db.session.commit()
+        remove_receipt_files([receipt_number])
         
         flash('Fee record deleted successfully!', 'success')
     except Exception as e:
@@ -745,53 +1810,198 @@ def delete_fee(fee_id):
     
     return redirect(url_for('admin_fees'))
 
-@app.route('/admin/library')
+# Fee plans
+# A plan lists fees with their instalment due dates. Applying it to a class, a
+# grade or the whole school bills every student in that year's classes with a
+# single INSERT ... SELECT. Students who already have a fee of the same type,
+# due date and year are skipped, so a plan can be applied again after new
+# students join without billing anyone twice.
+
+FEE_PLAN_SCOPES = ('class', 'grade', 'school')
+
+def fee_plan_students(plan, scope, target=None):
+    """Select the ids of the students in scope for a plan's academic year"""
+    query = (select(Student.id)
+             .join(SchoolClass, Student.class_id == SchoolClass.id)
+             .where(SchoolClass.academic_year == plan.academic_year))
+    if scope == 'class':
+        return query.where(SchoolClass.id == target)
+    if scope == 'grade':
+        return query.where(SchoolClass.grade_level == target)
+    if scope == 'school':
+        return query
+    raise ValueError(f"scope must be one of: {', '.join(FEE_PLAN_SCOPES)}")
+
+def apply_fee_plan(plan, scope, target=None):
+    """Bill a plan to the students in scope; returns (fees created, duplicates skipped)"""
+    students = fee_plan_students(plan, scope, target).subquery()
+    existing = aliased(Fee)
+    candidates = (
+        select(students.c.id, FeePlanItem.fee_type, FeePlanItem.amount, FeePlanItem.due_date,
+               literal('pending'), literal(plan.academic_year))
+        .select_from(students)
+        .join(FeePlanItem, FeePlanItem.plan_id == plan.id)
+    )
+    duplicate = select(existing.id).where(
+        existing.student_id == students.c.id,
+        existing.fee_type == FeePlanItem.fee_type,
+        existing.due_date == FeePlanItem.due_date,
+        existing.academic_year == plan.academic_year,
+    ).exists()
+
+    total = db.session.scalar(select(func.count()).select_from(candidates.subquery()))
+    created = db.session.execute(
+        insert(Fee).from_select(['student_id', 'fee_type', 'amount', 'due_date', 'status', 'academic_year'],
+                                candidates.where(~duplicate))
+    ).rowcount
+    return created, total - created
+
+@app.route('/admin/fees/plans')
 @login_required
 @role_required('admin')
-def admin_library():
-    books = Book.query.all()
-    students = db.session.query(Student, User).join(User, Student.user_id == User.id).all()
-    book_issues = BookIssue.query.filter_by(status='issued').all()
-    overdue_books = BookIssue.query.filter(BookIssue.status == 'issued', BookIssue.due_date < date.today()).all()
-    
-    return render_template('admin/library.html', 
-                         books=books, 
-                         students=students,
-                         book_issues=book_issues,
-                         overdue_books=overdue_books)
+def admin_fee_plans():
+    plans = FeePlan.query.options(joinedload(FeePlan.items)).order_by(FeePlan.academic_year.desc(), FeePlan.name).all()
+    classes = SchoolClass.query.order_by(SchoolClass.academic_year.desc(), SchoolClass.grade_level, SchoolClass.section).all()
+    grade_levels = sorted({c.grade_level for c in classes})
+    return render_template('admin/fee_plans.html', plans=plans, classes=classes, grade_levels=grade_levels,
+                           current_year=app.config['CURRENT_ACADEMIC_YEAR'])
 
-@app.route('/admin/library/add', methods=['POST'])
+@app.route('/admin/fees/plans/add', methods=['POST'])
 @login_required
 @role_required('admin')
-def add_book():
+def add_fee_plan():
     try:
-        book = Book(
-            title=request.form['title'],
-            author=request.form['author'],
-            isbn=request.form.get('isbn'),
-            publisher=request.form.get('publisher'),
-            category=request.form['category'],
-            total_copies=int(request.form['total_copies']),
-            available_copies=int(request.form['available_copies']),
-            publication_year=int(request.form['publication_year']) if request.form.get('publication_year') else None,
-            language=request.form.get('language', 'English')
-        )
-        db.session.add(book)
+        plan = FeePlan(name=request.form['name'], academic_year=request.form['academic_year'])
+        for fee_type, amount, due_date in zip(request.form.getlist('fee_type'), request.form.getlist('amount'),
+                                              request.form.getlist('due_date')):
+            if fee_type and amount and due_date:
+                plan.items.append(FeePlanItem(fee_type=fee_type, amount=float(amount),
+                                              due_date=datetime.strptime(due_date, '%Y-%m-%d').date()))
+        if not plan.items:
+            raise ValueError('a plan needs at least one fee with an amount and due date')
+        db.session.add(plan)
         db.session.commit()
         
-        flash('Book added successfully!', 'success')
-        return redirect(url_for('admin_library'))
+        flash('Fee plan added successfully!', 'success')
     except Exception as e:
         db.session.rollback()
-        flash(f'Error adding book: {str(e)}', 'error')
-        return redirect(url_for('admin_library'))
+        flash(f'Error adding fee plan: {str(e)}', 'error')
+    
+    return redirect(url_for('admin_fee_plans'))
 
-@app.route('/admin/library/<int:book_id>/edit', methods=['POST'])
+@app.route('/admin/fees/plans/<int:plan_id>/apply', methods=['POST'])
 @login_required
 @role_required('admin')
-def edit_book(book_id):
+def apply_fee_plan_route(plan_id):
     try:
-        book = Book.query.get_or_404(book_id)
+        plan = FeePlan.query.get_or_404(plan_id)
+        scope = request.form['scope']
+        target = None
+        if scope == 'class':
+            target = int(request.form['class_id'])
+        elif scope == 'grade':
+            target = int(request.form['grade_level'])
+        created, skipped = apply_fee_plan(plan, scope, target)
+        db.session.commit()
+        
+        flash(f'Fee plan "{plan.name}" applied: {created} fees created, {skipped} already billed.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error applying fee plan: {str(e)}', 'error')
+    
+    return redirect(url_for('admin_fee_plans'))
+
+@app.route('/admin/fees/plans/<int:plan_id>/delete', methods=['POST'])
+@login_required
+@role_required('admin')
+def delete_fee_plan(plan_id):
+    try:
+        plan = FeePlan.query.get_or_404(plan_id)
+        db.session.delete(plan)
+        db.session.commit()
+        
+        flash('Fee plan deleted. Fees already billed from it are kept.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error deleting fee plan: {str(e)}', 'error')
+    
+    return redirect(url_for('admin_fee_plans'))
+
+@app.route('/admin/library')
+@login_required
+@role_required('admin')
+def admin_library():
+    query = Book.query
+    search = request.args.get('q', '').strip()
+    if search:
+        query = query.filter(search_filter(search, Book.title, Book.author, Book.isbn))
+    category = request.args.get('category')
+    if category:
+        query = query.filter(Book.category.ilike(category))
+    language = request.args.get('language')
+    if language:
+        query = query.filter(Book.language.ilike(language))
+    status = request.args.get('status')
+    if status == 'available':
+        query = query.filter(Book.available_copies > 0)
+    elif status == 'issued':
+        query = query.filter(Book.available_copies < Book.total_copies)
+
+    pagination = paginate_list(query, {
+        'title': Book.title,
+        'author': Book.author,
+        'category': Book.category,
+        'available': Book.available_copies,
+    }, 'title', Book.id)
+    book_stats = db.session.query(
+        func.count(Book.id).label('titles'),
+        func.coalesce(func.sum(Book.total_copies), 0).label('total_copies'),
+        func.coalesce(func.sum(Book.available_copies), 0).label('available_copies')
+    ).one()
+    issue_counts = dict(db.session.query(BookIssue.status, func.count(BookIssue.id))
+                        .filter(BookIssue.status.in_(OPEN_ISSUE_STATUSES)).group_by(BookIssue.status).all())
+    issued_count = sum(issue_counts.values())
+    overdue_count = issue_counts.get('overdue', 0)
+    
+    return render_template('admin/library.html', 
+                         books=pagination.items,
+                         pagination=pagination,
+                         book_stats=book_stats,
+                         issued_count=issued_count,
+                         overdue_count=overdue_count)
+
+@app.route('/admin/library/add', methods=['POST'])
+@login_required
+@role_required('admin')
+def add_book():
+    try:
+        book = Book(
+            title=request.form['title'],
+            author=request.form['author'],
+            isbn=request.form.get('isbn'),
+            publisher=request.form.get('publisher'),
+            category=request.form['category'],
+            total_copies=int(request.form['total_copies']),
+            available_copies=int(request.form['available_copies']),
+            publication_year=int(request.form['publication_year']) if request.form.get('publication_year') else None,
+            language=request.form.get('language', 'English')
+        )
+        db.session.add(book)
+        db.session.commit()
+        
+        flash('Book added successfully!', 'success')
+        return redirect(url_for('admin_library'))
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error adding book: {str(e)}', 'error')
+        return redirect(url_for('admin_library'))
+
+@app.route('/admin/library/<int:book_id>/edit', methods=['POST'])
+@login_required
+@role_required('admin')
+def edit_book(book_id):
+    try:
+        book = Book.query.get_or_404(book_id)
         
         book.title = request.form['title']
         book.author = request.form['author']
@@ -819,7 +2029,7 @@ def delete_book(book_id):
         book = Book.query.get_or_404(book_id)
         
         # Check if book has active issues
-        active_issues = BookIssue.query.filter_by(book_id=book_id, status='issued').count()
+        active_issues = BookIssue.query.filter(BookIssue.book_id == book_id, BookIssue.status.in_(OPEN_ISSUE_STATUSES)).count()
         if active_issues > 0:
             flash(f'Cannot delete book. It has {active_issues} active issues.', 'error')
             return redirect(url_for('admin_library'))
@@ -837,28 +2047,58 @@ def delete_book(book_id):
     
     return redirect(url_for('admin_library'))
 
+# Copies are taken and given back with conditional UPDATEs rather than
+# read-check-write in Python, so concurrent requests can neither lose an update
+# nor hand out a copy that doesn't exist, and no row lock is held while the
+# request runs. Each returns False when the condition no longer holds.
+def take_copy(book_id):
+    """Decrement available_copies if a copy is left"""
+    return db.session.execute(
+        update(Book)
+        .where(Book.id == book_id, Book.available_copies > 0)
+        .values(available_copies=Book.available_copies - 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+def close_issue(book_issue, return_date):
+    """Mark an open issue returned and put its copy back, unless someone else already did"""
+    fine = max((return_date - book_issue.due_date).days, 0) * app.config['LIBRARY_FINE_PER_DAY']
+    closed = db.session.execute(
+        update(BookIssue)
+        .where(BookIssue.id == book_issue.id, BookIssue.status == book_issue.status,
+               BookIssue.status.in_(OPEN_ISSUE_STATUSES))
+        .values(status='returned', return_date=return_date,
+                fine_amount=fine if fine else BookIssue.fine_amount)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if closed:
+        db.session.execute(
+            update(Book)
+            .where(Book.id == book_issue.book_id, Book.available_copies < Book.total_copies)
+            .values(available_copies=Book.available_copies + 1)
+            .execution_options(synchronize_session=False)
+        )
+        bump_stat('overdue_books', -int(is_overdue_issue(book_issue)))
+    return closed
+
 @app.route('/admin/library/issue', methods=['POST'])
 @login_required
 @role_required('admin')
 def issue_book():
     try:
-        book = Book.query.get_or_404(int(request.form['book_id']))
-        
-        if book.available_copies <= 0:
+        book_id = int(request.form['book_id'])
+        if not take_copy(book_id):
+            Book.query.get_or_404(book_id)
             flash('No copies available for this book!', 'error')
             return redirect(url_for('admin_library'))
         
         book_issue = BookIssue(
-            book_id=book.id,
+            book_id=book_id,
             student_id=int(request.form['student_id']),
             issue_date=datetime.strptime(request.form['issue_date'], '%Y-%m-%d').date(),
             due_date=datetime.strptime(request.form['due_date'], '%Y-%m-%d').date(),
             status='issued'
         )
-        
-        # Decrease available copies
-        book.available_copies -= 1
-        
         db.session.add(book_issue)
         db.session.commit()
         
@@ -875,22 +2115,12 @@ def issue_book():
 def return_book(issue_id):
     try:
         book_issue = BookIssue.query.get_or_404(issue_id)
-        book = Book.query.get(book_issue.book_id)
-        
-        # Update book issue
-        book_issue.return_date = date.today()
-        book_issue.status = 'returned'
-        
-        # Calculate fine if overdue
-        if date.today() > book_issue.due_date:
-            days_overdue = (date.today() - book_issue.due_date).days
-            book_issue.fine_amount = days_overdue * 1.0  # $1 per day fine
-        
-        # Increase available copies
-        book.available_copies += 1
-        
-        db.session.commit()
-        flash('Book returned successfully!', 'success')
+        if close_issue(book_issue, date.today()):
+            db.session.commit()
+            flash('Book returned successfully!', 'success')
+        else:
+            db.session.rollback()
+            flash('This book has already been returned.', 'warning')
     except Exception as e:
         db.session.rollback()
         flash(f'Error returning book: {str(e)}', 'error')
@@ -902,59 +2132,109 @@ def return_book(issue_id):
 @login_required
 @role_required('teacher')
 def teacher_attendance():
-    teacher = Teacher.query.filter_by(user_id=current_user.id).first()
-    assignments = TeacherSubject.query.filter_by(teacher_id=teacher.id).all()
-    return render_template('teacher/attendance.html', assignments=assignments)
+    assignments = TeacherSubject.query.options(
+        joinedload(TeacherSubject.school_class),
+        joinedload(TeacherSubject.subject)
+    ).filter_by(teacher_id=current_user.teacher_profile_id).all()
+    return render_template('teacher/attendance.html', assignments=assignments, date=date)
 
 @app.route('/teacher/grades')
 @login_required
 @role_required('teacher')
 def teacher_grades():
-    teacher = Teacher.query.filter_by(user_id=current_user.id).first()
-    assignments = TeacherSubject.query.filter_by(teacher_id=teacher.id).all()
-    return render_template('teacher/grades.html', assignments=assignments)
+    assignments = TeacherSubject.query.options(
+        joinedload(TeacherSubject.school_class),
+        joinedload(TeacherSubject.subject)
+    ).filter_by(teacher_id=current_user.teacher_profile_id).all()
+    # The page previews letters with the same scale the server will store
+    scales = class_scales({assignment.class_id for assignment in assignments})
+    grade_scales = {class_id: [[float(minimum), letter] for minimum, letter, _ in scale.bands()]
+                    for class_id, scale in scales.items()}
+    default_scale = [[float(minimum), letter] for minimum, letter, _ in DEFAULT_SCALE.bands()]
+    return render_template('teacher/grades.html', assignments=assignments,
+                           grade_scales=grade_scales, default_scale=default_scale)
 
 # Student Routes
 @app.route('/student/grades')
 @login_required
 @role_required('student')
 def student_grades():
-    student = Student.query.filter_by(user_id=current_user.id).first()
-    grades = Grade.query.filter_by(student_id=student.id).all()
+    grades = Grade.query.options(
+        joinedload(Grade.subject),
+        joinedload(Grade.teacher).joinedload(Teacher.user)
+    ).filter_by(student_id=current_user.student_profile_id).all()
     return render_template('student/grades.html', grades=grades)
 
 @app.route('/student/attendance')
 @login_required
 @role_required('student')
 def student_attendance():
-    student = Student.query.filter_by(user_id=current_user.id).first()
-    attendance = Attendance.query.filter_by(student_id=student.id).all()
-    return render_template('student/attendance.html', attendance=attendance)
+    student_id = current_user.student_profile_id
+    today = date.today()
+    try:
+        month = datetime.strptime(request.args['month'], '%Y-%m').date() if request.args.get('month') else today.replace(day=1)
+    except ValueError:
+        month = today.replace(day=1)
+    next_month = (month + timedelta(days=31)).replace(day=1)
+    term_start = attendance_term_start()
+
+    summary = student_attendance_summaries([student_id], term_start)[student_id]
+
+    # Monthly trend for the last twelve months, from at most ~365 daily rows
+    trend_start = (today.replace(day=1) - timedelta(days=335)).replace(day=1)
+    months = {}
+    for day in db.session.scalars(
+        select(StudentAttendanceDaily)
+        .where(StudentAttendanceDaily.student_id == student_id, StudentAttendanceDaily.date >= trend_start)
+    ):
+        totals = months.setdefault(day.date.strftime('%Y-%m'), [0, 0, 0])
+        for i, status in enumerate(ATTENDANCE_STATUSES):
+            totals[i] += getattr(day, status)
+    trend = [(label, attendance_figures(*months[label])['rate']) for label in sorted(months)]
+
+    # Calendar and records for one month
+    days = {day.date: day_status(day) for day in db.session.scalars(
+        select(StudentAttendanceDaily)
+        .where(StudentAttendanceDaily.student_id == student_id,
+               StudentAttendanceDaily.date >= month, StudentAttendanceDaily.date < next_month)
+    )}
+    weeks = calendar.Calendar(firstweekday=6).monthdatescalendar(month.year, month.month)
+    attendance = Attendance.query.options(
+        joinedload(Attendance.subject),
+        joinedload(Attendance.teacher).joinedload(Teacher.user)
+    ).filter(
+        Attendance.student_id == student_id, Attendance.date >= month, Attendance.date < next_month
+    ).order_by(Attendance.date.desc()).all()
+    return render_template('student/attendance.html', attendance=attendance, summary=summary,
+                           term_start=term_start, trend=trend, month=month, weeks=weeks, days=days)
 
 # Parent Routes
 @app.route('/parent/children')
 @login_required
 @role_required('parent')
 def parent_children():
-    children = Student.query.filter_by(parent_id=current_user.id).all()
-    return render_template('parent/children.html', children=children)
+    children = Student.query.options(
+        joinedload(Student.user),
+        joinedload(Student.school_class)
+    ).filter_by(parent_id=current_user.id).all()
+    attendance = student_attendance_summaries([child.id for child in children], attendance_term_start())
+    return render_template('parent/children.html', children=children, attendance=attendance)
 
 # Additional Student Routes
 @app.route('/student/fees')
 @login_required
 @role_required('student')
 def student_fees():
-    student = Student.query.filter_by(user_id=current_user.id).first()
-    fees = Fee.query.filter_by(student_id=student.id).all() if student else []
-    return render_template('student/fees.html', fees=fees, student=student)
+    student_id = current_user.student_profile_id
+    fees = Fee.query.filter_by(student_id=student_id).all() if student_id else []
+    return render_template('student/fees.html', fees=fees)
 
 @app.route('/student/timetable')
 @login_required
 @role_required('student')
 def student_timetable():
-    student = Student.query.filter_by(user_id=current_user.id).first()
-    if student and student.school_class:
-        timetable = Timetable.query.filter_by(class_id=student.class_id).all()
+    if current_user.class_id:
+        timetable = Timetable.query.filter_by(class_id=current_user.class_id).all()
     else:
         timetable = []
     return render_template('student/timetable.html', timetable=timetable)
@@ -963,15 +2243,15 @@ def student_timetable():
 @login_required
 @role_required('student')
 def student_library():
-    student = Student.query.filter_by(user_id=current_user.id).first()
-    if not student:
+    student_id = current_user.student_profile_id
+    if not student_id:
         flash('Student profile not found', 'error')
         return redirect(url_for('dashboard'))
     
     # Get books issued to this student
     issued_books = db.session.query(BookIssue, Book).join(Book, BookIssue.book_id == Book.id).filter(
-        BookIssue.student_id == student.id,
-        BookIssue.status == 'issued'
+        BookIssue.student_id == student_id,
+        BookIssue.status.in_(OPEN_ISSUE_STATUSES)
     ).all()
     
     # Get all available books
@@ -979,28 +2259,32 @@ def student_library():
     
     return render_template('student/library.html', 
                          issued_books=issued_books,
-                         available_books=available_books,
-                         student=student)
+                         available_books=available_books)
 
 @app.route('/student/pay-fee/<int:fee_id>', methods=['POST'])
 @login_required
 @role_required('student')
 def pay_fee(fee_id):
     try:
-        student = Student.query.filter_by(user_id=current_user.id).first()
-        if not student:
+        student_id = current_user.student_profile_id
+        if not student_id:
             return jsonify({'error': 'Student not found'}), 404
         
-        fee = Fee.query.filter_by(id=fee_id, student_id=student.id).first()
+        fee = Fee.query.filter_by(id=fee_id, student_id=student_id).first()
         if not fee:
             return jsonify({'error': 'Fee record not found'}), 404
         
         # Simulate payment processing
+        bump_stat('overdue_fees', -int(fee.status == 'overdue'))
+        old_receipt = fee.receipt_number
         fee.status = 'paid'
         fee.payment_date = date.today()
         fee.payment_method = request.json.get('payment_method', 'online')
+        fee.receipt_number = None
         
         db.session.commit()
+        remove_receipt_files([old_receipt])
+        store_receipt(fee)
         
         return jsonify({
             'success': True,
@@ -1011,30 +2295,45 @@ def pay_fee(fee_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/student/receipt/<int:fee_id>')
-@login_required
-@role_required('student')
-def download_receipt(fee_id):
-    student = Student.query.filter_by(user_id=current_user.id).first()
-    if not student:
-        flash('Student not found', 'error')
-        return redirect(url_for('student_fees'))
-    
-    fee = Fee.query.filter_by(id=fee_id, student_id=student.id).first()
-    if not fee:
-        flash('Fee record not found', 'error')
-        return redirect(url_for('student_fees'))
-    
-    # Generate a simple receipt (in a real app, you'd generate a PDF)
-    receipt_content = f"""
+# Fee receipts
+# A receipt is rendered once, when the fee is paid, and stored under
+# instance/receipts by receipt number. Fee.receipt_number records that it
+# exists. Each payment gets a new random number, never one derived from the
+# fee id, so a stored file can only ever belong to the payment it was written
+# for. A stored receipt is never rewritten: editing a paid fee leaves it as
+# issued, and deleting a fee or marking it unpaid clears its number and
+# removes the file. That makes /receipts/<number> immutable, so it is cached
+# for a year; the per-fee download URLs redirect to it. Fees paid before
+# receipts were stored get theirs on first download or in a bulk archive.
+
+def receipts_dir():
+    return os.path.join(app.instance_path, 'receipts')
+
+def receipt_filename(number):
+    return f'{number}.txt'
+
+def new_receipt_number():
+    return f'RCP-{secrets.token_hex(6).upper()}'
+
+def remove_receipt_files(numbers):
+    """Delete stored receipts once the fees they were written for have changed or gone"""
+    for number in numbers:
+        if number:
+            try:
+                os.remove(os.path.join(receipts_dir(), receipt_filename(number)))
+            except FileNotFoundError:
+                pass
+
+def render_receipt(number, fee, student_number, first_name, last_name):
+    return f"""
     SCHOOL MANAGEMENT SYSTEM
     PAYMENT RECEIPT
     
-    Receipt ID: RCP-{fee_id:06d}
+    Receipt ID: {number}
     Date: {fee.payment_date}
     
-    Student: {current_user.first_name} {current_user.last_name}
-    Student ID: {student.student_id}
+    Student: {first_name} {last_name}
+    Student ID: {student_number}
     
     Fee Type: {fee.fee_type}
     Amount: ${fee.amount:.2f}
@@ -1043,76 +2342,889 @@ def download_receipt(fee_id):
     
     Thank you for your payment!
     """
-    
-    from flask import Response
-    return Response(
-        receipt_content,
-        mimetype='text/plain',
-        headers={'Content-Disposition': f'attachment; filename=receipt_{fee_id}.txt'}
-    )
 
-# API Routes for AJAX calls
-@app.route('/api/students/<int:class_id>')
-@login_required
-@role_required('teacher')
-def api_students_by_class(class_id):
-    students = db.session.query(Student, User).join(User, Student.user_id == User.id).filter(Student.class_id == class_id).all()
-    return jsonify([{
-        'id': student.id,
-        'student_id': student.student_id,
-        'name': f"{user.first_name} {user.last_name}"
-    } for student, user in students])
+def issue_receipts(fee_ids):
+    """Store receipts for the paid fees among fee_ids that don't have one on disk; returns how many were written"""
+    os.makedirs(receipts_dir(), exist_ok=True)
+    written = 0
+    for start in range(0, len(fee_ids), UPSERT_CHUNK_SIZE):
+        rows = db.session.execute(
+            select(Fee, Student.student_id, User.first_name, User.last_name)
+            .join(Student, Fee.student_id == Student.id)
+            .join(User, Student.user_id == User.id)
+            .where(Fee.id.in_(fee_ids[start:start + UPSERT_CHUNK_SIZE]), Fee.status == 'paid')
+        ).all()
+        numbered = []
+        for fee, student_number, first_name, last_name in rows:
+            number = fee.receipt_number or new_receipt_number()
+            path = os.path.join(receipts_dir(), receipt_filename(number))
+            if not os.path.exists(path):
+                # Write then rename, so a reader never sees half a receipt
+                with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                    f.write(render_receipt(number, fee, student_number, first_name, last_name))
+                os.replace(path + '.tmp', path)
+                written += 1
+            if not fee.receipt_number:
+                numbered.append({'fee_id': fee.id, 'number': number})
+        if numbered:
+            db.session.execute(
+                update(Fee.__table__).where(Fee.__table__.c.id == bindparam('fee_id'))
+                .values(receipt_number=bindparam('number')),
+                numbered
+            )
+    return written
 
-@app.route('/api/attendance', methods=['POST'])
+def store_receipt(fee):
+    """Issue the receipt for a fee that was just paid; the payment stands if this fails"""
+    try:
+        issue_receipts([fee.id])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('Could not store receipt for fee %s', fee.id)
+
+RECEIPT_MAX_AGE = 365 * 24 * 3600
+
+def ensure_receipt(fee):
+    """Store a paid fee's receipt if it has none on disk yet"""
+    if not fee.receipt_number or not os.path.exists(os.path.join(receipts_dir(), receipt_filename(fee.receipt_number))):
+        issue_receipts([fee.id])
+        db.session.commit()
+        db.session.refresh(fee)
+
+def redirect_to_receipt(fee):
+    ensure_receipt(fee)
+    return redirect(url_for('receipt_file', number=fee.receipt_number))
+
+def receipt_archive_fee_ids(class_id=None, date_from=None, date_to=None):
+    """Ids of paid fees by payment date, optionally for one class"""
+    stmt = select(Fee.id).where(Fee.status == 'paid')
+    if class_id is not None:
+        stmt = stmt.join(Student, Fee.student_id == Student.id).where(Student.class_id == class_id)
+    if date_from:
+        stmt = stmt.where(Fee.payment_date >= date_from)
+    if date_to:
+        stmt = stmt.where(Fee.payment_date <= date_to)
+    return list(db.session.scalars(stmt.order_by(Fee.payment_date, Fee.id)))
+
+def write_receipt_archive(fee_ids, out):
+    """Zip the stored receipts of fee_ids, storing any that are missing first; returns the count"""
+    issue_receipts(fee_ids)
+    db.session.commit()
+    count = 0
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for start in range(0, len(fee_ids), UPSERT_CHUNK_SIZE):
+            numbers = db.session.scalars(
+                select(Fee.receipt_number)
+                .where(Fee.id.in_(fee_ids[start:start + UPSERT_CHUNK_SIZE]), Fee.receipt_number.is_not(None))
+            )
+            for number in numbers:
+                filename = receipt_filename(number)
+                archive.write(os.path.join(receipts_dir(), filename), filename)
+                count += 1
+    return count
+
+def spooled_chunks(spool):
+    """Yield a temporary file's contents from the start in 64 KB chunks, then close it"""
+    spool.seek(0)
+    with spool:
+        while True:
+            chunk = spool.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+@app.cli.command('receipts')
+@click.option('--class', 'class_id', type=int, help='Only students in this class')
+@click.option('--from', 'date_from', type=click.DateTime(['%Y-%m-%d']), help='First payment date')
+@click.option('--to', 'date_to', type=click.DateTime(['%Y-%m-%d']), help='Last payment date')
+@click.option('--out', required=True, type=click.Path(dir_okay=False), help='Zip file to write')
+def receipts_command(class_id, date_from, date_to, out):
+    """Write the receipts of paid fees to a zip."""
+    fee_ids = receipt_archive_fee_ids(class_id, date_from.date() if date_from else None,
+                                      date_to.date() if date_to else None)
+    click.echo(f"✅ Wrote {write_receipt_archive(fee_ids, out)} receipts to {out}")
+
+@app.route('/student/receipt/<int:fee_id>')
 @login_required
-@role_required('teacher')
-def api_mark_attendance():
-    data = request.get_json()
-    teacher = Teacher.query.filter_by(user_id=current_user.id).first()
+@role_required('student')
+def download_receipt(fee_id):
+    student_id = current_user.student_profile_id
+    if not student_id:
+        flash('Student not found', 'error')
+        return redirect(url_for('student_fees'))
     
-    for record in data.get('attendance', []):
-        attendance = Attendance(
-            student_id=record['student_id'],
-            date=datetime.strptime(record['date'], '%Y-%m-%d').date(),
-            status=record['status'],
-            subject_id=record.get('subject_id'),
-            remarks=record.get('remarks'),
-            marked_by=teacher.id
-        )
-        db.session.add(attendance)
+    fee = Fee.query.filter_by(id=fee_id, student_id=student_id).first()
+    if not fee:
+        flash('Fee record not found', 'error')
+        return redirect(url_for('student_fees'))
+    if fee.status != 'paid':
+        flash('A receipt is available once the fee is paid', 'error')
+        return redirect(url_for('student_fees'))
     
+    return redirect_to_receipt(fee)
+
+@app.route('/admin/fees/<int:fee_id>/receipt')
+@login_required
+@role_required('admin')
+def admin_fee_receipt(fee_id):
+    fee = Fee.query.get_or_404(fee_id)
+    if fee.status != 'paid':
+        flash('A receipt is available once the fee is paid', 'error')
+        return redirect(url_for('admin_fees'))
+    return redirect_to_receipt(fee)
+
+@app.route('/receipts/<number>')
+@login_required
+def receipt_file(number):
+    fee = Fee.query.filter_by(receipt_number=number).first()
+    if not fee or not (current_user.role == 'admin' or
+                       (current_user.role == 'student' and fee.student_id == current_user.student_profile_id)):
+        return jsonify({'error': 'Receipt not found'}), 404
+    ensure_receipt(fee)
+    response = send_from_directory(receipts_dir(), receipt_filename(number), mimetype='text/plain',
+                                   as_attachment=True, download_name=f'receipt_{number}.txt',
+                                   conditional=True, etag=True, max_age=RECEIPT_MAX_AGE)
+    # Receipts are personal, so only the user's own browser may keep one
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/admin/fees/receipts.zip')
+@login_required
+@role_required('admin')
+def download_receipts():
+    try:
+        class_id = int(request.args['class_id']) if request.args.get('class_id') else None
+        date_from = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else None
+        date_to = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'class_id must be an integer and dates must be in YYYY-MM-DD format'}), 400
+
+    # zipfile needs to seek, so the archive is spooled to disk and then streamed
+    spool = tempfile.TemporaryFile()
+    write_receipt_archive(receipt_archive_fee_ids(class_id, date_from, date_to), spool)
+    filename = f"receipts-{date.today().isoformat()}.zip"
+    return Response(spooled_chunks(spool), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+# Streaming exports
+# Each export is a plain column SELECT read through a server-side cursor
+# (stream_results) EXPORT_BATCH_SIZE rows at a time and written straight into
+# the response, so a worker's memory stays flat however many rows go out.
+# XLSX uses openpyxl's write-only workbook, spooled to a temporary file
+# and then streamed.
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+def export_student_columns():
+    return [('Student ID', Student.student_id), ('First Name', User.first_name), ('Last Name', User.last_name),
+            ('Class', SchoolClass.name)]
+
+def export_query(table, *columns):
+    """SELECT of labelled columns from a per-student table joined to the student's name and class"""
+    stmt = (select(*[column.label(label) for label, column in columns])
+            .select_from(table)
+            .join(Student, table.student_id == Student.id)
+            .join(User, Student.user_id == User.id)
+            .outerjoin(SchoolClass, Student.class_id == SchoolClass.id))
+    return [label for label, _ in columns], stmt
+
+# Each export returns (table, date column for from/to, headers, statement)
+
+def fee_export():
+    headers, stmt = export_query(Fee, *export_student_columns(),
+        ('Fee Type', Fee.fee_type), ('Amount', Fee.amount), ('Due Date', Fee.due_date), ('Status', Fee.status),
+        ('Payment Date', Fee.payment_date), ('Payment Method', Fee.payment_method),
+        ('Academic Year', Fee.academic_year))
+    return Fee, Fee.due_date, headers, stmt
+
+def attendance_export():
+    headers, stmt = export_query(Attendance, ('Date', Attendance.date), *export_student_columns(),
+        ('Subject', Subject.name), ('Status', Attendance.status), ('Remarks', Attendance.remarks))
+    return Attendance, Attendance.date, headers, stmt.outerjoin(Subject, Attendance.subject_id == Subject.id)
+
+def grade_export():
+    headers, stmt = export_query(Grade, ('Exam Date', Grade.exam_date), *export_student_columns(),
+        ('Subject', Subject.name), ('Exam Type', Grade.exam_type), ('Marks', Grade.marks_obtained),
+        ('Total Marks', Grade.total_marks), ('Percentage', Grade.percentage), ('Grade', Grade.grade_letter))
+    return Grade, Grade.exam_date, headers, stmt.join(Subject, Grade.subject_id == Subject.id)
+
+def book_issue_export():
+    headers, stmt = export_query(BookIssue, ('Issue Date', BookIssue.issue_date), *export_student_columns(),
+        ('Title', Book.title), ('ISBN', Book.isbn), ('Due Date', BookIssue.due_date),
+        ('Return Date', BookIssue.return_date), ('Status', BookIssue.status), ('Fine', BookIssue.fine_amount))
+    return BookIssue, BookIssue.issue_date, headers, stmt.join(Book, BookIssue.book_id == Book.id)
+
+EXPORTS = {
+    'fees': fee_export,
+    'attendance': attendance_export,
+    'grades': grade_export,
+    'book-issues': book_issue_export,
+}
+
+def export_year_filter(table, date_column, academic_year):
+    """Fees and grades record their academic year; attendance and library issues fall within its dates"""
+    if table in (Fee, Grade):
+        return table.academic_year == academic_year
+    return date_column.between(*academic_year_dates(academic_year))
+
+def export_class_filter(table, date_column, class_id):
+    """A class's records: its students' records from the class's year
+
+    Students change class at a rollover, so a student counts as the class's
+    when the attendance rollups recorded a day in it, as well as when it is
+    their current class. Attendance goes by the class each day was marked in.
+    """
+    school_class = db.session.get(SchoolClass, class_id)
+    if school_class is None:
+        return Student.class_id == class_id
+    marked_in_class = select(StudentAttendanceDaily.id).where(StudentAttendanceDaily.student_id == table.student_id,
+                                                              StudentAttendanceDaily.class_id == class_id)
+    if table is Attendance:
+        return marked_in_class.where(StudentAttendanceDaily.date == Attendance.date).exists()
+    return and_(or_(Student.class_id == class_id, marked_in_class.exists()),
+                export_year_filter(table, date_column, school_class.academic_year))
+
+def export_statement(dataset, args):
+    """Build (headers, statement) for an export, filtered by the request arguments"""
+    table, date_column, headers, stmt = EXPORTS[dataset]()
+    if args.get('class_id'):
+        stmt = stmt.where(export_class_filter(table, date_column, int(args['class_id'])))
+    if args.get('from'):
+        stmt = stmt.where(date_column >= datetime.strptime(args['from'], '%Y-%m-%d').date())
+    if args.get('to'):
+        stmt = stmt.where(date_column <= datetime.strptime(args['to'], '%Y-%m-%d').date())
+    if args.get('academic_year'):
+        stmt = stmt.where(export_year_filter(table, date_column, args['academic_year']))
+    if args.get('status') and hasattr(table, 'status'):
+        stmt = stmt.where(table.status == args['status'])
+    if args.get('fee_type') and table is Fee:
+        stmt = stmt.where(Fee.fee_type == args['fee_type'])
+    return headers, stmt.order_by(table.id)
+
+def export_rows(stmt):
+    """Yield result rows from a server-side cursor, one batch in memory at a time"""
+    result = db.session.execute(stmt.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE))
+    for partition in result.partitions():
+        yield from partition
+
+def csv_chunks(headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def xlsx_chunks(headers, rows, sheet_title):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_title)
+    sheet.append(headers)
+    for row in rows:
+        sheet.append([float(value) if isinstance(value, Decimal) else value for value in row])
+    with tempfile.TemporaryFile() as spool:
+        workbook.save(spool)
+        spool.seek(0)
+        while True:
+            chunk = spool.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+@app.route('/admin/exports')
+@login_required
+@role_required('admin')
+def admin_exports():
+    classes = SchoolClass.query.order_by(SchoolClass.academic_year.desc(), SchoolClass.grade_level, SchoolClass.section).all()
+    academic_years = sorted({c.academic_year for c in classes}, reverse=True)
+    current_year = app.config['CURRENT_ACADEMIC_YEAR']
+    grade_levels = sorted({c.grade_level for c in classes if c.academic_year == current_year})
+    return render_template('admin/exports.html', classes=classes, academic_years=academic_years,
+                           datasets=list(EXPORTS), formats=EXPORT_FORMATS,
+                           current_year=current_year, grade_levels=grade_levels)
+
+@app.route('/admin/exports/<dataset>.<fmt>')
+@login_required
+@role_required('admin')
+def export_data(dataset, fmt):
+    if dataset not in EXPORTS or fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'Unknown export'}), 404
+    try:
+        headers, stmt = export_statement(dataset, request.args)
+    except ValueError:
+        return jsonify({'error': 'class_id must be an integer and dates must be in YYYY-MM-DD format'}), 400
+
+    filename = f"{dataset}-{date.today().isoformat()}.{fmt}"
+    if fmt == 'xlsx':
+        body = xlsx_chunks(headers, export_rows(stmt), dataset)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        body = csv_chunks(headers, export_rows(stmt))
+        mimetype = 'text/csv'
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+# Report cards
+# report_card_data reads everything a batch of cards needs in a fixed number
+# of queries (class members, students, grades, attendance counts, remarks,
+# grading scales) however many students there are. Members are found from the
+# year's records rather than current enrolment, so cards for an earlier year
+# still list the students a rollover has since moved. The cards are then
+# rendered to PDF in
+# REPORT_CARD_WORKERS processes and written into one zip with a folder per
+# class.
+
+REPORT_CARD_POOL_MIN = 20
+REPORT_CARD_SCHOOL = 'School Management System'
+
+def report_card_classes(academic_year, class_id=None, grade_level=None):
+    """Ids of the classes a report card run covers: one class or every class in a grade"""
+    stmt = select(SchoolClass.id).where(SchoolClass.academic_year == academic_year)
+    if class_id is not None:
+        stmt = stmt.where(SchoolClass.id == class_id)
+    elif grade_level is not None:
+        stmt = stmt.where(SchoolClass.grade_level == grade_level)
+    else:
+        raise ValueError('Choose a class or a grade level')
+    return list(db.session.scalars(stmt.order_by(SchoolClass.name)))
+
+def report_card_score(percentages, scale=DEFAULT_SCALE):
+    percentage = sum(percentages) / len(percentages)
+    return percentage, calculate_letter_grade(percentage, scale)
+
+def report_card_members(class_ids, academic_year):
+    """{student id: class id} for the students of the classes, all of academic_year, during that year
+
+    A student is in their current class if it belongs to academic_year.
+    Otherwise, as after a rollover, they are in the class the attendance
+    rollups recorded most of their days of the year in or, without
+    attendance, the class whose teaching assignments most of their grades
+    for the year were entered under.
+    """
+    class_ids = list(class_ids)
+    year_from, year_to = academic_year_dates(academic_year)
+    year_days = (select(StudentAttendanceDaily.student_id, StudentAttendanceDaily.class_id)
+                 .where(StudentAttendanceDaily.date.between(year_from, year_to)))
+    year_grades = (select(Grade.student_id, TeacherSubject.class_id)
+                   .join(TeacherSubject, and_(TeacherSubject.teacher_id == Grade.teacher_id,
+                                              TeacherSubject.subject_id == Grade.subject_id))
+                   .join(SchoolClass, TeacherSubject.class_id == SchoolClass.id)
+                   .where(Grade.academic_year == academic_year, SchoolClass.academic_year == academic_year))
+    candidates = (select(Student.id).where(Student.class_id.in_(class_ids))
+                  .union(year_days.with_only_columns(StudentAttendanceDaily.student_id)
+                         .where(StudentAttendanceDaily.class_id.in_(class_ids)),
+                         year_grades.with_only_columns(Grade.student_id).where(TeacherSubject.class_id.in_(class_ids))))
+
+    current = dict(db.session.execute(
+        select(Student.id, Student.class_id).join(SchoolClass, Student.class_id == SchoolClass.id)
+        .where(Student.id.in_(candidates), SchoolClass.academic_year == academic_year)
+    ).all())
+    # student id -> ((source rank, count), class id) of the best evidence so far
+    evidence = {}
+    for rank, stmt in ((2, year_days.where(StudentAttendanceDaily.student_id.in_(candidates))
+                           .add_columns(func.count()).group_by(StudentAttendanceDaily.student_id,
+                                                               StudentAttendanceDaily.class_id)),
+                       (1, year_grades.where(Grade.student_id.in_(candidates))
+                           .add_columns(func.count()).group_by(Grade.student_id, TeacherSubject.class_id))):
+        for student_id, class_id, count in db.session.execute(stmt):
+            if class_id is not None and (rank, count) > evidence.get(student_id, ((0, 0), None))[0]:
+                evidence[student_id] = ((rank, count), class_id)
+
+    members = {student_id: class_id for student_id, (_, class_id) in evidence.items()}
+    members.update(current)
+    return {student_id: class_id for student_id, class_id in members.items() if class_id in class_ids}
+
+def report_card_data(class_ids, academic_year, date_from=None, date_to=None):
+    """Build the card dicts render_report_card expects for every student in the classes during academic_year
+
+    Only grades recorded for academic_year and attendance within its dates
+    count, so a promoted student's card leaves out other years.
+    """
+    members = report_card_members(class_ids, academic_year)
+    class_students = list(members)
+    teacher_user = aliased(User)
+    classes = {row[0]: row[1:] for row in db.session.execute(
+        select(SchoolClass.id, SchoolClass.name, SchoolClass.grade_level, teacher_user.first_name, teacher_user.last_name)
+        .outerjoin(Teacher, SchoolClass.class_teacher_id == Teacher.id)
+        .outerjoin(teacher_user, Teacher.user_id == teacher_user.id)
+        .where(SchoolClass.id.in_(class_ids))
+    )}
+    students = sorted(
+        ((student_id, number, first_name, last_name, *classes[members[student_id]])
+         for student_id, number, first_name, last_name in db.session.execute(
+             select(Student.id, Student.student_id, User.first_name, User.last_name)
+             .join(User, Student.user_id == User.id)
+             .where(Student.id.in_(class_students)))),
+        key=lambda row: (row[4], row[3], row[2]))
+
+    year_from, year_to = academic_year_dates(academic_year)
+    grades_stmt = (select(Grade.student_id, Subject.name, Grade.exam_type, Grade.percentage)
+                   .join(Subject, Grade.subject_id == Subject.id)
+                   .where(Grade.student_id.in_(class_students), Grade.academic_year == academic_year))
+    attendance_stmt = (select(Attendance.student_id, Attendance.status, func.count())
+                       .where(Attendance.student_id.in_(class_students),
+                              Attendance.date.between(year_from, year_to))
+                       .group_by(Attendance.student_id, Attendance.status))
+    if date_from:
+        grades_stmt = grades_stmt.where(Grade.exam_date >= date_from)
+        attendance_stmt = attendance_stmt.where(Attendance.date >= date_from)
+    if date_to:
+        grades_stmt = grades_stmt.where(Grade.exam_date <= date_to)
+        attendance_stmt = attendance_stmt.where(Attendance.date <= date_to)
+
+    # student id -> subject -> exam type -> [percentage, ...]
+    grades = {}
+    exam_types = set()
+    for student_id, subject, exam_type, percentage in db.session.execute(grades_stmt):
+        if percentage is None:
+            continue
+        exam_types.add(exam_type)
+        grades.setdefault(student_id, {}).setdefault(subject, {}).setdefault(exam_type, []).append(float(percentage))
+    exam_types = sorted(exam_types)
+
+    attendance = {}
+    for student_id, status, count in db.session.execute(attendance_stmt):
+        attendance.setdefault(student_id, {})[status] = count
+
+    remarks = dict(db.session.execute(
+        select(ReportRemark.student_id, ReportRemark.remarks)
+        .where(ReportRemark.student_id.in_(class_students), ReportRemark.academic_year == academic_year)
+    ).all())
+
+    if date_from or date_to:
+        period = f"{date_from.isoformat() if date_from else 'start'} to {date_to.isoformat() if date_to else 'today'}"
+    else:
+        period = f'Academic year {academic_year}'
+
+    scales = load_grading_scales()
+    cards = []
+    for student_id, number, first_name, last_name, class_name, grade_level, teacher_first, teacher_last in students:
+        scale = scale_for(scales, academic_year, grade_level)
+        subjects = []
+        all_percentages = []
+        for subject, scores in sorted(grades.get(student_id, {}).items()):
+            percentages = [p for values in scores.values() for p in values]
+            all_percentages.extend(percentages)
+            subjects.append({
+                'name': subject,
+                'scores': {exam_type: report_card_score(values, scale) for exam_type, values in scores.items()},
+                'average': report_card_score(percentages, scale)
+            })
+        counts = attendance.get(student_id, {})
+        total = sum(counts.values())
+        attended = counts.get('present', 0) + counts.get('late', 0)
+        cards.append({
+            'school': REPORT_CARD_SCHOOL,
+            'academic_year': academic_year,
+            'student': {
+                'name': f'{first_name} {last_name}',
+                'student_id': number,
+                'class': class_name,
+                'class_teacher': f'{teacher_first} {teacher_last}' if teacher_first else None
+            },
+            'period': period,
+            'exam_types': exam_types,
+            'subjects': subjects,
+            'overall': report_card_score(all_percentages, scale) if all_percentages else None,
+            'attendance': {
+                'present': counts.get('present', 0),
+                'late': counts.get('late', 0),
+                'absent': counts.get('absent', 0),
+                'total': total,
+                'rate': attended * 100 / total if total else 0
+            },
+            'remarks': remarks.get(student_id)
+        })
+    return cards
+
+def report_card_filename(card):
+    student = card['student']
+    name = f"{student['class']}/{student['student_id']}-{student['name']}.pdf"
+    return ''.join(c if c.isalnum() or c in '/.-' else '_' for c in name)
+
+def write_report_cards(cards, out):
+    """Render cards to PDF and write them into a zip; out is a path or a binary file object"""
+    workers = app.config['REPORT_CARD_WORKERS']
+    pool = None
+    if len(cards) >= REPORT_CARD_POOL_MIN and workers > 1:
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        if pool:
+            pdfs = pool.map(render_report_card, cards, chunksize=max(1, len(cards) // (workers * 4)))
+        else:
+            pdfs = map(render_report_card, cards)
+        with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for card, pdf in zip(cards, pdfs):
+                archive.writestr(report_card_filename(card), pdf)
+    finally:
+        if pool:
+            pool.shutdown()
+    return len(cards)
+
+def report_card_scope(args):
+    """(academic year, class ids, from, to) from request args; raises ValueError on bad input"""
+    academic_year = args.get('academic_year') or app.config['CURRENT_ACADEMIC_YEAR']
+    class_id = int(args['class_id']) if args.get('class_id') else None
+    grade_level = int(args['grade_level']) if args.get('grade_level') and class_id is None else None
+    date_from = datetime.strptime(args['from'], '%Y-%m-%d').date() if args.get('from') else None
+    date_to = datetime.strptime(args['to'], '%Y-%m-%d').date() if args.get('to') else None
+    return academic_year, report_card_classes(academic_year, class_id, grade_level), date_from, date_to
+
+@app.cli.command('report-cards')
+@click.option('--class', 'class_id', type=int, help='Class id')
+@click.option('--grade', 'grade_level', type=int, help='Every class in this grade level')
+@click.option('--year', 'academic_year', help='Academic year (default: CURRENT_ACADEMIC_YEAR)')
+@click.option('--from', 'date_from', type=click.DateTime(['%Y-%m-%d']), help='First exam/attendance date')
+@click.option('--to', 'date_to', type=click.DateTime(['%Y-%m-%d']), help='Last exam/attendance date')
+@click.option('--out', required=True, type=click.Path(dir_okay=False), help='Zip file to write')
+def report_cards_command(class_id, grade_level, academic_year, date_from, date_to, out):
+    """Write report cards for a class or grade to a zip of PDFs."""
+    academic_year = academic_year or app.config['CURRENT_ACADEMIC_YEAR']
     try:
+        class_ids = report_card_classes(academic_year, class_id, grade_level)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    if not class_ids:
+        raise click.ClickException(f'No matching classes in {academic_year}')
+    started = time.perf_counter()
+    cards = report_card_data(class_ids, academic_year,
+                             date_from.date() if date_from else None, date_to.date() if date_to else None)
+    written = write_report_cards(cards, out)
+    click.echo(f"✅ Wrote {written} report cards for {len(class_ids)} class(es) to {out} "
+               f"in {time.perf_counter() - started:.1f}s")
+
+@app.route('/admin/report-cards.zip')
+@login_required
+@role_required('admin')
+def download_report_cards():
+    try:
+        academic_year, class_ids, date_from, date_to = report_card_scope(request.args)
+    except ValueError:
+        return jsonify({'error': 'Choose a class or grade level; dates must be in YYYY-MM-DD format'}), 400
+    if not class_ids:
+        return jsonify({'error': f'No matching classes in {academic_year}'}), 404
+
+    cards = report_card_data(class_ids, academic_year, date_from, date_to)
+    # zipfile needs to seek, so the archive is spooled to disk and then streamed
+    spool = tempfile.TemporaryFile()
+    write_report_cards(cards, spool)
+    filename = f"report-cards-{date.today().isoformat()}.zip"
+    return Response(spooled_chunks(spool), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+# Grade analytics
+# Grade rows for all the classes being computed, limited to the grades
+# recorded for the classes' academic year, are read in one query as columns
+# and handed to analytics.school_results, which computes GPAs, ranks
+# and subject statistics with numpy. Results are cached per (class, exam type,
+# academic year) for ANALYTICS_CACHE_TTL seconds; grade writes drop the
+# entries of the classes they touch, and other worker processes pick changes
+# up when the TTL runs out.
+
+ANALYTICS_CACHE_SIZE = 5000
+analytics_cache = {}
+
+def invalidate_grade_analytics(class_ids=None):
+    """Drop cached results for the given classes, or for every class"""
+    if class_ids is None:
+        analytics_cache.clear()
+        return
+    class_ids = set(class_ids)
+    for key in [key for key in analytics_cache if key[0] in class_ids]:
+        del analytics_cache[key]
+
+def grades_written(rows):
+    invalidate_grade_analytics(db.session.scalars(
+        select(Student.class_id).where(Student.id.in_({row['student_id'] for row in rows})).distinct()
+    ))
+
+def compute_grade_analytics(class_ids, academic_year, exam_type=None):
+    """Compute and cache results for several classes of one year from a single query; returns {class id: results}"""
+    stmt = (select(Student.class_id, Grade.student_id, Grade.subject_id,
+                   func.coalesce(Subject.credits, 1), cast(Grade.percentage, Float))
+            .join(Student, Grade.student_id == Student.id)
+            .join(Subject, Grade.subject_id == Subject.id)
+            .where(Student.class_id.in_(class_ids), Grade.academic_year == academic_year,
+                   Grade.percentage.isnot(None)))
+    if exam_type:
+        stmt = stmt.where(Grade.exam_type == exam_type)
+    # Plain Core rows: the ORM result layer costs more than the arithmetic here
+    rows = db.session.connection().execute(stmt).all()
+
+    results = school_results(*zip(*rows), scales=class_scales(class_ids)) if rows else {}
+    for class_id in class_ids:
+        results.setdefault(class_id, {'students': [], 'subjects': [], 'gpa': None})
+
+    now = time.monotonic()
+    if len(analytics_cache) + len(results) > ANALYTICS_CACHE_SIZE:
+        for key in [key for key, (expires, _) in analytics_cache.items() if expires <= now]:
+            del analytics_cache[key]
+    for class_id, result in results.items():
+        if len(analytics_cache) < ANALYTICS_CACHE_SIZE:
+            analytics_cache[(class_id, exam_type, academic_year)] = (now + app.config['ANALYTICS_CACHE_TTL'], result)
+    return results
+
+def grade_analytics(classes, exam_type=None):
+    """{class id: results} for SchoolClass objects, computing the uncached ones together"""
+    now = time.monotonic()
+    results = {}
+    missing = {}
+    for school_class in classes:
+        cached = analytics_cache.get((school_class.id, exam_type, school_class.academic_year))
+        if cached and cached[0] > now:
+            results[school_class.id] = cached[1]
+        else:
+            missing.setdefault(school_class.academic_year, []).append(school_class.id)
+    for academic_year, class_ids in missing.items():
+        results.update(compute_grade_analytics(class_ids, academic_year, exam_type))
+    return results
+
+def exam_types():
+    return list(db.session.scalars(select(Grade.exam_type).distinct().order_by(Grade.exam_type)))
+
+@app.cli.command('grade-analytics')
+@click.option('--year', 'academic_year', help='Academic year (default: CURRENT_ACADEMIC_YEAR)')
+@click.option('--exam-type', help='Only this exam type (default: all)')
+def grade_analytics_command(academic_year, exam_type):
+    """Compute GPAs, ranks and subject statistics for every class in a year."""
+    academic_year = academic_year or app.config['CURRENT_ACADEMIC_YEAR']
+    classes = SchoolClass.query.filter_by(academic_year=academic_year).order_by(SchoolClass.name).all()
+    started = time.perf_counter()
+    results = grade_analytics(classes, exam_type)
+    elapsed = time.perf_counter() - started
+    for school_class in classes:
+        gpa = results[school_class.id]['gpa']
+        summary = f"mean GPA {gpa['mean']:.2f}, median {gpa['median']:.2f}" if gpa else 'no grades'
+        click.echo(f"{school_class.name}: {len(results[school_class.id]['students'])} students, {summary}")
+    click.echo(f"✅ {len(classes)} classes in {elapsed:.2f}s")
+
+@app.route('/admin/results')
+@login_required
+@role_required('admin')
+def admin_results():
+    classes = SchoolClass.query.order_by(SchoolClass.academic_year.desc(), SchoolClass.grade_level, SchoolClass.section).all()
+    school_class = db.session.get(SchoolClass, request.args.get('class_id', type=int) or 0) or (classes[0] if classes else None)
+    exam_type = request.args.get('exam_type') or None
+    results = grade_analytics([school_class], exam_type)[school_class.id] if school_class else None
+
+    students = subjects = {}
+    if results:
+        students = {student.id: (student, user) for student, user in db.session.query(Student, User)
+                    .join(User, Student.user_id == User.id)
+                    .filter(Student.id.in_([row['student_id'] for row in results['students']]))}
+        subjects = dict(db.session.execute(
+            select(Subject.id, Subject.name).where(Subject.id.in_([row['subject_id'] for row in results['subjects']]))
+        ).all())
+    return render_template('admin/results.html', classes=classes, school_class=school_class,
+                           exam_types=exam_types(), exam_type=exam_type, results=results,
+                           students=students, subjects=subjects)
+
+@app.route('/api/v1/analytics/classes/<int:class_id>')
+@login_required
+@role_required('admin')
+def api_class_analytics(class_id):
+    school_class = db.session.get(SchoolClass, class_id)
+    if not school_class:
+        return jsonify({'error': 'Class not found'}), 404
+    exam_type = request.args.get('exam_type') or None
+    results = grade_analytics([school_class], exam_type)[class_id]
+    return jsonify(dict(results, class_id=class_id, academic_year=school_class.academic_year, exam_type=exam_type))
+
+# Grading scales
+# A stored scale applies to an academic year, a grade level, both, or the
+# whole school. Each class uses the most specific one that matches it, and
+# DEFAULT_SCALE when none does. Letters are stored on grades when they are
+# written; changing a scale rewrites the stored letters it affects with one
+# UPDATE per scale. A class's scale is applied to the grades of its year;
+# grades from a student's earlier years keep the letters they were given,
+# since the class the student was in then is not recorded.
+
+def load_grading_scales():
+    """{(academic_year, grade_level): Scale} for every stored scale"""
+    bands = {}
+    for academic_year, grade_level, minimum, letter, points in db.session.execute(
+        select(GradingScale.academic_year, GradingScale.grade_level, GradingScaleBand.min_percentage,
+               GradingScaleBand.letter, GradingScaleBand.grade_points)
+        .join(GradingScaleBand, GradingScaleBand.scale_id == GradingScale.id)
+    ):
+        bands.setdefault((academic_year, grade_level), []).append((minimum, letter, points))
+    return {key: Scale(rows) for key, rows in bands.items()}
+
+def scale_for(scales, academic_year, grade_level):
+    """The most specific scale: year and grade, then year, then grade, then school-wide"""
+    for key in ((academic_year, grade_level), (academic_year, None), (None, grade_level), (None, None)):
+        if key in scales:
+            return scales[key]
+    return DEFAULT_SCALE
+
+def class_scales(class_ids):
+    """{class id: Scale}; empty when no scale is stored, meaning the default everywhere"""
+    scales = load_grading_scales()
+    if not scales:
+        return {}
+    return {class_id: scale_for(scales, academic_year, grade_level)
+            for class_id, academic_year, grade_level in db.session.execute(
+                select(SchoolClass.id, SchoolClass.academic_year, SchoolClass.grade_level)
+                .where(SchoolClass.id.in_(class_ids)))}
+
+def assign_grade_letters(rows):
+    """Set academic_year and grade_letter on grade row dicts
+
+    A row without an academic year takes its student's class year, or
+    CURRENT_ACADEMIC_YEAR for a student without a class. The letter comes
+    from the scale for that year and, when it is the class's year, the
+    class's grade level.
+    """
+    scales = load_grading_scales()
+    classes = {student_id: (academic_year, grade_level) for student_id, academic_year, grade_level in db.session.execute(
+        select(Student.id, SchoolClass.academic_year, SchoolClass.grade_level)
+        .join(SchoolClass, Student.class_id == SchoolClass.id)
+        .where(Student.id.in_({row['student_id'] for row in rows}))
+    )}
+    for row in rows:
+        class_year, grade_level = classes.get(row['student_id'], (app.config['CURRENT_ACADEMIC_YEAR'], None))
+        row['academic_year'] = row.get('academic_year') or class_year
+        scale = scale_for(scales, row['academic_year'], grade_level if row['academic_year'] == class_year else None)
+        row['grade_letter'] = scale.letter(row['percentage'])
+
+def regrade_letters(academic_year=None, grade_level=None):
+    """Rewrite stored letters that disagree with their class's scale; returns the number changed
+
+    Limited to classes in academic_year and grade_level when given. Each
+    distinct scale is one UPDATE with a CASE over its bands, and only rows
+    whose letter differs are written, so running it twice changes nothing.
+    """
+    scales = load_grading_scales()
+    stmt = select(SchoolClass.id, SchoolClass.academic_year, SchoolClass.grade_level)
+    if academic_year is not None:
+        stmt = stmt.where(SchoolClass.academic_year == academic_year)
+    if grade_level is not None:
+        stmt = stmt.where(SchoolClass.grade_level == grade_level)
+    classes_by_scale = {}
+    for class_id, class_year, class_level in db.session.execute(stmt):
+        classes_by_scale.setdefault(scale_for(scales, class_year, class_level), []).append(class_id)
+    # Students without a class use the school-wide scale
+    classless = scale_for(scales, None, None) if academic_year is None and grade_level is None else None
+    if classless:
+        classes_by_scale.setdefault(classless, [])
+
+    changed = 0
+    for scale, class_ids in classes_by_scale.items():
+        # Only grades from the year of the student's class
+        students = and_(Student.class_id.in_(class_ids), SchoolClass.academic_year == Grade.academic_year)
+        if scale == classless:
+            students = or_(students, Student.class_id.is_(None))
+        letter = scale.case_expression(Grade.percentage)
+        graded = (select(Student.id).outerjoin(SchoolClass, Student.class_id == SchoolClass.id)
+                  .where(Student.id == Grade.student_id, students).correlate(Grade).exists())
+        changed += db.session.execute(
+            update(Grade)
+            .where(Grade.percentage.isnot(None), graded,
+                   or_(Grade.grade_letter.is_(None), Grade.grade_letter != letter))
+            .values(grade_letter=letter)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    return changed
+
+def grading_scale_bands(form):
+    """(minimum, letter, points) rows from the band inputs of a scale form, skipping blank rows"""
+    bands = []
+    for minimum, letter, points in zip(form.getlist('min_percentage'), form.getlist('letter'), form.getlist('grade_points')):
+        if minimum.strip() and letter.strip():
+            bands.append((float(minimum), letter.strip()[:5], float(points or 0)))
+    return bands
+
+@app.cli.command('regrade')
+@click.option('--year', 'academic_year', help='Only classes in this academic year')
+@click.option('--grade', 'grade_level', type=int, help='Only classes in this grade level')
+def regrade_command(academic_year, grade_level):
+    """Rewrite stored letter grades that disagree with the grading scales."""
+    started = time.perf_counter()
+    changed = regrade_letters(academic_year, grade_level)
+    db.session.commit()
+    invalidate_grade_analytics()
+    click.echo(f"✅ {changed} grade letters updated in {time.perf_counter() - started:.2f}s")
+
+@app.route('/admin/results/scales')
+@login_required
+@role_required('admin')
+def admin_grading_scales():
+    scales = (GradingScale.query.options(joinedload(GradingScale.bands))
+              .order_by(GradingScale.academic_year.desc(), GradingScale.grade_level).all())
+    grade_levels = list(db.session.scalars(select(SchoolClass.grade_level).distinct().order_by(SchoolClass.grade_level)))
+    default_bands = [{'min_percentage': minimum, 'letter': letter, 'grade_points': points}
+                     for minimum, letter, points in DEFAULT_SCALE.bands()]
+    return render_template('admin/grading_scales.html', scales=scales, default_bands=default_bands,
+                           grade_levels=grade_levels, current_year=app.config['CURRENT_ACADEMIC_YEAR'])
+
+@app.route('/admin/results/scales/add', methods=['POST'])
+@login_required
+@role_required('admin')
+def add_grading_scale():
+    try:
+        academic_year = request.form.get('academic_year', '').strip() or None
+        grade_level = request.form.get('grade_level', type=int)
+        bands = grading_scale_bands(request.form)
+        Scale(bands)  # raises ValueError for an empty or inconsistent table
+        if GradingScale.query.filter_by(academic_year=academic_year, grade_level=grade_level).first():
+            raise ValueError('there is already a scale for that year and grade level; delete it first')
+
+        scale = GradingScale(name=request.form['name'], academic_year=academic_year, grade_level=grade_level)
+        for minimum, letter, points in bands:
+            scale.bands.append(GradingScaleBand(min_percentage=minimum, letter=letter, grade_points=points))
+        db.session.add(scale)
+        db.session.flush()
+        changed = regrade_letters(academic_year, grade_level)
         db.session.commit()
-        return jsonify({'success': True, 'message': 'Attendance marked successfully'})
+        invalidate_grade_analytics()
+        
+        flash(f'Grading scale added. {changed} stored grade letters updated.', 'success')
     except Exception as e:
         db.session.rollback()
-        return jsonify({'success': False, 'message': str(e)}), 400
+        flash(f'Error adding grading scale: {str(e)}', 'error')
+    
+    return redirect(url_for('admin_grading_scales'))
 
-@app.route('/api/grades', methods=['POST'])
+@app.route('/admin/results/scales/<int:scale_id>/delete', methods=['POST'])
 @login_required
-@role_required('teacher')
-def api_add_grades():
-    data = request.get_json()
-    teacher = Teacher.query.filter_by(user_id=current_user.id).first()
-    
-    for record in data.get('grades', []):
-        grade = Grade(
-            student_id=record['student_id'],
-            subject_id=record['subject_id'],
-            exam_type=record['exam_type'],
-            marks_obtained=record['marks_obtained'],
-            total_marks=record['total_marks'],
-            exam_date=datetime.strptime(record['exam_date'], '%Y-%m-%d').date(),
-            teacher_id=teacher.id
-        )
-        db.session.add(grade)
-    
+@role_required('admin')
+def delete_grading_scale(scale_id):
     try:
+        scale = GradingScale.query.get_or_404(scale_id)
+        academic_year, grade_level = scale.academic_year, scale.grade_level
+        db.session.delete(scale)
+        db.session.flush()
+        changed = regrade_letters(academic_year, grade_level)
         db.session.commit()
-        return jsonify({'success': True, 'message': 'Grades added successfully'})
+        invalidate_grade_analytics()
+        
+        flash(f'Grading scale deleted. {changed} stored grade letters updated.', 'success')
     except Exception as e:
         db.session.rollback()
-        return jsonify({'success': False, 'message': str(e)}), 400
+        flash(f'Error deleting grading scale: {str(e)}', 'error')
+    
+    return redirect(url_for('admin_grading_scales'))
+
+# API Routes for AJAX calls
+@app.route('/api/students/<int:class_id>')
+@login_required
+@role_required('teacher')
+def api_students_by_class(class_id):
+    students = db.session.query(Student, User).join(User, Student.user_id == User.id).filter(Student.class_id == class_id).all()
+    return jsonify([{
+        'id': student.id,
+        'student_id': student.student_id,
+        'name': f"{user.first_name} {user.last_name}"
+    } for student, user in students])
 
 # API Routes
 @app.route('/api/students/<int:class_id>')
@@ -1132,111 +3244,771 @@ def get_students_by_class(class_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Attendance rollups
+# StudentAttendanceDaily holds one row per student per day with the day's
+# records counted by status, and ClassAttendanceDaily sums those per class.
+# Every attendance write recomputes only the (student, date) keys it touched,
+# so summaries, heatmaps and class figures read a few hundred small rows
+# instead of every subject-period record. rebuild_attendance_rollups (and
+# `flask rebuild-attendance-rollups`) recomputes everything from scratch.
+
+ATTENDANCE_STATUSES = ('present', 'absent', 'late')
+
+def attendance_status_counts(status_column):
+    return [func.sum(case((status_column == status, 1), else_=0)).label(status) for status in ATTENDANCE_STATUSES]
+
+def keys_by_date(id_column, date_column, keys):
+    """WHERE clause for (id, date) keys as one "id IN (...)" per date, which every backend can index"""
+    by_date = {}
+    for key_id, day in keys:
+        by_date.setdefault(day, []).append(key_id)
+    return or_(*[and_(date_column == day, id_column.in_(ids)) for day, ids in by_date.items()])
+
+def attendance_keys(*criteria):
+    """Distinct (student id, date) keys of the attendance records matching criteria"""
+    return db.session.execute(select(Attendance.student_id, Attendance.date).where(*criteria).distinct()).all()
+
+def refresh_attendance_rollups(keys):
+    """Recompute the daily rollups of (student id, date) keys whose attendance changed"""
+    keys = sorted({tuple(key) for key in keys})
+    class_keys = set()
+    for start in range(0, len(keys), UPSERT_CHUNK_SIZE):
+        chunk = keys[start:start + UPSERT_CHUNK_SIZE]
+        # Include the classes the old rows counted towards, in case a key moved or emptied
+        class_keys.update(db.session.execute(
+            select(StudentAttendanceDaily.class_id, StudentAttendanceDaily.date)
+            .where(keys_by_date(StudentAttendanceDaily.student_id, StudentAttendanceDaily.date, chunk))
+        ).all())
+        rows = [dict(row._mapping) for row in db.session.execute(
+            select(Attendance.student_id, Attendance.date, Student.class_id, *attendance_status_counts(Attendance.status))
+            .join(Student, Attendance.student_id == Student.id)
+            .where(keys_by_date(Attendance.student_id, Attendance.date, chunk))
+            .group_by(Attendance.student_id, Attendance.date, Student.class_id)
+        )]
+        gone = set(chunk) - {(row['student_id'], row['date']) for row in rows}
+        if gone:
+            db.session.execute(delete(StudentAttendanceDaily).where(
+                keys_by_date(StudentAttendanceDaily.student_id, StudentAttendanceDaily.date, gone)))
+        bulk_upsert(StudentAttendanceDaily, rows, ['student_id', 'date'], ['class_id', *ATTENDANCE_STATUSES])
+        class_keys.update((row['class_id'], row['date']) for row in rows)
+    refresh_class_attendance_rollups(key for key in class_keys if key[0] is not None)
+
+def refresh_class_attendance_rollups(keys):
+    """Recompute ClassAttendanceDaily for (class id, date) keys from the student rollups"""
+    keys = sorted(set(keys))
+    for start in range(0, len(keys), UPSERT_CHUNK_SIZE):
+        chunk = keys[start:start + UPSERT_CHUNK_SIZE]
+        rows = [dict(row._mapping) for row in db.session.execute(
+            select(StudentAttendanceDaily.class_id, StudentAttendanceDaily.date,
+                   *[func.sum(getattr(StudentAttendanceDaily, status)).label(status) for status in ATTENDANCE_STATUSES],
+                   func.count().label('students'))
+            .where(keys_by_date(StudentAttendanceDaily.class_id, StudentAttendanceDaily.date, chunk))
+            .group_by(StudentAttendanceDaily.class_id, StudentAttendanceDaily.date)
+        )]
+        gone = set(chunk) - {(row['class_id'], row['date']) for row in rows}
+        if gone:
+            db.session.execute(delete(ClassAttendanceDaily).where(
+                keys_by_date(ClassAttendanceDaily.class_id, ClassAttendanceDaily.date, gone)))
+        bulk_upsert(ClassAttendanceDaily, rows, ['class_id', 'date'], [*ATTENDANCE_STATUSES, 'students'])
+
+def attendance_rows_written(rows):
+    refresh_attendance_rollups((row['student_id'], row['date']) for row in rows)
+
+def rebuild_attendance_rollups():
+    """Recompute both rollup tables from every attendance record; returns (student rows, class rows)"""
+    db.session.execute(delete(ClassAttendanceDaily))
+    db.session.execute(delete(StudentAttendanceDaily))
+    db.session.execute(insert(StudentAttendanceDaily).from_select(
+        ['student_id', 'date', 'class_id', *ATTENDANCE_STATUSES],
+        select(Attendance.student_id, Attendance.date, Student.class_id, *attendance_status_counts(Attendance.status))
+        .join(Student, Attendance.student_id == Student.id)
+        .group_by(Attendance.student_id, Attendance.date, Student.class_id)
+    ))
+    db.session.execute(insert(ClassAttendanceDaily).from_select(
+        ['class_id', 'date', *ATTENDANCE_STATUSES, 'students'],
+        select(StudentAttendanceDaily.class_id, StudentAttendanceDaily.date,
+               *[func.sum(getattr(StudentAttendanceDaily, status)) for status in ATTENDANCE_STATUSES], func.count())
+        .where(StudentAttendanceDaily.class_id.isnot(None))
+        .group_by(StudentAttendanceDaily.class_id, StudentAttendanceDaily.date)
+    ))
+    return (db.session.scalar(select(func.count()).select_from(StudentAttendanceDaily)),
+            db.session.scalar(select(func.count()).select_from(ClassAttendanceDaily)))
+
+@app.cli.command('rebuild-attendance-rollups')
+def rebuild_attendance_rollups_command():
+    """Recompute the daily attendance rollups from the attendance records."""
+    started = time.perf_counter()
+    student_rows, class_rows = rebuild_attendance_rollups()
+    db.session.commit()
+    click.echo(f"✅ {student_rows} student days and {class_rows} class days in {time.perf_counter() - started:.1f}s")
+
+def attendance_figures(present, absent, late):
+    total = present + absent + late
+    return {
+        'present': present,
+        'absent': absent,
+        'late': late,
+        'total': total,
+        'rate': (present + late) * 100 / total if total else None
+    }
+
+def attendance_term_start():
+    value = app.config['ATTENDANCE_TERM_START']
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+def student_attendance_summaries(student_ids, date_from=None, date_to=None):
+    """{student id: attendance figures} from the daily rollups"""
+    stmt = (select(StudentAttendanceDaily.student_id,
+                   *[func.coalesce(func.sum(getattr(StudentAttendanceDaily, status)), 0) for status in ATTENDANCE_STATUSES])
+            .where(StudentAttendanceDaily.student_id.in_(student_ids))
+            .group_by(StudentAttendanceDaily.student_id))
+    if date_from:
+        stmt = stmt.where(StudentAttendanceDaily.date >= date_from)
+    if date_to:
+        stmt = stmt.where(StudentAttendanceDaily.date <= date_to)
+    figures = {student_id: attendance_figures(0, 0, 0) for student_id in student_ids}
+    for student_id, present, absent, late in db.session.execute(stmt):
+        figures[student_id] = attendance_figures(int(present), int(absent), int(late))
+    return figures
+
+def class_attendance_summaries(class_ids, date_from=None, date_to=None):
+    """{class id: attendance figures} from the class rollups"""
+    stmt = (select(ClassAttendanceDaily.class_id,
+                   *[func.coalesce(func.sum(getattr(ClassAttendanceDaily, status)), 0) for status in ATTENDANCE_STATUSES])
+            .where(ClassAttendanceDaily.class_id.in_(class_ids))
+            .group_by(ClassAttendanceDaily.class_id))
+    if date_from:
+        stmt = stmt.where(ClassAttendanceDaily.date >= date_from)
+    if date_to:
+        stmt = stmt.where(ClassAttendanceDaily.date <= date_to)
+    return {class_id: attendance_figures(int(present), int(absent), int(late))
+            for class_id, present, absent, late in db.session.execute(stmt)}
+
+def day_status(day):
+    """The colour a day gets on the attendance calendar"""
+    if day.absent and not (day.present or day.late):
+        return 'absent'
+    if day.absent or day.late:
+        return 'late'
+    return 'present'
+
+# Natural keys and the columns a re-submission overwrites
+ATTENDANCE_KEY = ['student_id', 'date', 'subject_id']
+ATTENDANCE_UPDATES = ['status', 'remarks']
+GRADE_KEY = ['student_id', 'subject_id', 'exam_type', 'academic_year']
+GRADE_UPDATES = ['marks_obtained', 'total_marks', 'percentage', 'grade_letter', 'exam_date']
+
+# Batch ingestion API
+# A batch is a JSON array of rows, a sheet object such as
+# {"attendance": [...], "date": ..., "subject_id": ...} whose top-level fields
+# apply to every row, or newline-delimited JSON. Rows are validated as they are
+# read and upserted UPSERT_CHUNK_SIZE at a time inside one transaction, so only
+# one chunk of plain dicts is held at once. Any invalid row rolls back the whole
+# batch and the response lists the row errors.
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl')
+MAX_REPORTED_ERRORS = 100
+
+def ingest_rows(list_key):
+    """Return an iterator of (row number, row, parse error) over the request body"""
+    if request.mimetype in NDJSON_MIMETYPES:
+        return ingest_ndjson_rows(request.stream)
+
+    payload = request.get_json(silent=True)
+    defaults = {}
+    if isinstance(payload, dict):
+        defaults = {k: v for k, v in payload.items() if k != list_key}
+        payload = payload.get(list_key)
+    if not isinstance(payload, list):
+        raise ValueError(f'Expected a JSON array, a {{"{list_key}": [...]}} object or NDJSON')
+    return ((number, dict(defaults, **row) if isinstance(row, dict) else row, None)
+            for number, row in enumerate(payload, 1))
+
+def ingest_ndjson_rows(stream):
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError:
+            yield number, None, 'Invalid JSON'
+
+def ingest_required(row, field):
+    value = row.get(field)
+    if value is None or value == '':
+        raise ValueError(f'{field} is required')
+    return value
+
+def ingest_int(row, field):
+    value = ingest_required(row, field)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be an integer')
+
+def ingest_number(row, field):
+    value = ingest_required(row, field)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be a number')
+
+def ingest_date(row, field):
+    value = ingest_required(row, field)
+    try:
+        return datetime.strptime(str(value), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'{field} must be a date in YYYY-MM-DD format')
+
+def attendance_ingest_row(row, teacher_id):
+    status = str(ingest_required(row, 'status')).lower()
+    if status not in ATTENDANCE_STATUSES:
+        raise ValueError(f"status must be one of: {', '.join(ATTENDANCE_STATUSES)}")
+    return {
+        'student_id': ingest_int(row, 'student_id'),
+        'subject_id': ingest_int(row, 'subject_id'),
+        'date': ingest_date(row, 'date'),
+        'status': status,
+        'remarks': row.get('remarks') or '',
+        'marked_by': teacher_id
+    }
+
+def grade_ingest_row(row, teacher_id):
+    # The teacher grade sheet sends "marks"; batch rows use the column name
+    if 'marks_obtained' not in row and 'marks' in row:
+        row = dict(row, marks_obtained=row['marks'])
+    marks = ingest_number(row, 'marks_obtained')
+    total_marks = ingest_number(row, 'total_marks')
+    if total_marks <= 0:
+        raise ValueError('total_marks must be greater than zero')
+    if not 0 <= marks <= total_marks:
+        raise ValueError('marks_obtained must be between 0 and total_marks')
+    percentage = grade_percentage(marks, total_marks)
+    return {
+        'student_id': ingest_int(row, 'student_id'),
+        'subject_id': ingest_int(row, 'subject_id'),
+        'exam_type': str(ingest_required(row, 'exam_type')).strip(),
+        'marks_obtained': marks,
+        'total_marks': total_marks,
+        'percentage': percentage,
+        'exam_date': ingest_date(row, 'exam_date'),
+        'academic_year': str(row['academic_year']) if row.get('academic_year') else None,
+        'teacher_id': teacher_id
+    }
+
+def ingest_reference_errors(chunk):
+    """Yield (row number, message) for rows whose student or subject does not exist"""
+    student_ids = {row['student_id'] for _, row in chunk}
+    subject_ids = {row['subject_id'] for _, row in chunk if 'subject_id' in row}
+    students = set(db.session.scalars(select(Student.id).where(Student.id.in_(student_ids))))
+    subjects = set(db.session.scalars(select(Subject.id).where(Subject.id.in_(subject_ids)))) if subject_ids else set()
+    for number, row in chunk:
+        if row['student_id'] not in students:
+            yield number, f"student {row['student_id']} does not exist"
+        elif 'subject_id' in row and row['subject_id'] not in subjects:
+            yield number, f"subject {row['subject_id']} does not exist"
+
+def ingest_batch(list_key, build_row, model, key_columns, update_columns, on_write=None, prepare=None,
+                 authorize=None):
+    teacher_id = current_user.teacher_profile_id
+    if not teacher_id:
+        return jsonify({'error': 'Teacher not found'}), 404
+
+    try:
+        rows = ingest_rows(list_key)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    received = saved = error_count = 0
+    errors = []
+    chunk = []
+
+    def reject(number, message):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'row': number, 'error': message})
+
+    def flush():
+        nonlocal saved
+        missing = set()
+        for number, message in ingest_reference_errors(chunk):
+            missing.add(number)
+            reject(number, message)
+        if authorize:
+            for number, message in authorize([(n, row) for n, row in chunk if n not in missing], teacher_id):
+                reject(number, message)
+        # Keep validating after the first error, but stop writing
+        if not error_count:
+            rows = [row for _, row in chunk]
+            if prepare:
+                prepare(rows)
+            bulk_upsert(model, rows, key_columns, update_columns)
+            if on_write:
+                on_write(rows)
+            saved += len(chunk)
+        chunk.clear()
+
+    try:
+        for number, row, error in rows:
+            received += 1
+            if error is None and not isinstance(row, dict):
+                error = 'Row must be a JSON object'
+            if error is None:
+                try:
+                    chunk.append((number, build_row(row, teacher_id)))
+                except ValueError as e:
+                    error = str(e)
+            if error:
+                reject(number, error)
+            if len(chunk) >= UPSERT_CHUNK_SIZE:
+                flush()
+        if chunk:
+            flush()
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('Batch ingestion of %s failed', list_key)
+        return jsonify({'error': 'The batch could not be saved; nothing was written'}), 500
+
+    if not received:
+        return jsonify({'error': 'No rows to import'}), 400
+    if error_count:
+        db.session.rollback()
+        return jsonify({
+            'error': f'{error_count} of {received} rows are invalid; nothing was saved',
+            'received': received,
+            'error_count': error_count,
+            'errors': sorted(errors, key=lambda e: e['row'])
+        }), 422
+
+    db.session.commit()
+    return jsonify({'message': f'Saved {saved} of {received} rows', 'received': received, 'saved': saved})
+
+# Authorization hooks get the rows of a chunk whose student and subject exist
+
+def subject_permission_errors(chunk, teacher_id):
+    """Yield (row number, message) for rows whose subject the teacher is not assigned in the student's class"""
+    classes = dict(db.session.execute(
+        select(Student.id, Student.class_id).where(Student.id.in_({row['student_id'] for _, row in chunk}))
+    ).all())
+    assigned = set(db.session.execute(
+        select(TeacherSubject.class_id, TeacherSubject.subject_id).where(TeacherSubject.teacher_id == teacher_id)
+    ).all())
+    for number, row in chunk:
+        if (classes[row['student_id']], row['subject_id']) not in assigned:
+            yield number, f"you do not teach subject {row['subject_id']} in student {row['student_id']}'s class"
+
+REMARK_KEY = ['student_id', 'academic_year']
+REMARK_UPDATES = ['remarks', 'teacher_id', 'updated_at']
+
+def remark_permission_errors(chunk, teacher_id):
+    """Yield (row number, message) for students whose class the teacher neither teaches nor leads"""
+    taught = select(TeacherSubject.class_id).where(TeacherSubject.teacher_id == teacher_id)
+    allowed = dict(db.session.execute(
+        select(Student.id, and_(SchoolClass.id.is_not(None),
+                                or_(SchoolClass.class_teacher_id == teacher_id, SchoolClass.id.in_(taught))))
+        .outerjoin(SchoolClass, Student.class_id == SchoolClass.id)
+        .where(Student.id.in_({row['student_id'] for _, row in chunk}))
+    ).all())
+    for number, row in chunk:
+        if not allowed[row['student_id']]:
+            yield number, f"you do not teach student {row['student_id']}'s class"
+
+def remark_ingest_row(row, teacher_id):
+    return {
+        'student_id': ingest_int(row, 'student_id'),
+        'academic_year': str(row.get('academic_year') or app.config['CURRENT_ACADEMIC_YEAR']),
+        'remarks': str(ingest_required(row, 'remarks')),
+        'teacher_id': teacher_id,
+        'updated_at': datetime.now()
+    }
+
+# /api/attendance and /api/grades are the routes the teacher pages post to
+
+@app.route('/api/v1/attendance', methods=['POST'])
 @app.route('/api/attendance', methods=['POST'])
 @login_required
 @role_required('teacher')
-def submit_attendance():
-    try:
-        data = request.get_json()
-        teacher = Teacher.query.filter_by(user_id=current_user.id).first()
-        
-        if not teacher:
-            return jsonify({'error': 'Teacher not found'}), 404
-        
-        attendance_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-        
-        for student_attendance in data['attendance']:
-            # Check if attendance already exists for this date
-            existing = Attendance.query.filter_by(
-                student_id=student_attendance['student_id'],
-                date=attendance_date,
-                subject_id=data['subject_id']
-            ).first()
-            
-            if existing:
-                # Update existing record
-                existing.status = student_attendance['status']
-                existing.remarks = student_attendance.get('remarks', '')
-            else:
-                # Create new record
-                attendance = Attendance(
-                    student_id=student_attendance['student_id'],
-                    subject_id=data['subject_id'],
-                    date=attendance_date,
-                    status=student_attendance['status'],
-                    remarks=student_attendance.get('remarks', ''),
-                    marked_by=teacher.id
-                )
-                db.session.add(attendance)
-        
-        db.session.commit()
-        return jsonify({'message': 'Attendance submitted successfully'})
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+def api_ingest_attendance():
+    return ingest_batch('attendance', attendance_ingest_row, Attendance, ATTENDANCE_KEY, ATTENDANCE_UPDATES,
+                        on_write=attendance_rows_written, authorize=subject_permission_errors)
 
+@app.route('/api/v1/grades', methods=['POST'])
 @app.route('/api/grades', methods=['POST'])
 @login_required
 @role_required('teacher')
-def submit_grades():
-    try:
-        data = request.get_json()
-        teacher = Teacher.query.filter_by(user_id=current_user.id).first()
-        
-        if not teacher:
-            return jsonify({'error': 'Teacher not found'}), 404
-        
-        for student_grade in data['grades']:
-            # Check if grade already exists
-            existing = Grade.query.filter_by(
-                student_id=student_grade['student_id'],
-                subject_id=data['subject_id'],
-                exam_type=data['exam_type']
-            ).first()
-            
-            if existing:
-                # Update existing record
-                existing.marks_obtained = student_grade['marks']
-                existing.total_marks = data['total_marks']
-                existing.percentage = (student_grade['marks'] / data['total_marks']) * 100
-                existing.grade = calculate_letter_grade(existing.percentage)
+def api_ingest_grades():
+    return ingest_batch('grades', grade_ingest_row, Grade, GRADE_KEY, GRADE_UPDATES,
+                        on_write=grades_written, prepare=assign_grade_letters, authorize=subject_permission_errors)
+
+@app.route('/api/v1/report-remarks', methods=['POST'])
+@login_required
+@role_required('teacher')
+def api_ingest_report_remarks():
+    return ingest_batch('remarks', remark_ingest_row, ReportRemark, REMARK_KEY, REMARK_UPDATES,
+                        authorize=remark_permission_errors)
+
+# Student and parent account import
+# An intake file (CSV or XLSX) is read one row at a time and handled
+# IMPORT_CHUNK_SIZE rows at a time. Each chunk is checked for
+# student ids and emails already used earlier in the file or in the database
+# (one query per column), its passwords are hashed across a process pool, and
+# its users and students are inserted with one executemany per table and
+# committed. Rows that fail are skipped and written to an error file with the
+# reason, so the fixed error file can be imported on its own afterwards.
+
+IMPORT_CHUNK_SIZE = 500
+IMPORT_POOL_MIN_PASSWORDS = 20  # below this, starting worker processes costs more than it saves
+IMPORT_COLUMNS = ('student_id', 'first_name', 'last_name', 'email', 'date_of_birth', 'gender', 'class_id',
+                  'phone', 'address', 'password', 'parent_email', 'parent_first_name', 'parent_last_name',
+                  'parent_phone', 'parent_password')
+IMPORT_GENDERS = ('male', 'female', 'other')
+
+def import_file_rows(stream, filename):
+    """Yield (row number, row) from a CSV or XLSX file, reading it as it goes"""
+    if filename.lower().endswith('.xlsx'):
+        from openpyxl import load_workbook
+
+        rows = load_workbook(stream, read_only=True, data_only=True).active.iter_rows(values_only=True)
+        header = [str(cell or '').strip().lower() for cell in next(rows, ())]
+        for number, cells in enumerate(rows, 2):
+            row = {name: '' if cell is None else (cell.date().isoformat() if isinstance(cell, datetime) else str(cell))
+                   for name, cell in zip(header, cells) if name}
+            if any(row.values()):
+                yield number, row
+        return
+
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+    for row in reader:
+        if any(row.values()):
+            yield reader.line_num, row
+
+def import_student_row(row):
+    """Validate the fields of one import row; database checks happen per chunk"""
+    values = {field: str(row.get(field) or '').strip() for field in IMPORT_COLUMNS}
+    for field in ('student_id', 'first_name', 'last_name', 'email', 'date_of_birth'):
+        ingest_required(values, field)
+    for field in ('email', 'parent_email'):
+        if values[field] and '@' not in values[field]:
+            raise ValueError(f'{field} is not a valid email address')
+    if values['gender'] and values['gender'].lower() not in IMPORT_GENDERS:
+        raise ValueError(f"gender must be one of: {', '.join(IMPORT_GENDERS)}")
+    if values['parent_email'] == values['email']:
+        raise ValueError('parent_email must differ from email')
+
+    return {
+        'student_id': values['student_id'],
+        'email': values['email'],
+        'first_name': values['first_name'],
+        'last_name': values['last_name'],
+        'date_of_birth': ingest_date(values, 'date_of_birth'),
+        'gender': values['gender'].lower() or None,
+        'class_id': ingest_int(values, 'class_id') if values['class_id'] else None,
+        'phone': values['phone'] or None,
+        'address': values['address'] or None,
+        'password': values['password'] or 'student123',
+        'parent': {
+            'email': values['parent_email'],
+            'first_name': values['parent_first_name'],
+            'last_name': values['parent_last_name'],
+            'phone': values['parent_phone'] or None,
+            'password': values['parent_password'] or 'parent123',
+        } if values['parent_email'] else None,
+    }
+
+def import_students(rows, errors_path=None, progress=None):
+    """Import (row number, row) pairs as student accounts with optional parent accounts
+
+    Invalid rows are skipped and, with errors_path, written there as CSV with
+    their row number and error. progress is called with the running report
+    after every chunk. Returns the final report.
+    """
+    started = time.perf_counter()
+    report = {'rows': 0, 'imported': 0, 'parents_created': 0, 'errors': 0, 'error_samples': [], 'seconds': 0.0}
+    class_ids = set(db.session.scalars(select(SchoolClass.id)))
+    student_ids, emails, parent_emails = set(), set(), set()
+    chunk = []
+    errors_file = writer = pool = None
+
+    def reject(number, row, message):
+        nonlocal errors_file, writer
+        report['errors'] += 1
+        if len(report['error_samples']) < MAX_REPORTED_ERRORS:
+            report['error_samples'].append({'row': number, 'error': message})
+        if errors_path:
+            if writer is None:
+                errors_file = open(errors_path, 'w', newline='', encoding='utf-8')
+                writer = csv.DictWriter(errors_file, ('row', 'error') + IMPORT_COLUMNS, extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow(dict(row, row=number, error=message))
+
+    def hash_passwords(passwords):
+        nonlocal pool
+        if len(passwords) < IMPORT_POOL_MIN_PASSWORDS or app.config['IMPORT_HASH_WORKERS'] < 2:
+            return [generate_password_hash(password) for password in passwords]
+        if pool is None:
+            pool = ProcessPoolExecutor(app.config['IMPORT_HASH_WORKERS'], mp_context=multiprocessing.get_context('spawn'))
+        chunksize = max(1, len(passwords) // (app.config['IMPORT_HASH_WORKERS'] * 4))
+        return list(pool.map(generate_password_hash, passwords, chunksize=chunksize))
+
+    def flush():
+        # Everything the chunk could collide with, in one query per column
+        wanted_emails = {r['email'] for _, _, r in chunk} | {r['parent']['email'] for _, _, r in chunk if r['parent']}
+        taken_ids = set(db.session.scalars(
+            select(Student.student_id).where(Student.student_id.in_({r['student_id'] for _, _, r in chunk}))))
+        existing = {}
+        for user in db.session.execute(select(User.id, User.email, User.username, User.role)
+                                       .where(or_(User.email.in_(wanted_emails), User.username.in_(wanted_emails)))):
+            existing[user.email] = existing[user.username] = user
+
+        accepted, new_parents = [], {}
+        for number, raw, r in chunk:
+            parent = r['parent']
+            if r['student_id'] in taken_ids:
+                reject(number, raw, f"student_id {r['student_id']} already exists")
+            elif r['email'] in existing:
+                reject(number, raw, f"email {r['email']} is already in use")
+            elif r['class_id'] is not None and r['class_id'] not in class_ids:
+                reject(number, raw, f"class {r['class_id']} does not exist")
+            elif parent and parent['email'] in existing and existing[parent['email']].role != 'parent':
+                reject(number, raw, f"parent_email {parent['email']} belongs to a {existing[parent['email']].role} account")
+            elif (parent and parent['email'] not in existing and parent['email'] not in new_parents
+                  and not (parent['first_name'] and parent['last_name'])):
+                reject(number, raw, 'parent_first_name and parent_last_name are required for a new parent')
             else:
-                # Create new record
-                percentage = (student_grade['marks'] / data['total_marks']) * 100
-                grade = Grade(
-                    student_id=student_grade['student_id'],
-                    subject_id=data['subject_id'],
-                    exam_type=data['exam_type'],
-                    marks_obtained=student_grade['marks'],
-                    total_marks=data['total_marks'],
-                    percentage=percentage,
-                    grade=calculate_letter_grade(percentage),
-                    teacher_id=teacher.id,
-                    exam_date=datetime.strptime(data['exam_date'], '%Y-%m-%d').date()
-                )
-                db.session.add(grade)
-        
+                accepted.append(r)
+                if parent and parent['email'] not in existing:
+                    new_parents.setdefault(parent['email'], parent)
+        chunk.clear()
+        if not accepted:
+            return
+
+        hashes = iter(hash_passwords([r['password'] for r in accepted] + [p['password'] for p in new_parents.values()]))
+        students = [dict(username=r['email'], email=r['email'], password_hash=next(hashes), role='student',
+                         first_name=r['first_name'], last_name=r['last_name'], phone=r['phone'], address=r['address'])
+                    for r in accepted]
+        parents = [dict(username=p['email'], email=p['email'], password_hash=next(hashes), role='parent',
+                        first_name=p['first_name'], last_name=p['last_name'], phone=p['phone'])
+                   for p in new_parents.values()]
+        db.session.execute(insert(User), students + parents)
+
+        new_emails = [u['email'] for u in students + parents]
+        user_ids = dict(db.session.execute(select(User.email, User.id).where(User.email.in_(new_emails))).all())
+        user_ids.update((email, user.id) for email, user in existing.items() if user.role == 'parent')
+        db.session.execute(insert(Student), [
+            dict(user_id=user_ids[r['email']], student_id=r['student_id'], class_id=r['class_id'],
+                 date_of_birth=r['date_of_birth'], gender=r['gender'],
+                 parent_id=user_ids[r['parent']['email']] if r['parent'] else None)
+            for r in accepted
+        ])
+        bump_stat('students', len(accepted))
         db.session.commit()
-        return jsonify({'message': 'Grades submitted successfully'})
-    except Exception as e:
+        report['imported'] += len(accepted)
+        report['parents_created'] += len(parents)
+
+    try:
+        for number, raw in rows:
+            report['rows'] += 1
+            try:
+                r = import_student_row(raw)
+                if r['student_id'] in student_ids:
+                    raise ValueError(f"student_id {r['student_id']} appears earlier in the file")
+                if r['email'] in emails or r['email'] in parent_emails:
+                    raise ValueError(f"email {r['email']} appears earlier in the file")
+                if r['parent'] and r['parent']['email'] in emails:
+                    raise ValueError(f"parent_email {r['parent']['email']} is a student in this file")
+            except ValueError as e:
+                reject(number, raw, str(e))
+                continue
+            student_ids.add(r['student_id'])
+            emails.add(r['email'])
+            if r['parent']:
+                parent_emails.add(r['parent']['email'])
+            chunk.append((number, raw, r))
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                flush()
+                report['seconds'] = time.perf_counter() - started
+                if progress:
+                    progress(report)
+        if chunk:
+            flush()
+    except Exception:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if errors_file is not None:
+            errors_file.close()
 
-def calculate_letter_grade(percentage):
-    if percentage >= 90:
-        return 'A+'
-    elif percentage >= 80:
-        return 'A'
-    elif percentage >= 70:
-        return 'B+'
-    elif percentage >= 60:
-        return 'B'
-    elif percentage >= 50:
-        return 'C+'
-    elif percentage >= 40:
-        return 'C'
-    else:
-        return 'F'
+    report['seconds'] = time.perf_counter() - started
+    if progress:
+        progress(report)
+    return report
+
+def import_progress_message(report):
+    return (f"{report['rows']} rows read, {report['imported']} students and {report['parents_created']} parents "
+            f"imported, {report['errors']} errors in {report['seconds']:.1f}s")
+
+@app.cli.command('import-students')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--errors', 'errors_path', help='Where to write rejected rows (default: PATH with .errors.csv)')
+def import_students_command(path, errors_path):
+    """Import student and parent accounts from a CSV or XLSX file"""
+    errors_path = errors_path or os.path.splitext(path)[0] + '.errors.csv'
+    with open(path, 'rb') as stream:
+        report = import_students(import_file_rows(stream, path), errors_path,
+                                 progress=lambda r: print(import_progress_message(r)))
+    if report['errors']:
+        print(f"Rejected rows written to {errors_path}")
+
+# Keyset-paginated listing API
+# Pages are ordered by primary key and resume with "WHERE id > last_id", so
+# every page costs one index range scan however deep the client has paged.
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(json.dumps({'id': last_id}).encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))['id'])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+
+def keyset_page(query, key, serialize):
+    """Return one page of query as JSON with a next_cursor token for the following page"""
+    limit = request.args.get('limit', app.config['API_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['API_MAX_PAGE_SIZE']))
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        last_id = decode_cursor(cursor)
+        if last_id is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(key > last_id)
+
+    rows = query.order_by(key).limit(limit + 1).all()
+    data = [serialize(row) for row in rows[:limit]]
+    return jsonify({
+        'data': data,
+        'next_cursor': encode_cursor(data[-1]['id']) if len(rows) > limit else None
+    })
+
+def iso_date(value):
+    return value.isoformat() if value else None
+
+def api_date_arg(name):
+    value = request.args.get(name)
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+@app.route('/api/v1/students')
+@login_required
+@role_required('admin')
+def api_list_students():
+    query = db.session.query(Student, User).join(User, Student.user_id == User.id)
+    class_id = request.args.get('class_id', type=int)
+    if class_id:
+        query = query.filter(Student.class_id == class_id)
+    search = request.args.get('q', '').strip()
+    if search:
+        query = query.filter(search_filter(search, User.first_name, User.last_name, Student.student_id))
+
+    return keyset_page(query, Student.id, lambda row: {
+        'id': row.Student.id,
+        'student_id': row.Student.student_id,
+        'first_name': row.User.first_name,
+        'last_name': row.User.last_name,
+        'email': row.User.email,
+        'class_id': row.Student.class_id,
+        'parent_id': row.Student.parent_id,
+        'gender': row.Student.gender,
+        'date_of_birth': iso_date(row.Student.date_of_birth),
+        'admission_date': iso_date(row.Student.admission_date),
+        'is_active': row.User.is_active
+    })
+
+@app.route('/api/v1/fees')
+@login_required
+@role_required('admin')
+def api_list_fees():
+    query = Fee.query
+    for field in ('student_id', 'status', 'academic_year', 'fee_type'):
+        value = request.args.get(field)
+        if value:
+            query = query.filter(getattr(Fee, field) == value)
+
+    return keyset_page(query, Fee.id, lambda fee: {
+        'id': fee.id,
+        'student_id': fee.student_id,
+        'fee_type': fee.fee_type,
+        'amount': float(fee.amount),
+        'due_date': iso_date(fee.due_date),
+        'status': fee.status,
+        'payment_date': iso_date(fee.payment_date),
+        'payment_method': fee.payment_method,
+        'academic_year': fee.academic_year
+    })
+
+@app.route('/api/v1/attendance')
+@login_required
+@role_required('admin')
+def api_list_attendance():
+    try:
+        date_from = api_date_arg('date_from')
+        date_to = api_date_arg('date_to')
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    query = Attendance.query
+    for field in ('student_id', 'subject_id'):
+        value = request.args.get(field, type=int)
+        if value:
+            query = query.filter(getattr(Attendance, field) == value)
+    if date_from:
+        query = query.filter(Attendance.date >= date_from)
+    if date_to:
+        query = query.filter(Attendance.date <= date_to)
+
+    return keyset_page(query, Attendance.id, lambda record: {
+        'id': record.id,
+        'student_id': record.student_id,
+        'subject_id': record.subject_id,
+        'date': iso_date(record.date),
+        'status': record.status,
+        'remarks': record.remarks,
+        'marked_by': record.marked_by
+    })
+
+@app.route('/api/v1/book-issues')
+@login_required
+@role_required('admin')
+def api_list_book_issues():
+    query = BookIssue.query
+    for field in ('student_id', 'book_id', 'status'):
+        value = request.args.get(field)
+        if value:
+            query = query.filter(getattr(BookIssue, field) == value)
+
+    return keyset_page(query, BookIssue.id, lambda issue: {
+        'id': issue.id,
+        'book_id': issue.book_id,
+        'student_id': issue.student_id,
+        'issue_date': iso_date(issue.issue_date),
+        'due_date': iso_date(issue.due_date),
+        'return_date': iso_date(issue.return_date),
+        'status': issue.status,
+        'fine_amount': float(issue.fine_amount or 0)
+    })
+
+def grade_percentage(marks_obtained, total_marks):
+    if not total_marks or float(total_marks) <= 0:
+        return 0
+    return round(float(marks_obtained) * 100 / float(total_marks), 2)
+
+def calculate_letter_grade(percentage, scale=DEFAULT_SCALE):
+    return scale.letter(percentage)
 
 # PWA Routes
 @app.route('/static/sw.js')
@@ -1277,25 +4049,45 @@ def share_target():
     # GET request - show share form
     return render_template('share.html')
 
+# PWA widget snapshot
+# Home-screen widgets poll this endpoint. Each process rebuilds the snapshot
+# from the dashboard counters at most once per WIDGET_MAX_AGE seconds, and
+# clients revalidate with If-None-Match / If-Modified-Since to get a 304.
+
+WIDGET_STATS = ('students', 'teachers', 'classes')
+widget_cache = {'snapshot': None, 'expires': 0.0}
+
+def widget_snapshot():
+    """Return (data, etag, last_modified) for the widget payload"""
+    now = time.monotonic()
+    if widget_cache['snapshot'] is None or now >= widget_cache['expires']:
+        rows = dashboard_stat_rows()
+        last_modified = max((rows[name]['updated_at'] for name in WIDGET_STATS if rows[name]['updated_at']),
+                            default=datetime.now()).replace(microsecond=0)
+        data = {name: rows[name]['value'] for name in WIDGET_STATS}
+        data['last_updated'] = last_modified.isoformat()
+        etag = hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+        widget_cache['snapshot'] = (data, etag, last_modified.astimezone(timezone.utc))
+        widget_cache['expires'] = now + app.config['WIDGET_MAX_AGE']
+    return widget_cache['snapshot']
+
 @app.route('/api/widget-data')
+@login_required
 def widget_data():
     """Provide data for PWA widgets"""
     try:
-        # Get basic stats for widget
-        total_students = Student.query.count()
-        total_teachers = Teacher.query.count()
-        total_classes = Class.query.count()
-        
-        widget_data = {
-            "students": total_students,
-            "teachers": total_teachers,
-            "classes": total_classes,
-            "last_updated": datetime.now().isoformat()
-        }
-        
-        return jsonify(widget_data)
-    except Exception as e:
+        data, etag, last_modified = widget_snapshot()
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('Could not build the widget snapshot')
         return jsonify({"error": "Widget data unavailable"}), 500
+    
+    response = jsonify(data)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.max_age = app.config['WIDGET_MAX_AGE']
+    return response.make_conditional(request)
 
 @app.route('/test-pwa')
 def test_pwa():
@@ -1308,8 +4100,9 @@ def offline():
     return render_template('offline.html')
 
 if __name__ == '__main__':
+    from migrations import upgrade
+    upgrade()
     with app.app_context():
-        db.create_all()
         
         # Initialize sample data if no users exist (first run)
         if User.query.count() == 0:
@@ -1323,8 +4116,9 @@ if __name__ == '__main__':
 
 # Production WSGI entry point for Railway
 def create_app():
+    from migrations import upgrade
+    upgrade()
     with app.app_context():
-        db.create_all()
         
         # Initialize sample data if no users exist (first run)
         if User.query.count() == 0:
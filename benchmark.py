@@ -0,0 +1,942 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for School Management System
+
+Each benchmark builds a synthetic dataset in a scratch database (a temporary
+SQLite file unless --database-url is given) and prints its measurements.
+
+Usage:
+    python benchmark.py indexes [--students 20000] [--days 60]
+    python benchmark.py attendance [--sizes 40 200 2000] [--repeat 20]
+    python benchmark.py grades [--sizes 40 200 2000] [--repeat 20]
+    python benchmark.py concurrency [--workers 1 4 16] [--seconds 10] [--profiles default tuned]
+    python benchmark.py library [--workers 1 8 32] [--seconds 10] [--books 20] [--copies 3]
+    python benchmark.py rollover [--students 50000]
+    python benchmark.py import [--rows 500] [--workers 1 4]
+    python benchmark.py fees [--students 50000]
+    python benchmark.py export [--students 2000] [--days 200]
+    python benchmark.py report-cards [--students 3000] [--days 60] [--workers 1 4]
+    python benchmark.py receipts [--students 5000]
+    python benchmark.py rollups [--students 3000] [--days 180]
+    python benchmark.py analytics [--students 20000]
+    python benchmark.py regrade [--students 50000]
+    python benchmark.py timetable [--slots 10000]
+    python benchmark.py timetable-generate [--classes 100] [--teachers 150] [--rooms 90] [--seconds 20] [--workers 1 4]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, time as dt_time, timedelta
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='School Management System benchmarks')
+    parser.add_argument('--database-url', help='Scratch database to use (default: temporary SQLite file)')
+    sub = parser.add_subparsers(dest='benchmark', required=True)
+
+    indexes = sub.add_parser('indexes', help='Query plans and latency before and after migration 001')
+    indexes.add_argument('--students', type=int, default=20000)
+    indexes.add_argument('--days', type=int, default=60, help='Days of attendance per student')
+    indexes.add_argument('--repeat', type=int, default=20, help='Executions per query')
+
+    attendance = sub.add_parser('attendance', help='Attendance sheet submissions per second')
+    attendance.add_argument('--sizes', type=int, nargs='+', default=[40, 200, 2000], help='Rows per submission')
+    attendance.add_argument('--repeat', type=int, default=20, help='Submissions per size and mode')
+
+    grades = sub.add_parser('grades', help='Grade sheet submissions per second')
+    grades.add_argument('--sizes', type=int, nargs='+', default=[40, 200, 2000], help='Rows per submission')
+    grades.add_argument('--repeat', type=int, default=20, help='Submissions per size and mode')
+
+    concurrency = sub.add_parser('concurrency', help='Attendance writes per second from concurrent worker processes')
+    concurrency.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16], help='Worker process counts')
+    concurrency.add_argument('--seconds', type=float, default=10, help='Duration of each run')
+    concurrency.add_argument('--sheet-size', type=int, default=40, help='Rows per attendance sheet')
+    concurrency.add_argument('--profiles', nargs='+', default=['default', 'tuned'], choices=['default', 'tuned'],
+                             help="'default' disables the engine profile, 'tuned' uses the one matching the URL")
+
+    library = sub.add_parser('library', help='Concurrent book issues and returns, checked for consistency')
+    library.add_argument('--workers', type=int, nargs='+', default=[1, 8, 32], help='Worker process counts')
+    library.add_argument('--seconds', type=float, default=10, help='Duration of each run')
+    library.add_argument('--books', type=int, default=20, help='Titles the workers compete for')
+    library.add_argument('--copies', type=int, default=3, help='Copies of each title')
+    library.add_argument('--modes', nargs='+', default=['legacy', 'atomic'], choices=['legacy', 'atomic'],
+                         help="'legacy' reads, checks and writes the counter in Python, 'atomic' uses conditional UPDATEs")
+
+    rollover = sub.add_parser('rollover', help='Academic-year rollover: dry run, real run and a repeat run')
+    rollover.add_argument('--students', type=int, default=50000)
+
+    student_import = sub.add_parser('import', help='Bulk student import rows per second by hashing worker count')
+    student_import.add_argument('--rows', type=int, default=500, help='Students in the intake file, half with a new parent')
+    student_import.add_argument('--workers', type=int, nargs='+', default=[1, 4], help='Password hashing processes')
+
+    fees = sub.add_parser('fees', help='Billing a fee plan to the whole school, then applying it again')
+    fees.add_argument('--students', type=int, default=50000)
+
+    export = sub.add_parser('export', help='Attendance CSV export: streamed versus loaded into memory')
+    export.add_argument('--students', type=int, default=2000)
+    export.add_argument('--days', type=int, default=200, help='Days of attendance per student')
+
+    report_cards = sub.add_parser('report-cards', help='Report card data fetch, then PDF rendering and zipping by worker count')
+    report_cards.add_argument('--students', type=int, default=3000)
+    report_cards.add_argument('--days', type=int, default=60, help='Days of attendance per student')
+    report_cards.add_argument('--workers', type=int, nargs='+', default=[1, 4], help='Rendering processes')
+
+    receipts = sub.add_parser('receipts', help='Storing receipts for paid fees, then archiving them from disk')
+    receipts.add_argument('--students', type=int, default=5000)
+
+    rollups = sub.add_parser('rollups', help='Attendance summaries from raw records versus the daily rollups')
+    rollups.add_argument('--students', type=int, default=3000)
+    rollups.add_argument('--days', type=int, default=180, help='Days of attendance per student')
+    rollups.add_argument('--repeat', type=int, default=20, help='Executions per query')
+
+    analytics = sub.add_parser('analytics', help="GPA, ranks and subject statistics for a whole school's classes")
+    analytics.add_argument('--students', type=int, default=20000)
+
+    regrade = sub.add_parser('regrade', help='Rewriting stored letters after a grading scale change')
+    regrade.add_argument('--students', type=int, default=50000)
+
+    timetable = sub.add_parser('timetable', help='Timetable clash checks on each write and for the whole school')
+    timetable.add_argument('--slots', type=int, default=10000)
+    timetable.add_argument('--repeat', type=int, default=200, help='Single-slot checks to average')
+
+    generate = sub.add_parser('timetable-generate', help='Generating a whole-school timetable by worker count')
+    generate.add_argument('--classes', type=int, default=100)
+    generate.add_argument('--teachers', type=int, default=150)
+    generate.add_argument('--rooms', type=int, default=90)
+    generate.add_argument('--seconds', type=float, default=20, help='Time budget per run')
+    generate.add_argument('--workers', type=int, nargs='+', default=[1, 4], help='Search processes')
+
+    return parser.parse_args()
+
+args = parse_args()
+if not os.environ.get('SMS_BENCH_DATABASE_URL'):
+    # Worker processes started by the concurrency benchmark inherit this
+    os.environ['SMS_BENCH_DATABASE_URL'] = args.database_url or (
+        'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='sms-bench-'), 'bench.db'))
+args.database_url = os.environ['SMS_BENCH_DATABASE_URL']
+os.environ['DATABASE_URL'] = args.database_url
+
+# app reads DATABASE_URL at import time
+from flask import g
+from sqlalchemy import delete, event, func, insert, select, text, update
+from app import app, db, User, Student, Teacher, SchoolClass, Subject, Attendance, Grade, Fee, Book, BookIssue, Timetable
+
+def timed(func, repeat=1):
+    """Return (result, average milliseconds) of calling func repeat times"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - started) * 1000 / repeat
+
+def bulk_insert(model, rows, chunk_size=5000):
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(insert(model), rows[start:start + chunk_size])
+
+def build_dataset(students, days):
+    """Create a synthetic school with the given number of students"""
+    db.drop_all()
+    db.create_all()
+    rng = random.Random(42)
+    password_hash = 'pbkdf2:sha256:600000$bench$' + '0' * 64
+    today = date.today()
+
+    class_count = max(1, students // 30)
+    teacher_count = max(1, class_count // 2)
+    subject_count = 8
+
+    bulk_insert(User, [dict(username=f'user{i}', email=f'user{i}@bench.test', password_hash=password_hash,
+                            role='teacher' if i <= teacher_count else ('parent' if i <= teacher_count + students // 2 else 'student'),
+                            first_name=f'First{i}', last_name=f'Last{i}')
+                       for i in range(1, teacher_count + students // 2 + students + 1)])
+    parent_base = teacher_count + 1
+    student_base = teacher_count + students // 2 + 1
+
+    bulk_insert(Teacher, [dict(user_id=i, teacher_id=f'T{i:05d}') for i in range(1, teacher_count + 1)])
+    bulk_insert(SchoolClass, [dict(name=f'Class {i}', grade_level=1 + i % 12, section='A', academic_year='2023-2024',
+                                   class_teacher_id=1 + i % teacher_count) for i in range(class_count)])
+    bulk_insert(Subject, [dict(name=f'Subject {i}', code=f'SUB{i:03d}', credits=1 + i % 3) for i in range(subject_count)])
+    bulk_insert(Student, [dict(user_id=student_base + i, student_id=f'S{i:06d}', class_id=1 + i % class_count,
+                               parent_id=parent_base + i // 2 if students // 2 else None)
+                          for i in range(students)])
+
+    attendance = []
+    for student_id in range(1, students + 1):
+        for offset in range(days):
+            attendance.append(dict(student_id=student_id, date=today - timedelta(days=offset),
+                                   subject_id=1 + (student_id + offset) % subject_count,
+                                   status=rng.choice(('present', 'present', 'present', 'absent', 'late')), marked_by=1))
+        if len(attendance) >= 50000:
+            bulk_insert(Attendance, attendance)
+            attendance = []
+    bulk_insert(Attendance, attendance)
+
+    bulk_insert(Grade, [dict(student_id=s, subject_id=subject, exam_type=exam, marks_obtained=rng.randint(30, 100),
+                             total_marks=100, exam_date=today, teacher_id=1)
+                        for s in range(1, students + 1)
+                        for subject in range(1, 4)
+                        for exam in ('midterm', 'final')])
+    bulk_insert(Fee, [dict(student_id=s, fee_type=fee_type, amount=250, due_date=today + timedelta(days=rng.randint(-60, 60)),
+                           status=rng.choice(('pending', 'paid', 'paid', 'overdue')), academic_year='2023-2024')
+                      for s in range(1, students + 1)
+                      for fee_type in ('tuition', 'library', 'transport')])
+    bulk_insert(Book, [dict(title=f'Book {i}', author='Bench', isbn=f'BENCH-{i}', total_copies=5, available_copies=5)
+                       for i in range(1, 501)])
+    bulk_insert(BookIssue, [dict(book_id=1 + i % 500, student_id=1 + i % students, issue_date=today - timedelta(days=30),
+                                 due_date=today - timedelta(days=rng.randint(-14, 30)),
+                                 status=rng.choice(('issued', 'returned', 'returned')))
+                            for i in range(students)])
+    bulk_insert(Timetable, [dict(class_id=1 + i % class_count, subject_id=1 + i % subject_count, teacher_id=1 + i % teacher_count,
+                                 day_of_week='monday', start_time=dt_time(8 + i % 8), end_time=dt_time(9 + i % 8))
+                            for i in range(class_count * 8)])
+    db.session.commit()
+
+def drop_declared_indexes():
+    """Remove every non-primary-key index so the baseline matches the pre-001 schema"""
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(conn)
+
+def query_plan(sql, params):
+    prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = db.session.execute(text(prefix + sql), params).fetchall()
+    return '; '.join(str(row[-1]) for row in rows)
+
+def hot_queries(students):
+    today = date.today()
+    probe = students // 2 or 1
+    student_user_id = db.session.execute(text("SELECT user_id FROM student WHERE id = :id"), {'id': probe}).scalar()
+    parent_id = db.session.execute(text("SELECT parent_id FROM student WHERE id = :id"), {'id': probe}).scalar()
+    return [
+        ('Student by user_id', "SELECT * FROM student WHERE user_id = :v", {'v': student_user_id}),
+        ('Students in class', "SELECT * FROM student WHERE class_id = :v", {'v': 1}),
+        ('Children of parent', "SELECT * FROM student WHERE parent_id = :v", {'v': parent_id}),
+        ('Attendance natural key', "SELECT * FROM attendance WHERE student_id = :s AND date = :d AND subject_id = :sub",
+         {'s': probe, 'd': today, 'sub': 1 + probe % 8}),
+        ('Attendance for student', "SELECT * FROM attendance WHERE student_id = :s", {'s': probe}),
+        ('Grade natural key', "SELECT * FROM grade WHERE student_id = :s AND subject_id = :sub AND exam_type = :e",
+         {'s': probe, 'sub': 1, 'e': 'final'}),
+        ('Overdue fee count', "SELECT COUNT(*) FROM fee WHERE status = :v", {'v': 'overdue'}),
+        ('Overdue book count', "SELECT COUNT(*) FROM book_issue WHERE status = :s AND due_date < :d", {'s': 'issued', 'd': today}),
+        ('Timetable for class', "SELECT * FROM timetable WHERE class_id = :v", {'v': 1}),
+    ]
+
+def measure(queries, repeat):
+    # End the session's transaction so it sees the current schema
+    db.session.commit()
+    results = {}
+    for label, sql, params in queries:
+        _, ms = timed(lambda: db.session.execute(text(sql), params).fetchall(), repeat)
+        results[label] = (ms, query_plan(sql, params))
+    return results
+
+def bench_indexes():
+    from migrations import add_lookup_indexes
+
+    with app.app_context():
+        print(f"Building dataset: {args.students} students, {args.days} days of attendance...")
+        _, ms = timed(lambda: build_dataset(args.students, args.days))
+        print(f"✅ Dataset ready in {ms / 1000:.1f}s ({db.session.query(Attendance).count()} attendance rows)\n")
+
+        drop_declared_indexes()
+        queries = hot_queries(args.students)
+        before = measure(queries, args.repeat)
+
+        _, ms = timed(lambda: run_migration(add_lookup_indexes))
+        print(f"Migration 001 applied in {ms / 1000:.1f}s\n")
+        after = measure(queries, args.repeat)
+
+        print(f"{'Query':<26}{'Before (ms)':>12}{'After (ms)':>12}{'Speedup':>10}")
+        for label, _, _ in queries:
+            b, a = before[label][0], after[label][0]
+            print(f"{label:<26}{b:>12.3f}{a:>12.3f}{b / a if a else 0:>9.1f}x")
+
+        print("\nQuery plans:")
+        for label, _, _ in queries:
+            print(f"  {label}")
+            print(f"    before: {before[label][1]}")
+            print(f"    after:  {after[label][1]}")
+
+def count_statements(func):
+    """Return (result, number of SQL statements executed by func)"""
+    statements = []
+    def record(*_):
+        statements.append(1)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return result, len(statements)
+
+def teacher_client(teacher_id=1):
+    """A test client logged in as a teacher, to submit sheets through the ingestion API the teacher pages use"""
+    from app import TeacherSubject
+
+    # The API only takes sheets for subjects the teacher is assigned, so assign them all
+    if not TeacherSubject.query.filter_by(teacher_id=teacher_id).first():
+        bulk_insert(TeacherSubject, [dict(teacher_id=teacher_id, subject_id=subject_id, class_id=class_id)
+                                     for class_id in db.session.scalars(select(SchoolClass.id))
+                                     for subject_id in db.session.scalars(select(Subject.id))])
+        db.session.commit()
+    user = db.session.get(User, db.session.get(Teacher, teacher_id).user_id)
+    if not user.check_password('bench'):
+        user.set_password('bench')
+        db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': user.username, 'password': 'bench'})
+    return client
+
+def submit_sheet(client, path, sheet):
+    # Requests reuse the benchmark's app context, so drop the user the last
+    # one left in flask.g and have this one load it from the session again
+    g.pop('_login_user', None)
+    return client.post(path, json=sheet)
+
+def post_sheet(client, path, sheet):
+    response = submit_sheet(client, path, sheet)
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} returned {response.status_code}: {response.get_json()}")
+
+def attendance_sheet(client, subject_id, attendance_date, entries):
+    post_sheet(client, '/api/attendance', {'attendance': entries, 'subject_id': subject_id,
+                                           'date': attendance_date.isoformat()})
+
+def grade_sheet(client, subject_id, exam_type, exam_date, total_marks, entries):
+    post_sheet(client, '/api/grades', {'grades': entries, 'subject_id': subject_id, 'exam_type': exam_type,
+                                       'exam_date': exam_date.isoformat(), 'total_marks': total_marks})
+
+def legacy_attendance_sheet(teacher_id, subject_id, attendance_date, entries):
+    """The per-row lookup submit_attendance used before user-005, for comparison"""
+    for entry in entries:
+        existing = Attendance.query.filter_by(student_id=entry['student_id'], date=attendance_date,
+                                              subject_id=subject_id).first()
+        if existing:
+            existing.status = entry['status']
+            existing.remarks = entry.get('remarks', '')
+        else:
+            db.session.add(Attendance(student_id=entry['student_id'], subject_id=subject_id, date=attendance_date,
+                                      status=entry['status'], remarks=entry.get('remarks', ''), marked_by=teacher_id))
+
+def bench_attendance():
+    with app.app_context():
+        largest = max(args.sizes)
+        print(f"Building dataset: {largest} students...")
+        build_dataset(largest, 0)
+        client = teacher_client()
+        # The API path runs a whole request, login check included
+        api = lambda teacher_id, *sheet: attendance_sheet(client, *sheet)
+
+        print(f"\n{'Rows':>6}  {'Path':<8}{'Mode':<8}{'Submissions/s':>15}{'Rows/s':>12}{'Statements':>12}")
+        day = date.today()
+        for size in args.sizes:
+            for label, write in (('legacy', legacy_attendance_sheet), ('api', api)):
+                for mode in ('insert', 'update'):
+                    statements = 0
+                    started = time.perf_counter()
+                    for i in range(args.repeat):
+                        if mode == 'insert':
+                            day -= timedelta(days=1)
+                        entries = [{'student_id': s, 'status': ('present', 'absent', 'late')[(s + i) % 3]}
+                                   for s in range(1, size + 1)]
+                        _, count = count_statements(lambda: (write(1, 1, day, entries), db.session.commit()))
+                        statements += count
+                    elapsed = time.perf_counter() - started
+                    print(f"{size:>6}  {label:<8}{mode:<8}{args.repeat / elapsed:>15.1f}"
+                          f"{args.repeat * size / elapsed:>12.0f}{statements / args.repeat:>12.1f}")
+
+def legacy_grade_sheet(teacher_id, subject_id, exam_type, exam_date, total_marks, entries):
+    """The per-row lookup submit_grades used before user-006, for comparison"""
+    from app import calculate_letter_grade, grade_percentage
+
+    for entry in entries:
+        percentage = grade_percentage(entry['marks'], total_marks)
+        existing = Grade.query.filter_by(student_id=entry['student_id'], subject_id=subject_id,
+                                         exam_type=exam_type).first()
+        if existing:
+            existing.marks_obtained = entry['marks']
+            existing.total_marks = total_marks
+            existing.percentage = percentage
+            existing.grade_letter = calculate_letter_grade(percentage)
+        else:
+            db.session.add(Grade(student_id=entry['student_id'], subject_id=subject_id, exam_type=exam_type,
+                                 marks_obtained=entry['marks'], total_marks=total_marks, percentage=percentage,
+                                 grade_letter=calculate_letter_grade(percentage), exam_date=exam_date,
+                                 teacher_id=teacher_id))
+
+def bench_grades():
+    with app.app_context():
+        largest = max(args.sizes)
+        print(f"Building dataset: {largest} students...")
+        build_dataset(largest, 0)
+        client = teacher_client()
+        api = lambda teacher_id, *sheet: grade_sheet(client, *sheet)
+
+        print(f"\n{'Rows':>6}  {'Path':<8}{'Mode':<8}{'Submissions/s':>15}{'Rows/s':>12}{'Statements':>12}")
+        exams = 0
+        for size in args.sizes:
+            for label, write in (('legacy', legacy_grade_sheet), ('api', api)):
+                for mode in ('insert', 'update'):
+                    statements = 0
+                    started = time.perf_counter()
+                    for i in range(args.repeat):
+                        if mode == 'insert':
+                            exams += 1
+                        entries = [{'student_id': s, 'marks': (s * 7 + i) % 101} for s in range(1, size + 1)]
+                        _, count = count_statements(
+                            lambda: (write(1, 1, f'quiz-{exams}', date.today(), 100, entries), db.session.commit()))
+                        statements += count
+                    elapsed = time.perf_counter() - started
+                    print(f"{size:>6}  {label:<8}{mode:<8}{args.repeat / elapsed:>15.1f}"
+                          f"{args.repeat * size / elapsed:>12.0f}{statements / args.repeat:>12.1f}")
+
+def concurrency_worker(worker, sheet_size, subject_count, seconds, start_at):
+    """Submit attendance sheets until the deadline; runs in its own process"""
+    with app.app_context():
+        client = teacher_client()
+        written = failed = 0
+        entries = [{'student_id': s, 'status': 'present'} for s in range(1, sheet_size + 1)]
+        time.sleep(max(0, start_at - time.time()))
+        deadline = time.time() + seconds
+        i = 0
+        while time.time() < deadline:
+            i += 1
+            # A page view's read followed by a sheet submission
+            db.session.query(Attendance).filter_by(subject_id=1 + worker % subject_count).count()
+            db.session.rollback()
+            response = submit_sheet(client, '/api/attendance', {
+                'attendance': entries, 'subject_id': 1 + worker % subject_count,
+                'date': (date.today() - timedelta(days=worker * 10000 + i)).isoformat()})
+            if response.status_code == 200:
+                written += 1
+            else:
+                failed += 1
+        return written, failed
+
+def bench_concurrency():
+    import multiprocessing
+
+    subject_count = 8
+    sqlite = args.database_url.startswith('sqlite')
+    base_url = args.database_url
+    context = multiprocessing.get_context('spawn')
+
+    print(f"\n{'Profile':<10}{'Workers':>8}{'Sheets/s':>12}{'Rows/s':>12}{'Failed':>10}")
+    for profile in args.profiles:
+        # Each profile gets its own SQLite file, since WAL mode persists in the file
+        url = base_url.replace('.db', f'-{profile}.db') if sqlite else base_url
+        env = {'SMS_BENCH_DATABASE_URL': url, 'DB_ENGINE_PROFILE': 'default' if profile == 'default' else ''}
+        os.environ.update(env)
+        with context.Pool(1) as pool:
+            pool.apply(concurrency_setup, (max(args.sheet_size, 1),))
+        for workers in args.workers:
+            start_at = time.time() + 2
+            with context.Pool(workers) as pool:
+                results = pool.starmap(concurrency_worker, [(w, args.sheet_size, subject_count, args.seconds, start_at)
+                                                            for w in range(workers)])
+            written = sum(r[0] for r in results)
+            failed = sum(r[1] for r in results)
+            print(f"{profile:<10}{workers:>8}{written / args.seconds:>12.1f}"
+                  f"{written * args.sheet_size / args.seconds:>12.0f}{failed:>10}")
+
+def concurrency_setup(students):
+    with app.app_context():
+        build_dataset(students, 0)
+        teacher_client()  # sets the password the workers log in with
+        profile = 'default' if os.environ.get('DB_ENGINE_PROFILE') == 'default' else 'tuned'
+        if db.engine.dialect.name == 'sqlite':
+            mode = db.session.execute(text('PRAGMA journal_mode')).scalar()
+            print(f"{profile}: {db.engine.url} (journal_mode={mode}, pool={db.engine.pool.status()})")
+        else:
+            print(f"{profile}: {db.engine.url} (pool={db.engine.pool.status()})")
+
+def legacy_take_copy(book_id):
+    """issue_book before conditional UPDATEs: read, check and decrement in Python"""
+    book = db.session.get(Book, book_id)
+    if book.available_copies <= 0:
+        return False
+    book.available_copies -= 1
+    return True
+
+def legacy_close_issue(book_issue, return_date):
+    book = db.session.get(Book, book_issue.book_id)
+    book_issue.status = 'returned'
+    book_issue.return_date = return_date
+    book.available_copies += 1
+    return True
+
+def library_worker(worker, mode, books, seconds, start_at):
+    """Issue and return books until the deadline; runs in its own process"""
+    from sqlalchemy.exc import OperationalError
+    from app import take_copy, close_issue
+
+    take, close = (legacy_take_copy, legacy_close_issue) if mode == 'legacy' else (take_copy, close_issue)
+    with app.app_context():
+        rng = random.Random(worker)
+        counts = {'issued': 0, 'returned': 0, 'refused': 0, 'failed': 0}
+        open_issues = []
+        time.sleep(max(0, start_at - time.time()))
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            try:
+                book_id = rng.randint(1, books)
+                if open_issues and rng.random() < 0.5:
+                    issue_id = open_issues.pop(rng.randrange(len(open_issues)))
+                    closed = close(db.session.get(BookIssue, issue_id), date.today())
+                    db.session.commit()
+                    counts['returned' if closed else 'refused'] += 1
+                elif take(book_id):
+                    issue = BookIssue(book_id=book_id, student_id=1 + worker, issue_date=date.today(),
+                                      due_date=date.today() + timedelta(days=14), status='issued')
+                    db.session.add(issue)
+                    db.session.commit()
+                    open_issues.append(issue.id)
+                    counts['issued'] += 1
+                else:
+                    db.session.rollback()
+                    counts['refused'] += 1
+            except OperationalError:
+                db.session.rollback()
+                counts['failed'] += 1
+        return counts
+
+def bench_library():
+    import multiprocessing
+
+    context = multiprocessing.get_context('spawn')
+    with app.app_context():
+        build_dataset(max(args.workers), 0)
+        db.engine.dispose()
+
+    print(f"\n{'Mode':<8}{'Workers':>8}{'Ops/s':>10}{'Issued':>9}{'Returned':>10}{'Refused':>9}{'Failed':>8}{'Drift':>7}")
+    for mode in args.modes:
+        for workers in args.workers:
+            with app.app_context():
+                db.session.execute(BookIssue.__table__.delete())
+                db.session.execute(update(Book).values(total_copies=args.copies, available_copies=args.copies))
+                db.session.commit()
+                db.engine.dispose()
+
+            start_at = time.time() + 2
+            with context.Pool(workers) as pool:
+                results = pool.starmap(library_worker, [(w, mode, args.books, args.seconds, start_at)
+                                                        for w in range(workers)])
+            totals = {key: sum(r[key] for r in results) for key in results[0]}
+
+            with app.app_context():
+                # Every copy is either on the shelf or out on an open issue
+                out = dict(db.session.query(BookIssue.book_id, func.count())
+                           .filter(BookIssue.status == 'issued').group_by(BookIssue.book_id).all())
+                drift = sum(abs(book.available_copies + out.get(book.id, 0) - book.total_copies)
+                            for book in Book.query.filter(Book.id <= args.books))
+                db.engine.dispose()
+
+            ops = totals['issued'] + totals['returned']
+            print(f"{mode:<8}{workers:>8}{ops / args.seconds:>10.1f}{totals['issued']:>9}{totals['returned']:>10}"
+                  f"{totals['refused']:>9}{totals['failed']:>8}{drift:>7}")
+
+def bench_rollover():
+    from app import TeacherSubject, rollover_academic_year, rollover_summary
+
+    with app.app_context():
+        build_dataset(args.students, 0)
+        classes = db.session.query(SchoolClass.id).count()
+        bulk_insert(TeacherSubject, [dict(teacher_id=1 + i % 50, subject_id=1 + i % 8, class_id=1 + i // 4)
+                                     for i in range(classes * 4)])
+        db.session.commit()
+        print(f"{args.students} students in {classes} classes")
+
+        for label, dry_run in (('dry run', True), ('rollover', False), ('repeat', False)):
+            report = rollover_academic_year('2023-2024', '2024-2025', dry_run=dry_run)
+            print(f"{label:<10}{report['seconds']:>8.2f}s  {rollover_summary(report)}")
+
+def bench_import():
+    import csv
+    from app import import_file_rows, import_students
+
+    path = os.path.join(tempfile.mkdtemp(prefix='sms-bench-'), 'intake.csv')
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['student_id', 'first_name', 'last_name', 'email', 'date_of_birth', 'class_id',
+                         'parent_email', 'parent_first_name', 'parent_last_name'])
+        for i in range(args.rows):
+            writer.writerow([f'NEW{i:06d}', 'First', f'Last{i}', f'new{i}@bench.test', '2012-09-01', 1 + i % 10,
+                             f'newparent{i // 2}@bench.test', 'Parent', f'Last{i}'])
+
+    print(f"\n{'Workers':>8}{'Rows':>8}{'Passwords':>11}{'Seconds':>10}{'Rows/s':>10}")
+    for workers in args.workers:
+        with app.app_context():
+            build_dataset(300, 0)
+            app.config['IMPORT_HASH_WORKERS'] = workers
+            with open(path, 'rb') as stream:
+                report = import_students(import_file_rows(stream, path))
+        print(f"{workers:>8}{report['imported']:>8}{report['imported'] + report['parents_created']:>11}"
+              f"{report['seconds']:>10.2f}{report['imported'] / report['seconds']:>10.1f}")
+
+def bench_fees():
+    from app import FeePlan, FeePlanItem, apply_fee_plan
+
+    with app.app_context():
+        build_dataset(args.students, 0)
+        term_start = date.today().replace(month=9, day=1)
+        plan = FeePlan(name='Bench plan', academic_year='2023-2024', items=[
+            FeePlanItem(fee_type=fee_type, amount=amount, due_date=term_start + timedelta(days=120 * instalment))
+            for fee_type, amount in (('tuition', 400), ('library', 25), ('transport', 120))
+            for instalment in range(2)
+        ])
+        db.session.add(plan)
+        db.session.commit()
+        print(f"{args.students} students, {len(plan.items)} fees per student")
+
+        for label in ('first run', 'repeat'):
+            (created, skipped), ms = timed(lambda: apply_fee_plan(plan, 'school'))
+            db.session.commit()
+            print(f"{label:<10}{ms / 1000:>8.2f}s  {created} fees created, {skipped} already billed")
+
+def bench_export():
+    import resource
+    import tracemalloc
+    from app import csv_chunks, export_rows, export_statement
+
+    def streamed():
+        headers, stmt = export_statement('attendance', {})
+        return sum(len(chunk) for chunk in csv_chunks(headers, export_rows(stmt)))
+
+    def loaded():
+        headers, stmt = export_statement('attendance', {})
+        return sum(len(chunk) for chunk in csv_chunks(headers, db.session.execute(stmt).all()))
+
+    with app.app_context():
+        build_dataset(args.students, args.days)
+        print(f"{args.students * args.days} attendance rows")
+        print(f"\n{'Mode':<10}{'MB out':>8}{'Seconds':>9}{'Peak MB':>9}{'RSS +MB':>9}")
+        # Streamed first: ru_maxrss only grows, so the loaded run's growth comes after it
+        for label, func in (('streamed', streamed), ('loaded', loaded)):
+            db.session.expunge_all()
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            tracemalloc.start()
+            size, ms = timed(func)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+            print(f"{label:<10}{size / 2**20:>8.1f}{ms / 1000:>9.2f}{peak / 2**20:>9.1f}{rss_growth / 1024:>9.1f}")
+
+def bench_report_cards():
+    from app import report_card_data, write_report_cards
+
+    out = os.path.join(tempfile.mkdtemp(prefix='sms-bench-'), 'report-cards.zip')
+    with app.app_context():
+        build_dataset(args.students, args.days)
+        class_ids = list(db.session.scalars(select(SchoolClass.id)))
+        cards, ms = timed(lambda: report_card_data(class_ids, '2023-2024'))
+        print(f"{len(cards)} students in {len(class_ids)} classes, data fetched in {ms / 1000:.2f}s")
+
+        print(f"\n{'Workers':>8}{'Seconds':>10}{'Cards/s':>10}{'Zip MB':>9}")
+        for workers in args.workers:
+            app.config['REPORT_CARD_WORKERS'] = workers
+            written, ms = timed(lambda: write_report_cards(cards, out))
+            print(f"{workers:>8}{ms / 1000:>10.2f}{written * 1000 / ms:>10.1f}{os.path.getsize(out) / 2**20:>9.1f}")
+
+def bench_receipts():
+    import shutil
+    from app import issue_receipts, receipt_archive_fee_ids, receipts_dir, write_receipt_archive
+
+    app.instance_path = tempfile.mkdtemp(prefix='sms-bench-')
+    out = os.path.join(app.instance_path, 'receipts.zip')
+    with app.app_context():
+        build_dataset(args.students, 0)
+        db.session.execute(update(Fee).values(status='paid', payment_date=date.today(), payment_method='online'))
+        db.session.commit()
+        fee_ids = receipt_archive_fee_ids()
+        print(f"{len(fee_ids)} paid fees")
+
+        print(f"\n{'Step':<18}{'Seconds':>9}{'Receipts/s':>12}")
+        steps = (('store', lambda: issue_receipts(fee_ids)),
+                 ('repeat store', lambda: issue_receipts(fee_ids)),
+                 ('archive', lambda: write_receipt_archive(fee_ids, out)))
+        for label, func in steps:
+            _, ms = timed(func)
+            db.session.commit()
+            print(f"{label:<18}{ms / 1000:>9.2f}{len(fee_ids) * 1000 / ms:>12.0f}")
+        shutil.rmtree(receipts_dir())
+
+def bench_rollups():
+    from app import (ATTENDANCE_KEY, ATTENDANCE_UPDATES, attendance_rows_written, bulk_upsert,
+                     class_attendance_summaries, rebuild_attendance_rollups, student_attendance_summaries)
+
+    def raw_student():
+        # What the student page did: load every record and count in Python
+        records = Attendance.query.filter_by(student_id=1).all()
+        return sum(record.status in ('present', 'late') for record in records) * 100 / len(records)
+
+    def raw_class():
+        return dict(db.session.execute(
+            select(Student.class_id, func.count()).join(Attendance, Attendance.student_id == Student.id)
+            .where(Student.class_id == 1).group_by(Student.class_id)
+        ).all())
+
+    def write_sheet(refresh, day):
+        # The upsert the attendance API runs, with and without its rollup refresh
+        rows = [dict(student_id=s, subject_id=1, date=day, status='present', remarks='', marked_by=1)
+                for s in range(1, 41)]
+        bulk_upsert(Attendance, rows, ATTENDANCE_KEY, ATTENDANCE_UPDATES)
+        if refresh:
+            attendance_rows_written(rows)
+        db.session.commit()
+
+    with app.app_context():
+        build_dataset(args.students, args.days)
+        counts, ms = timed(rebuild_attendance_rollups)
+        db.session.commit()
+        print(f"{args.students * args.days} attendance rows; rebuilt {counts[0]} student days and "
+              f"{counts[1]} class days in {ms / 1000:.2f}s")
+
+        print(f"\n{'Query':<28}{'Raw ms':>9}{'Rollup ms':>11}")
+        for label, raw, rollup in (
+            ('one student, all records', raw_student, lambda: student_attendance_summaries([1])),
+            ('one class, all records', raw_class, lambda: class_attendance_summaries([1])),
+        ):
+            db.session.expunge_all()
+            _, raw_ms = timed(raw, args.repeat)
+            _, rollup_ms = timed(rollup, args.repeat)
+            print(f"{label:<28}{raw_ms:>9.2f}{rollup_ms:>11.2f}")
+
+        print(f"\n{'40-row sheet write':<28}{'ms':>9}")
+        for label, refresh in (('without rollups', False), ('with rollups', True)):
+            day = date.today() + timedelta(days=1 + refresh * 1000)
+            _, ms = timed(lambda: write_sheet(refresh, day), args.repeat)
+            print(f"{label:<28}{ms:>9.2f}")
+
+def bench_analytics():
+    import statistics
+    from app import calculate_letter_grade, grade_analytics, invalidate_grade_analytics
+
+    points = {'A+': 4.0, 'A': 3.5, 'B+': 3.0, 'B': 2.5, 'C+': 2.0, 'C': 1.5, 'F': 0.0}
+
+    def per_class_loops(classes):
+        # One query per class and plain Python over the rows, for comparison
+        results = {}
+        for school_class in classes:
+            marks = {}
+            for student_id, subject_id, credits, percentage in db.session.execute(
+                select(Grade.student_id, Grade.subject_id, Subject.credits, Grade.percentage)
+                .join(Student, Grade.student_id == Student.id).join(Subject, Grade.subject_id == Subject.id)
+                .where(Student.class_id == school_class.id, Grade.academic_year == school_class.academic_year)
+            ):
+                marks.setdefault(student_id, {}).setdefault(subject_id, [credits, []])[1].append(float(percentage))
+            gpas = {}
+            for student_id, subjects in marks.items():
+                weighted = sum(points[calculate_letter_grade(sum(p) / len(p))] * c for c, p in subjects.values())
+                gpas[student_id] = weighted / sum(c for c, _ in subjects.values())
+            ranked = sorted(gpas.values(), reverse=True)
+            results[school_class.id] = ({student_id: ranked.index(gpa) + 1 for student_id, gpa in gpas.items()},
+                                        statistics.median(ranked) if ranked else None)
+        return results
+
+    with app.app_context():
+        build_dataset(args.students, 0)
+        db.session.execute(update(Grade).values(percentage=Grade.marks_obtained * 100 / Grade.total_marks))
+        db.session.commit()
+        classes = SchoolClass.query.all()
+        print(f"{args.students} students in {len(classes)} classes, {db.session.scalar(select(func.count(Grade.id)))} grades")
+
+        print(f"\n{'Mode':<24}{'Seconds':>9}")
+        _, ms = timed(lambda: per_class_loops(classes))
+        print(f"{'per-class loops':<24}{ms / 1000:>9.2f}")
+        invalidate_grade_analytics()
+        _, ms = timed(lambda: grade_analytics(classes))
+        print(f"{'vectorized, cold':<24}{ms / 1000:>9.2f}")
+        _, ms = timed(lambda: grade_analytics(classes))
+        print(f"{'vectorized, cached':<24}{ms / 1000:>9.2f}")
+
+def bench_regrade():
+    from grading import DEFAULT_SCALE
+    from app import GradingScale, GradingScaleBand, load_grading_scales, regrade_letters, scale_for
+
+    def reset_letters():
+        db.session.execute(update(Grade).values(grade_letter=DEFAULT_SCALE.case_expression(Grade.percentage)))
+        db.session.commit()
+
+    def python_loop():
+        # Read every grade with its class, look the letter up in Python and write back the changed ones
+        scales = load_grading_scales()
+        changed = []
+        for grade_id, percentage, letter, academic_year, grade_level in db.session.execute(
+            select(Grade.id, Grade.percentage, Grade.grade_letter, SchoolClass.academic_year, SchoolClass.grade_level)
+            .join(Student, Grade.student_id == Student.id).outerjoin(SchoolClass, Student.class_id == SchoolClass.id)
+        ):
+            new_letter = scale_for(scales, academic_year, grade_level).letter(percentage)
+            if new_letter != letter:
+                changed.append({'grade_id': grade_id, 'letter': new_letter})
+        if changed:
+            db.session.execute(text('UPDATE grade SET grade_letter = :letter WHERE id = :grade_id'), changed)
+        db.session.commit()
+        return len(changed)
+
+    def set_based():
+        changed = regrade_letters()
+        db.session.commit()
+        return changed
+
+    with app.app_context():
+        build_dataset(args.students, 0)
+        db.session.execute(update(Grade).values(percentage=Grade.marks_obtained * 100 / Grade.total_marks))
+        # A stricter scale for the whole school, so most letters move
+        scale = GradingScale(name='Stricter')
+        for minimum, letter, points in DEFAULT_SCALE.bands():
+            scale.bands.append(GradingScaleBand(min_percentage=min(minimum + 5, 100) if minimum else 0,
+                                                letter=letter, grade_points=points))
+        db.session.add(scale)
+        db.session.commit()
+        print(f"{args.students} students, {db.session.scalar(select(func.count(Grade.id)))} grades")
+
+        print(f"\n{'Mode':<24}{'Changed':>9}{'Seconds':>9}")
+        for label, regrade in (('python loop', python_loop), ('set-based CASE', set_based)):
+            reset_letters()
+            changed, ms = timed(regrade)
+            print(f"{label:<24}{changed:>9}{ms / 1000:>9.2f}")
+        changed, ms = timed(set_based)
+        print(f"{'set-based, up to date':<24}{changed:>9}{ms / 1000:>9.2f}")
+
+def bench_timetable():
+    from timetable import DAYS, RESOURCES
+    from app import timetable_audit, timetable_clashes
+
+    periods = [(dt_time(8 + p, 0), dt_time(8 + p, 45)) for p in range(6)]
+    class_count = max(1, args.slots // (len(DAYS) * len(periods)))
+
+    def pairwise(slots):
+        # Every pair of slots on the same day, for comparison
+        by_day = {}
+        for slot in slots:
+            by_day.setdefault(slot['day_of_week'], []).append(slot)
+        clashes = 0
+        for day_slots in by_day.values():
+            for i, a in enumerate(day_slots):
+                for b in day_slots[i + 1:]:
+                    if a['start_time'] < b['end_time'] and b['start_time'] < a['end_time']:
+                        clashes += sum(1 for r in RESOURCES if a[r] not in (None, '') and a[r] == b[r])
+        return clashes
+
+    with app.app_context():
+        build_dataset(class_count * 30, 0)
+        db.session.execute(delete(Timetable))
+        # One teacher and one room per class and period column, so only the 1% of
+        # slots given a random teacher or room can clash
+        teachers = db.session.scalar(select(func.count(Teacher.id)))
+        users = db.session.scalar(select(func.max(User.id)))
+        password_hash = 'pbkdf2:sha256:600000$bench$' + '0' * 64
+        extra = max(0, class_count - teachers)
+        bulk_insert(User, [dict(username=f'extra{i}', email=f'extra{i}@bench.test', password_hash=password_hash,
+                                role='teacher', first_name='Extra', last_name=str(i)) for i in range(extra)])
+        bulk_insert(Teacher, [dict(user_id=users + 1 + i, teacher_id=f'X{i:05d}') for i in range(extra)])
+        rng = random.Random(7)
+        rows = []
+        for c in range(class_count):
+            for day in DAYS:
+                for p, (start, end) in enumerate(periods):
+                    column = (c + p) % class_count
+                    rows.append(dict(class_id=1 + c, subject_id=1 + p % 8, day_of_week=day, start_time=start, end_time=end,
+                                     teacher_id=1 + (rng.randrange(class_count) if rng.random() < 0.01 else column),
+                                     room_number=f'R{rng.randrange(class_count) if rng.random() < 0.01 else column}'))
+        bulk_insert(Timetable, rows)
+        # An empty class for the single-slot checks, so its own slots never clash
+        bulk_insert(SchoolClass, [dict(name='Class new', grade_level=1, section='B', academic_year='2023-2024')])
+        db.session.commit()
+        count = db.session.scalar(select(func.count(Timetable.id)))
+        print(f"{count} slots for {class_count} classes")
+
+        slots, ms = timed(timetable_audit, 5)
+        print(f"\n{'Whole-school audit':<28}{'Clashes':>9}{'ms':>10}")
+        print(f"{'sort and sweep':<28}{len(slots):>9}{ms:>10.1f}")
+        columns = ('id', 'class_id', 'subject_id', 'teacher_id', 'day_of_week', 'start_time', 'end_time', 'room_number')
+        all_slots = [dict(zip(columns, row)) for row in db.session.execute(
+            select(*[getattr(Timetable, column) for column in columns]))]
+        clashes, ms = timed(lambda: pairwise(all_slots))
+        print(f"{'pairwise per day (no fetch)':<28}{clashes:>9}{ms:>10.1f}")
+
+        samples = [dict(rng.choice(rows), class_id=class_count + 1) for _ in range(args.repeat)]
+        print(f"\n{'Single-slot check':<28}{'ms':>10}")
+        _, ms = timed(lambda: [timetable_clashes(slot) for slot in samples])
+        print(f"{'with clash indexes':<28}{ms / args.repeat:>10.3f}")
+        for name in ('ix_timetable_class_day', 'ix_timetable_teacher_day', 'ix_timetable_room_day', 'ix_timetable_class_id'):
+            db.session.execute(text(f'DROP INDEX {name}'))
+        _, ms = timed(lambda: [timetable_clashes(slot) for slot in samples])
+        print(f"{'without (table scan)':<28}{ms / args.repeat:>10.3f}")
+
+def bench_timetable_generate():
+    from app import TeacherSubject, generate_school_timetable, replace_timetable, timetable_periods
+
+    days = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday')
+    periods = timetable_periods()
+    rooms = [f'R{i}' for i in range(args.rooms)]
+    # Six subjects four times a week and two three times: 30 of the 35 periods
+    credits = [4, 4, 4, 4, 4, 4, 3, 3]
+
+    with app.app_context():
+        build_dataset(args.classes * 30, 0)
+        db.session.execute(delete(Timetable))
+        teachers = db.session.scalar(select(func.count(Teacher.id)))
+        users = db.session.scalar(select(func.max(User.id)))
+        password_hash = 'pbkdf2:sha256:600000$bench$' + '0' * 64
+        extra = max(0, args.teachers - teachers)
+        bulk_insert(User, [dict(username=f'extra{i}', email=f'extra{i}@bench.test', password_hash=password_hash,
+                                role='teacher', first_name='Extra', last_name=str(i)) for i in range(extra)])
+        bulk_insert(Teacher, [dict(user_id=users + 1 + i, teacher_id=f'X{i:05d}') for i in range(extra)])
+        for subject_id, count in enumerate(credits, 1):
+            db.session.execute(update(Subject).where(Subject.id == subject_id).values(credits=count))
+        # Each subject has its own pool of teachers, shared out over the classes
+        teacher_ids = db.session.scalars(select(Teacher.id).order_by(Teacher.id).limit(args.teachers)).all()
+        pools = [teacher_ids[s * len(teacher_ids) // len(credits):(s + 1) * len(teacher_ids) // len(credits)]
+                 for s in range(len(credits))]
+        bulk_insert(TeacherSubject, [dict(teacher_id=pool[c % len(pool)], subject_id=s + 1, class_id=c + 1)
+                                     for c in range(args.classes) for s, pool in enumerate(pools)])
+        db.session.commit()
+        class_ids = list(range(1, args.classes + 1))
+        print(f"{args.classes} classes, {len(teacher_ids)} teachers, {args.rooms} rooms, "
+              f"{sum(credits) * args.classes} lessons in {len(days) * len(periods)} periods")
+
+        print(f"\n{'Workers':>8}{'First (s)':>11}{'Restarts':>10}{'Best':>8}{'Repeats':>9}{'Gaps':>6}")
+        for workers in args.workers:
+            # Time to the first complete timetable, then the best one in the budget
+            (first, _, _), ms = timed(lambda: generate_school_timetable(class_ids, '2023-2024', args.seconds, workers,
+                                                                        days, periods, rooms, target_score=0))
+            first_seconds = ms / 1000 if first['complete'] else float('nan')
+            best, slots, fixed = generate_school_timetable(class_ids, '2023-2024', args.seconds, workers,
+                                                           days, periods, rooms)
+            penalties = best['penalties']
+            print(f"{workers:>8}{first_seconds:>11.2f}{best['restarts']:>10}{best['score']:>8.1f}"
+                  f"{penalties['repeats']:>9}{penalties['teacher_gaps'] + penalties['class_gaps']:>6}")
+        if best['complete']:
+            replace_timetable(class_ids, slots, fixed)
+            db.session.commit()
+            print(f"\n{db.session.scalar(select(func.count(Timetable.id)))} slots written without clashes")
+
+def run_migration(func):
+    with db.engine.begin() as conn:
+        func(conn)
+
+BENCHMARKS = {
+    'indexes': bench_indexes,
+    'attendance': bench_attendance,
+    'grades': bench_grades,
+    'concurrency': bench_concurrency,
+    'library': bench_library,
+    'rollover': bench_rollover,
+    'import': bench_import,
+    'fees': bench_fees,
+    'export': bench_export,
+    'report-cards': bench_report_cards,
+    'receipts': bench_receipts,
+    'rollups': bench_rollups,
+    'analytics': bench_analytics,
+    'regrade': bench_regrade,
+    'timetable': bench_timetable,
+    'timetable-generate': bench_timetable_generate,
+}
+
+if __name__ == '__main__':
+    print(f"Database: {args.database_url}")
+    BENCHMARKS[args.benchmark]()
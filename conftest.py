@@ -0,0 +1,79 @@
+"""
+Shared pytest setup for School Management System
+Points the app at a scratch database and provides a small sample school that
+each test gets freshly built.
+"""
+
+import os
+import tempfile
+from types import SimpleNamespace
+
+# app reads DATABASE_URL at import time, so point it at a scratch database first
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='sms-test-'), 'test.db')
+
+import pytest
+from app import (app, db, User, Student, Teacher, SchoolClass, Subject, TeacherSubject,
+                 analytics_cache, identity_cache, widget_cache)
+
+DUMMY_HASH = 'pbkdf2:sha256:1$test$' + '0' * 64
+
+def add_user(username, role, password=None, **fields):
+    user = User(username=username, email=f'{username}@test.school', role=role, first_name=username.title(),
+                last_name='Test', password_hash=DUMMY_HASH, **fields)
+    if password:
+        user.set_password(password)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+def add_student(username, class_id, parent_id=None):
+    student = Student(user_id=add_user(username, 'student').id, student_id=username.upper(),
+                      class_id=class_id, parent_id=parent_id)
+    db.session.add(student)
+    db.session.flush()
+    return student
+
+@pytest.fixture
+def sample_school():
+    """Two classes in the current year, a teacher of the first, a teacher of neither and five students
+
+    Ids are returned rather than objects, since each test opens its own app context.
+    """
+    identity_cache.clear()
+    analytics_cache.clear()
+    widget_cache.update(snapshot=None, expires=0.0)
+    year = app.config['CURRENT_ACADEMIC_YEAR']
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        add_user('admin', 'admin', 'admin123')
+        teacher = Teacher(user_id=add_user('teacher', 'teacher', 'teacher123').id, teacher_id='T-1')
+        outsider = Teacher(user_id=add_user('outsider', 'teacher', 'outsider123').id, teacher_id='T-2')
+        parent = add_user('parent', 'parent', 'parent123')
+        db.session.add_all([teacher, outsider])
+        db.session.flush()
+        first = SchoolClass(name='Grade 5', grade_level=5, section='A', academic_year=year, class_teacher_id=teacher.id)
+        second = SchoolClass(name='Grade 6', grade_level=6, section='A', academic_year=year)
+        subject = Subject(name='Mathematics', code='MATH')
+        db.session.add_all([first, second, subject])
+        db.session.flush()
+        db.session.add(TeacherSubject(teacher_id=teacher.id, subject_id=subject.id, class_id=first.id))
+        students = [add_student(f's{i}', first.id, parent.id if i == 1 else None) for i in range(1, 4)]
+        students += [add_student(f's{i}', second.id) for i in range(4, 6)]
+        db.session.commit()
+        return SimpleNamespace(year=year, teacher_id=teacher.id, outsider_id=outsider.id, parent_id=parent.id,
+                               class_ids=[first.id, second.id], subject_id=subject.id,
+                               student_ids=[student.id for student in students])
+
+def give_passwords(*usernames):
+    """Let sample accounts created without a password log in as <username>123"""
+    with app.app_context():
+        for user in User.query.filter(User.username.in_(usernames)):
+            user.set_password(f'{user.username}123')
+        db.session.commit()
+
+def login(username, password=None):
+    client = app.test_client()
+    response = client.post('/login', data={'username': username, 'password': password or f'{username}123'})
+    assert response.status_code == 302, f'{username} could not log in'
+    return client
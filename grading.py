@@ -0,0 +1,68 @@
+"""
+Grading scales for School Management System
+
+A scale is a table of bands, each a minimum percentage with its letter and
+grade points. Lookups are a binary search over the sorted minimums, and
+case_expression turns the same table into a SQL CASE so stored letters can
+be rewritten by the database in one statement. The stored scales are
+app.GradingScale rows; this module has no app imports so analytics.py can
+use the same tables.
+"""
+
+from bisect import bisect_right
+from sqlalchemy import case
+
+# (minimum percentage, letter, grade points), used when no scale is stored
+DEFAULT_BANDS = (
+    (90, 'A+', 4.0),
+    (80, 'A', 3.5),
+    (70, 'B+', 3.0),
+    (60, 'B', 2.5),
+    (50, 'C+', 2.0),
+    (40, 'C', 1.5),
+    (0, 'F', 0.0),
+)
+
+class Scale:
+    """Bands sorted by minimum percentage; the lowest band covers everything below it too"""
+
+    def __init__(self, bands):
+        bands = sorted((float(minimum), letter, float(points)) for minimum, letter, points in bands)
+        if not bands:
+            raise ValueError('a grading scale needs at least one band')
+        minimums = [minimum for minimum, _, _ in bands]
+        if not all(0 <= minimum <= 100 for minimum in minimums):
+            raise ValueError('minimum percentages must be between 0 and 100')
+        if len(set(minimums)) != len(minimums):
+            raise ValueError('each band needs a different minimum percentage')
+        self.minimums = minimums
+        self.letters = [letter for _, letter, _ in bands]
+        self.points = [points for _, _, points in bands]
+
+    def band(self, percentage):
+        return max(bisect_right(self.minimums, float(percentage)) - 1, 0)
+
+    def letter(self, percentage):
+        return self.letters[self.band(percentage)]
+
+    def grade_points(self, percentage):
+        return self.points[self.band(percentage)]
+
+    def bands(self):
+        """(minimum, letter, points) from the highest band down"""
+        return list(zip(self.minimums, self.letters, self.points))[::-1]
+
+    def case_expression(self, percentage):
+        """SQL CASE giving the letter for a percentage column"""
+        whens = [(percentage >= minimum, letter) for minimum, letter, _ in self.bands()[:-1]]
+        if not whens:
+            return self.letters[0]
+        return case(*whens, else_=self.letters[0])
+
+    def __eq__(self, other):
+        return isinstance(other, Scale) and self.bands() == other.bands()
+
+    def __hash__(self):
+        return hash(tuple(self.bands()))
+
+DEFAULT_SCALE = Scale(DEFAULT_BANDS)
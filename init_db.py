@@ -1,4 +1,4 @@
-from app import app, db, User, Student, Teacher, SchoolClass, Subject, TeacherSubject, Attendance, Grade, Fee, Book, BookIssue, Timetable
+from app import app, db, User, Student, Teacher, SchoolClass, Subject, TeacherSubject, Attendance, Grade, Fee, Book, BookIssue, Timetable, calculate_letter_grade, rebuild_attendance_rollups
 from werkzeug.security import generate_password_hash
 from datetime import date, datetime, time
 from decimal import Decimal
@@ -263,13 +263,15 @@ def init_database():
         # Create sample grades
         for student in student_objects:
             for subject in subject_objects[:3]:  # First 3 subjects
+                marks = random.randint(75, 98)
                 grade = Grade(
                     student_id=student.id,
                     subject_id=subject.id,
                     exam_type='Midterm',
-                    marks_obtained=Decimal(str(random.randint(75, 98))),
+                    marks_obtained=Decimal(str(marks)),
                     total_marks=Decimal('100.00'),
-                    grade_letter='A' if random.randint(75, 98) >= 90 else 'B',
+                    percentage=Decimal(str(marks)),
+                    grade_letter=calculate_letter_grade(marks),
                     exam_date=date(2023, 10, 15),
                     teacher_id=teacher_objects[0].id
                 )
@@ -355,6 +357,9 @@ def init_database():
                 )
                 db.session.add(attendance)
         
+        db.session.flush()
+        rebuild_attendance_rollups()
+        
         # Commit all changes
         db.session.commit()
         print("Database initialized successfully!")
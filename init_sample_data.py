@@ -3,26 +3,10 @@
 Sample data initialization script for School Management System
 """
 
-from app import app, db, User, Student, Teacher, SchoolClass, Subject, Fee, Book, BookIssue, Attendance, Grade, TeacherSubject, Timetable
+from app import app, db, User, Student, Teacher, SchoolClass, Subject, Fee, Book, BookIssue, Attendance, Grade, TeacherSubject, Timetable, calculate_letter_grade, rebuild_attendance_rollups
 from datetime import date, datetime, timedelta
 import random
 
-def calculate_letter_grade(percentage):
-    if percentage >= 90:
-        return 'A+'
-    elif percentage >= 80:
-        return 'A'
-    elif percentage >= 70:
-        return 'B+'
-    elif percentage >= 60:
-        return 'B'
-    elif percentage >= 50:
-        return 'C+'
-    elif percentage >= 40:
-        return 'C'
-    else:
-        return 'F'
-
 def create_sample_data():
     with app.app_context():
         # Create tables
@@ -259,12 +243,16 @@ def create_sample_data():
                             exam_type=exam_type,
                             marks_obtained=marks,
                             total_marks=total_marks,
+                            percentage=percentage,
                             grade_letter=calculate_letter_grade(percentage),
                             teacher_id=1,  # Assuming first teacher
                             exam_date=date.today() - timedelta(days=random.randint(1, 60))
                         )
                         db.session.add(grade)
         
+        db.session.flush()
+        rebuild_attendance_rollups()
+        
         # Commit all changes
         db.session.commit()
         print("Sample data created successfully!")
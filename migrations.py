@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for School Management System
+
+db.create_all() only creates missing tables, so changes to existing tables
+(indexes, constraints, new columns) are applied here. Each migration runs
+once and is recorded in the schema_version table.
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # show applied and pending migrations
+"""
+
+import sys
+import time
+from datetime import datetime
+from sqlalchemy import inspect, text
+from app import app, db
+
+MIGRATIONS = []
+
+class MigrationError(Exception):
+    """A migration cannot run on the data as it is; nothing from it was applied"""
+
+def migration(version, description):
+    """Register a migration function under a version number"""
+    def decorator(f):
+        MIGRATIONS.append((version, description, f))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return f
+    return decorator
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR(200) NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL)"
+    ))
+
+def applied_versions():
+    with db.engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_version"))}
+
+def column_exists(conn, table, column):
+    return column in {c['name'] for c in inspect(conn).get_columns(table)}
+
+def add_column(conn, table, column, ddl):
+    """Add a column unless db.create_all() already created it"""
+    if not column_exists(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+def drop_index(conn, name, table):
+    """Drop an index if it exists"""
+    if name not in {i['name'] for i in inspect(conn).get_indexes(table)}:
+        return
+    conn.execute(text(f"DROP INDEX {name} ON {table}" if conn.dialect.name == 'mysql' else f"DROP INDEX {name}"))
+
+def create_index(conn, name, table, columns, unique=False, where=None):
+    """Create an index unless db.create_all() already created it; where makes it a partial index"""
+    if name in {i['name'] for i in inspect(conn).get_indexes(table)}:
+        return
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    conn.execute(text(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})" + (f" WHERE {where}" if where else "")))
+
+def refuse_duplicates(conn, table, columns, where=None):
+    """Raise MigrationError listing the keys that more than one row shares, before a unique index on them
+
+    Which of the rows to keep is for an operator to decide, so nothing is deleted here.
+    """
+    key = ', '.join(columns)
+    groups = conn.execute(text(
+        f"SELECT {key}, COUNT(*) FROM {table} " + (f"WHERE {where} " if where else "") +
+        f"GROUP BY {key} HAVING COUNT(*) > 1 ORDER BY {key}"
+    )).all()
+    if not groups:
+        return
+    rows = sum(group[-1] for group in groups)
+    listed = '\n'.join(f"  {', '.join(f'{c}={v}' for c, v in zip(columns, group))}: {group[-1]} rows"
+                       for group in groups[:20])
+    more = f"\n  ... and {len(groups) - 20} more" if len(groups) > 20 else ""
+    raise MigrationError(
+        f"{len(groups)} keys in {table} ({key}) are shared by {rows} rows; "
+        f"remove the extra rows and run the migrations again:\n{listed}{more}"
+    )
+
+# Migrations
+
+@migration(1, 'Indexes for hot lookup paths and natural-key unique indexes')
+def add_lookup_indexes(conn):
+    # Duplicate natural keys would make the unique indexes fail
+    refuse_duplicates(conn, 'attendance', ['student_id', 'date', 'subject_id'])
+    refuse_duplicates(conn, 'grade', ['student_id', 'subject_id', 'exam_type'])
+
+    create_index(conn, 'ix_student_user_id', 'student', ['user_id'])
+    create_index(conn, 'ix_student_class_id', 'student', ['class_id'])
+    create_index(conn, 'ix_student_parent_id', 'student', ['parent_id'])
+    create_index(conn, 'ix_teacher_user_id', 'teacher', ['user_id'])
+    create_index(conn, 'ix_teacher_subject_teacher_id', 'teacher_subject', ['teacher_id'])
+    create_index(conn, 'ix_teacher_subject_class_id', 'teacher_subject', ['class_id'])
+    create_index(conn, 'uq_attendance_student_date_subject', 'attendance', ['student_id', 'date', 'subject_id'], unique=True)
+    create_index(conn, 'ix_attendance_subject_date', 'attendance', ['subject_id', 'date'])
+    create_index(conn, 'uq_grade_student_subject_exam', 'grade', ['student_id', 'subject_id', 'exam_type'], unique=True)
+    create_index(conn, 'ix_fee_status', 'fee', ['status'])
+    create_index(conn, 'ix_fee_student_id', 'fee', ['student_id'])
+    create_index(conn, 'ix_book_issue_status_due_date', 'book_issue', ['status', 'due_date'])
+    create_index(conn, 'ix_book_issue_student_id', 'book_issue', ['student_id'])
+    create_index(conn, 'ix_timetable_class_id', 'timetable', ['class_id'])
+
+@migration(2, 'Stored percentage on grades; backfill percentage and missing letters')
+def add_grade_percentage(conn):
+    add_column(conn, 'grade', 'percentage', 'NUMERIC(5, 2)')
+    conn.execute(text(
+        "UPDATE grade SET percentage = ROUND(marks_obtained * 100.0 / total_marks, 2) "
+        "WHERE percentage IS NULL AND total_marks > 0"
+    ))
+    conn.execute(text(
+        "UPDATE grade SET grade_letter = CASE "
+        "WHEN percentage >= 90 THEN 'A+' "
+        "WHEN percentage >= 80 THEN 'A' "
+        "WHEN percentage >= 70 THEN 'B+' "
+        "WHEN percentage >= 60 THEN 'B' "
+        "WHEN percentage >= 50 THEN 'C+' "
+        "WHEN percentage >= 40 THEN 'C' "
+        "ELSE 'F' END "
+        "WHERE grade_letter IS NULL AND percentage IS NOT NULL"
+    ))
+
+@migration(3, 'Track when each dashboard counter last changed')
+def add_dashboard_stat_updated_at(conn):
+    add_column(conn, 'dashboard_stat', 'updated_at', 'TIMESTAMP')
+    conn.execute(text("UPDATE dashboard_stat SET updated_at = reconciled_at WHERE updated_at IS NULL"))
+
+@migration(4, 'Index fees by student, type and due date for fee plan duplicate checks')
+def add_fee_duplicate_index(conn):
+    create_index(conn, 'ix_fee_student_type_due', 'fee', ['student_id', 'fee_type', 'due_date'])
+
+@migration(5, 'Receipt numbers on fees for stored receipts')
+def add_fee_receipt_number(conn):
+    add_column(conn, 'fee', 'receipt_number', 'VARCHAR(20)')
+    create_index(conn, 'uq_fee_receipt_number', 'fee', ['receipt_number'], unique=True)
+
+@migration(6, 'Backfill the daily student and class attendance rollups')
+def backfill_attendance_rollups(conn):
+    counts = ", ".join(f"SUM(CASE WHEN a.status = '{status}' THEN 1 ELSE 0 END)" for status in ('present', 'absent', 'late'))
+    conn.execute(text("DELETE FROM class_attendance_daily"))
+    conn.execute(text("DELETE FROM student_attendance_daily"))
+    conn.execute(text(
+        "INSERT INTO student_attendance_daily (student_id, date, class_id, present, absent, late) "
+        f"SELECT a.student_id, a.date, s.class_id, {counts} "
+        "FROM attendance a JOIN student s ON s.id = a.student_id "
+        "GROUP BY a.student_id, a.date, s.class_id"
+    ))
+    conn.execute(text(
+        "INSERT INTO class_attendance_daily (class_id, date, present, absent, late, students) "
+        "SELECT class_id, date, SUM(present), SUM(absent), SUM(late), COUNT(*) "
+        "FROM student_attendance_daily WHERE class_id IS NOT NULL GROUP BY class_id, date"
+    ))
+
+@migration(7, 'Index timetable slots by class, teacher and room per day for clash checks')
+def add_timetable_clash_indexes(conn):
+    create_index(conn, 'ix_timetable_class_day', 'timetable', ['class_id', 'day_of_week', 'start_time'])
+    create_index(conn, 'ix_timetable_teacher_day', 'timetable', ['teacher_id', 'day_of_week', 'start_time'])
+    create_index(conn, 'ix_timetable_room_day', 'timetable', ['room_number', 'day_of_week', 'start_time'])
+
+@migration(8, 'Academic year on grades, part of their natural key')
+def add_grade_academic_year(conn):
+    add_column(conn, 'grade', 'academic_year', 'VARCHAR(10)')
+    # Existing grades get the year of the student's current class, the best record there is
+    conn.execute(text(
+        "UPDATE grade SET academic_year = ("
+        "SELECT c.academic_year FROM student s JOIN school_class c ON c.id = s.class_id "
+        "WHERE s.id = grade.student_id) WHERE academic_year IS NULL"
+    ))
+    conn.execute(text("UPDATE grade SET academic_year = :year WHERE academic_year IS NULL"),
+                 {'year': app.config['CURRENT_ACADEMIC_YEAR']})
+    drop_index(conn, 'uq_grade_student_subject_exam', 'grade')
+    create_index(conn, 'uq_grade_student_subject_exam_year', 'grade',
+                 ['student_id', 'subject_id', 'exam_type', 'academic_year'], unique=True)
+
+@migration(9, 'Unique daily attendance per student and date when no subject is given')
+def add_daily_attendance_index(conn):
+    # NULLs never compare equal, so uq_attendance_student_date_subject lets daily rows repeat
+    if conn.dialect.name not in ('postgresql', 'sqlite'):
+        print("⚠️  Skipping migration 9: partial indexes need PostgreSQL or SQLite")
+        return
+    refuse_duplicates(conn, 'attendance', ['student_id', 'date'], where='subject_id IS NULL')
+    create_index(conn, 'uq_attendance_student_date_daily', 'attendance', ['student_id', 'date'],
+                 unique=True, where='subject_id IS NULL')
+
+def upgrade(verbose=True):
+    """Create missing tables and apply all pending migrations in order"""
+    with app.app_context():
+        db.create_all()
+        done = applied_versions()
+
+        for version, description, func in MIGRATIONS:
+            if version in done:
+                continue
+            started = time.perf_counter()
+            with db.engine.begin() as conn:
+                func(conn)
+                conn.execute(
+                    text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+                    {'v': version, 'd': description, 't': datetime.utcnow()}
+                )
+            if verbose:
+                print(f"✅ Applied migration {version:03d}: {description} ({time.perf_counter() - started:.2f}s)")
+
+def print_status():
+    with app.app_context():
+        done = applied_versions()
+        for version, description, _ in MIGRATIONS:
+            marker = '✅' if version in done else '⏳'
+            print(f"{marker} {version:03d} {description}")
+
+if __name__ == '__main__':
+    if '--status' in sys.argv:
+        print_status()
+    else:
+        try:
+            upgrade()
+        except MigrationError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print("🎉 Database schema is up to date")
@@ -6,6 +6,7 @@ This runs automatically when deployed to Railway
 
 from app import app, db
 from init_sample_data import create_sample_data
+from migrations import upgrade
 import os
 
 def initialize_production():
@@ -13,8 +14,8 @@ def initialize_production():
     with app.app_context():
         print("🚀 Initializing Railway production database...")
         
-        # Create all tables
-        db.create_all()
+        # Create all tables and apply schema migrations
+        upgrade()
         print("✅ Database tables created")
         
         # Add sample data
@@ -0,0 +1,156 @@
+"""
+Report card rendering for School Management System
+
+render_report_card turns one student's card, the plain dict built by
+app.report_card_data, into PDF bytes. It only uses the standard library and
+does not import the app, so a process pool can fan rendering out without
+every worker loading Flask and opening database connections.
+"""
+
+import textwrap
+from datetime import date
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 50
+ROW_HEIGHT = 16
+
+class PDFCanvas:
+    """Just enough PDF for a report card: Helvetica text, rules and page breaks"""
+
+    def __init__(self):
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.ops = []
+        self.pages.append(self.ops)
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def ensure_space(self, height):
+        if self.y - height < MARGIN:
+            self.new_page()
+
+    def text(self, x, value, size=10, bold=False):
+        value = str(value).encode('cp1252', 'replace').decode('cp1252')
+        escaped = value.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        self.ops.append(f"BT /{'F2' if bold else 'F1'} {size} Tf {x:.1f} {self.y:.1f} Td ({escaped}) Tj ET")
+
+    def rule(self, width=0.5):
+        self.ops.append(f"{width} w {MARGIN} {self.y:.1f} m {PAGE_WIDTH - MARGIN} {self.y:.1f} l S")
+
+    def render(self):
+        objects = [
+            b'<< /Type /Catalog /Pages 2 0 R >>',
+            None,  # the page tree, once the page object numbers are known
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+        ]
+        page_numbers = []
+        for ops in self.pages:
+            stream = '\n'.join(ops).encode('cp1252')
+            objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+            objects.append((f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+                            f'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {len(objects)} 0 R >>').encode())
+            page_numbers.append(len(objects))
+        kids = ' '.join(f'{number} 0 R' for number in page_numbers)
+        objects[1] = f'<< /Type /Pages /Kids [{kids}] /Count {len(page_numbers)} >>'.encode()
+
+        out = bytearray(b'%PDF-1.4\n')
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(len(out))
+            out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        xref = len(out)
+        out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        for offset in offsets:
+            out += b'%010d 00000 n \n' % offset
+        out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+        return bytes(out)
+
+def format_score(score):
+    if not score:
+        return '-'
+    percentage, letter = score
+    return f'{percentage:.1f}% ({letter})' if letter else f'{percentage:.1f}%'
+
+def render_report_card(card):
+    """Render one student's report card to PDF bytes"""
+    pdf = PDFCanvas()
+    student = card['student']
+
+    pdf.text(MARGIN, card['school'], 18, bold=True)
+    pdf.y -= 22
+    pdf.text(MARGIN, f"Report Card {card['academic_year']}", 12)
+    pdf.y -= 10
+    pdf.rule(1)
+    pdf.y -= 20
+
+    for label, value in (('Student', student['name']), ('Student ID', student['student_id']),
+                         ('Class', student['class']), ('Class Teacher', student['class_teacher'] or '-'),
+                         ('Period', card['period'])):
+        pdf.text(MARGIN, label, bold=True)
+        pdf.text(MARGIN + 100, value)
+        pdf.y -= ROW_HEIGHT
+
+    # Grades: one row per subject, one column per exam type
+    pdf.y -= 12
+    pdf.text(MARGIN, 'Grades', 13, bold=True)
+    pdf.y -= 20
+    exam_types = card['exam_types']
+    subject_width = 140
+    column_width = (PAGE_WIDTH - 2 * MARGIN - subject_width) / (len(exam_types) + 1)
+    size = 9 if column_width >= 70 else 7
+
+    def header():
+        pdf.text(MARGIN, 'Subject', size, bold=True)
+        for i, exam_type in enumerate(exam_types + ['Average']):
+            pdf.text(MARGIN + subject_width + i * column_width, exam_type.title(), size, bold=True)
+        pdf.y -= 6
+        pdf.rule()
+        pdf.y -= 12
+
+    header()
+    for subject in card['subjects']:
+        pdf.ensure_space(ROW_HEIGHT)
+        if pdf.y == PAGE_HEIGHT - MARGIN:
+            header()
+        pdf.text(MARGIN, subject['name'], size)
+        for i, exam_type in enumerate(exam_types):
+            pdf.text(MARGIN + subject_width + i * column_width, format_score(subject['scores'].get(exam_type)), size)
+        pdf.text(MARGIN + subject_width + len(exam_types) * column_width, format_score(subject['average']), size, bold=True)
+        pdf.y -= ROW_HEIGHT
+    if not card['subjects']:
+        pdf.text(MARGIN, 'No grades recorded for this period.', size)
+        pdf.y -= ROW_HEIGHT
+    if card['overall']:
+        pdf.y -= 4
+        pdf.text(MARGIN, 'Overall', size, bold=True)
+        pdf.text(MARGIN + subject_width + len(exam_types) * column_width, format_score(card['overall']), size, bold=True)
+        pdf.y -= ROW_HEIGHT
+
+    # Attendance summary
+    pdf.ensure_space(60)
+    pdf.y -= 12
+    pdf.text(MARGIN, 'Attendance', 13, bold=True)
+    pdf.y -= 20
+    attendance = card['attendance']
+    if attendance['total']:
+        pdf.text(MARGIN, f"Present {attendance['present']}, late {attendance['late']}, absent {attendance['absent']} "
+                         f"of {attendance['total']} records ({attendance['rate']:.1f}% attended)")
+    else:
+        pdf.text(MARGIN, 'No attendance recorded for this period.')
+    pdf.y -= ROW_HEIGHT
+
+    # Class teacher remarks
+    pdf.ensure_space(60)
+    pdf.y -= 12
+    pdf.text(MARGIN, 'Class Teacher Remarks', 13, bold=True)
+    pdf.y -= 20
+    for line in textwrap.wrap(card['remarks'] or '-', 95) or ['-']:
+        pdf.ensure_space(ROW_HEIGHT)
+        pdf.text(MARGIN, line)
+        pdf.y -= ROW_HEIGHT
+
+    pdf.y = MARGIN - 20
+    pdf.text(MARGIN, f"Generated {date.today().isoformat()}", 8)
+    return pdf.render()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Scheduled jobs for School Management System
+
+The nightly job marks pending fees and issued books that are past their due
+date as overdue and accrues library fines, each with one set-based UPDATE.
+Every statement only touches rows whose stored value is out of date, so a
+second run on the same day changes nothing.
+
+Usage:
+    python scheduler.py                 # run the nightly jobs at NIGHTLY_JOB_TIME, forever
+    python scheduler.py run [job ...]   # run jobs once now (default: all)
+    python scheduler.py list            # list the jobs
+"""
+
+import sys
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import Integer, cast, func, literal, or_, update
+from app import app, db, Fee, BookIssue, reconcile_stats
+
+JOBS = {}
+
+def job(name):
+    """Register a nightly job under a name"""
+    def decorator(f):
+        JOBS[name] = f
+        return f
+    return decorator
+
+def days_overdue(today, due_date):
+    """SQL expression for the number of whole days from due_date to today"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        return cast(func.julianday(today) - func.julianday(due_date), Integer)
+    if dialect == 'mysql':
+        return func.datediff(today, due_date)
+    # PostgreSQL: date - date is an integer number of days
+    return literal(today) - due_date
+
+# Jobs
+
+@job('mark-overdue')
+def mark_overdue(today=None):
+    """Mark overdue fees and book issues and bring their fines up to date"""
+    today = today or date.today()
+    fine = days_overdue(today, BookIssue.due_date) * app.config['LIBRARY_FINE_PER_DAY']
+    touched = {}
+
+    touched['fees_overdue'] = db.session.execute(
+        update(Fee)
+        .where(Fee.status == 'pending', Fee.due_date < today)
+        .values(status='overdue')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    touched['issues_overdue'] = db.session.execute(
+        update(BookIssue)
+        .where(BookIssue.status == 'issued', BookIssue.due_date < today)
+        .values(status='overdue')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    touched['fines_accrued'] = db.session.execute(
+        update(BookIssue)
+        .where(BookIssue.status == 'overdue', or_(BookIssue.fine_amount.is_(None), BookIssue.fine_amount != fine))
+        .values(fine_amount=fine)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    # Overdue counters changed in bulk, so recount them in the same transaction
+    if touched['fees_overdue'] or touched['issues_overdue']:
+        reconcile_stats()
+    db.session.commit()
+    return touched
+
+def run_jobs(names=None, verbose=True):
+    """Run jobs once; returns {name: (rows touched per statement, seconds)}"""
+    results = {}
+    with app.app_context():
+        for name in names or JOBS:
+            started = time.perf_counter()
+            try:
+                touched = JOBS[name]()
+            except Exception:
+                db.session.rollback()
+                raise
+            elapsed = time.perf_counter() - started
+            results[name] = (touched, elapsed)
+
+            message = f"{name}: {', '.join(f'{key}={value}' for key, value in touched.items())} in {elapsed:.2f}s"
+            app.logger.info(message)
+            if verbose:
+                print(f"✅ {message}")
+    return results
+
+def seconds_until(clock, now=None):
+    """Seconds from now until the next HH:MM local time"""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in clock.split(':'))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+def serve():
+    clock = app.config['NIGHTLY_JOB_TIME']
+    print(f"⏰ Running {', '.join(JOBS)} every night at {clock}")
+    while True:
+        time.sleep(seconds_until(clock))
+        try:
+            run_jobs()
+        except Exception as e:
+            app.logger.exception('Nightly jobs failed')
+            print(f"❌ Nightly jobs failed: {e}")
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'serve'
+    if command == 'run':
+        unknown = [name for name in sys.argv[2:] if name not in JOBS]
+        if unknown:
+            sys.exit(f"Unknown job(s): {', '.join(unknown)}. Available: {', '.join(JOBS)}")
+        run_jobs(sys.argv[2:] or None)
+    elif command == 'list':
+        for name, job_func in JOBS.items():
+            print(f"{name}: {job_func.__doc__}")
+    else:
+        serve()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Grade analytics tests for School Management System
+Checks the vectorised results against the same figures worked out one
+student at a time, and that the app computes them from stored grades.
+
+Run with: python -m pytest test_analytics.py
+"""
+
+import numpy as np
+import pytest
+from analytics import school_results
+from grading import DEFAULT_SCALE
+from app import app, compute_grade_analytics
+from conftest import login
+
+# (class, student, subject, credits, percentage); student 2 sat two exams in subject 10
+ROWS = [
+    (1, 1, 10, 2, 95), (1, 1, 11, 1, 65),
+    (1, 2, 10, 2, 85), (1, 2, 10, 2, 75), (1, 2, 11, 1, 100),
+    (1, 3, 10, 2, 95), (1, 3, 11, 1, 65),
+    (2, 4, 10, 3, 45),
+]
+
+def expected_gpa(student_id):
+    marks = {}
+    for _, student, subject, credits, percentage in ROWS:
+        if student == student_id:
+            marks.setdefault(subject, (credits, []))[1].append(percentage)
+    weighted = [(credits, DEFAULT_SCALE.grade_points(np.mean(values))) for credits, values in marks.values()]
+    return sum(c * p for c, p in weighted) / sum(c for c, _ in weighted)
+
+def test_results_match_per_student_figures():
+    results = school_results(*zip(*ROWS))
+    assert sorted(results) == [1, 2]
+    students = {row['student_id']: row for row in results[1]['students']}
+    for student_id, row in students.items():
+        assert row['gpa'] == pytest.approx(expected_gpa(student_id), abs=0.005)
+    # Student 2 averages 80 in subject 10 for an A and leads; students 1 and 3 tie behind
+    assert [(row['student_id'], row['rank']) for row in results[1]['students']] == [(2, 1), (1, 2), (3, 2)]
+
+    gpas = sorted(expected_gpa(s) for s in (1, 2, 3))
+    assert results[1]['gpa']['median'] == pytest.approx(np.median(gpas), abs=0.005)
+    assert results[1]['gpa']['p25'] == pytest.approx(np.percentile(gpas, 25), abs=0.005)
+    subject = next(s for s in results[1]['subjects'] if s['subject_id'] == 10)
+    assert (subject['count'], subject['mean']) == (3, pytest.approx((95 + 80 + 95) / 3, abs=0.005))
+    assert results[2]['students'][0]['gpa'] == DEFAULT_SCALE.grade_points(45)
+
+def test_app_computes_from_stored_grades(sample_school):
+    school = sample_school
+    response = login('teacher').post('/api/v1/grades', json={
+        'subject_id': school.subject_id, 'exam_type': 'final', 'exam_date': '2024-05-20', 'total_marks': 100,
+        'grades': [{'student_id': s, 'marks': marks} for s, marks in zip(school.student_ids, [92, 70, 70])]})
+    assert response.status_code == 200, response.get_json()
+    with app.app_context():
+        results = compute_grade_analytics(school.class_ids, school.year)
+    assert results[school.class_ids[1]] == {'students': [], 'subjects': [], 'gpa': None}
+    ranks = {row['student_id']: row['rank'] for row in results[school.class_ids[0]]['students']}
+    assert ranks == dict(zip(school.student_ids[:3], [1, 2, 2]))
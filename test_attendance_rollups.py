@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Attendance rollup tests for School Management System
+Checks that the daily rollups stay consistent with the attendance records,
+matching a full rebuild, and do not block deleting a class that has attendance history.
+
+Run with: python -m pytest test_attendance_rollups.py
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+from app import (app, db, Attendance, Student, SchoolClass, StudentAttendanceDaily, ClassAttendanceDaily,
+                 rebuild_attendance_rollups)
+from conftest import login
+
+def post_attendance(client, school, day, statuses):
+    response = client.post('/api/v1/attendance', json={
+        'date': day.isoformat(), 'subject_id': school.subject_id,
+        'attendance': [{'student_id': student_id, 'status': status}
+                       for student_id, status in zip(school.student_ids, statuses)]})
+    assert response.status_code == 200, response.get_json()
+
+def rollups():
+    students = {(r.student_id, r.date, r.class_id, r.present, r.absent, r.late) for r in StudentAttendanceDaily.query}
+    classes = {(r.class_id, r.date, r.present, r.absent, r.late, r.students) for r in ClassAttendanceDaily.query}
+    return students, classes
+
+def test_rollups_match_raw_attendance(sample_school):
+    school = sample_school
+    teacher = login('teacher')
+    today = date.today()
+    post_attendance(teacher, school, today - timedelta(days=1), ['present', 'present', 'absent'])
+    post_attendance(teacher, school, today, ['present', 'late', 'absent'])
+    # A corrected sheet replaces the day's records
+    post_attendance(teacher, school, today, ['absent', 'late', 'present'])
+
+    with app.app_context():
+        raw = {}
+        for record in Attendance.query:
+            raw[(record.date, record.status)] = raw.get((record.date, record.status), 0) + 1
+        class_days = {(r.date, r.present, r.absent, r.late, r.students) for r in ClassAttendanceDaily.query}
+        assert class_days == {(day, raw.get((day, 'present'), 0), raw.get((day, 'absent'), 0),
+                               raw.get((day, 'late'), 0), 3) for day in (today - timedelta(days=1), today)}
+        assert (today, 1, 1, 1, 3) in class_days
+
+        incremental = rollups()
+        rebuild_attendance_rollups()
+        db.session.commit()
+        assert rollups() == incremental
+
+@pytest.fixture
+def foreign_keys():
+    """Enforce foreign keys on SQLite as Postgres would"""
+    def enable(dbapi_connection, connection_record):
+        dbapi_connection.execute('PRAGMA foreign_keys=ON')
+    with app.app_context():
+        db.engine.dispose()
+        event.listen(db.engine, 'connect', enable)
+    yield
+    with app.app_context():
+        event.remove(db.engine, 'connect', enable)
+        db.engine.dispose()
+
+def test_delete_class_with_rollups(sample_school, foreign_keys):
+    school = sample_school
+    old_class, new_class = school.class_ids
+    post_attendance(login('teacher'), school, date.today(), ['present', 'absent', 'late'])
+
+    # As after a rollover: the old class keeps its history but no students
+    with app.app_context():
+        Student.query.filter_by(class_id=old_class).update({'class_id': new_class})
+        db.session.commit()
+        assert ClassAttendanceDaily.query.filter_by(class_id=old_class).count() == 1
+
+    response = login('admin').post(f'/admin/classes/{old_class}/delete')
+    assert response.status_code == 302
+
+    with app.app_context():
+        assert db.session.get(SchoolClass, old_class) is None
+        assert ClassAttendanceDaily.query.filter_by(class_id=old_class).count() == 0
+        days = StudentAttendanceDaily.query.all()
+        assert len(days) == 3
+        assert all(day.class_id is None for day in days)
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Export tests for School Management System
+Checks that CSV and XLSX exports carry the same rows.
+
+Run with: python -m pytest test_exports.py
+"""
+
+import csv
+import io
+from datetime import date
+
+from openpyxl import load_workbook
+from app import app, db, Fee
+from conftest import login
+
+def add_fees(school):
+    with app.app_context():
+        db.session.add_all([Fee(student_id=student_id, fee_type='tuition', amount=100 + student_id,
+                                due_date=date(2024, 1, 31), status='pending', academic_year=school.year)
+                            for student_id in school.student_ids])
+        db.session.commit()
+
+def test_csv_and_xlsx_exports_match(sample_school):
+    add_fees(sample_school)
+    admin = login('admin')
+
+    response = admin.get('/admin/exports/fees.csv')
+    assert response.status_code == 200
+    csv_rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+
+    response = admin.get('/admin/exports/fees.xlsx')
+    assert response.status_code == 200
+    sheet = load_workbook(io.BytesIO(response.get_data())).active
+    xlsx_rows = [['' if cell is None else str(cell) for cell in row] for row in sheet.iter_rows(values_only=True)]
+
+    assert len(csv_rows) == len(xlsx_rows) == 1 + len(sample_school.student_ids)
+    assert csv_rows[0] == xlsx_rows[0]
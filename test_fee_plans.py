@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Fee plan tests for School Management System
+Checks that applying a plan bills each student in scope once per item and
+that applying it again, or to a wider scope, skips fees already billed.
+
+Run with: python -m pytest test_fee_plans.py
+"""
+
+from datetime import date
+
+from app import app, db, Fee, FeePlan, FeePlanItem, apply_fee_plan
+
+def add_plan(school):
+    plan = FeePlan(name='Tuition', academic_year=school.year, items=[
+        FeePlanItem(fee_type='tuition', amount=500, due_date=date(2024, 9, 1)),
+        FeePlanItem(fee_type='tuition', amount=500, due_date=date(2025, 1, 1)),
+    ])
+    db.session.add(plan)
+    db.session.flush()
+    return plan
+
+def test_plan_skips_fees_already_billed(sample_school):
+    school = sample_school
+    with app.app_context():
+        plan = add_plan(school)
+        # One student already paid the first instalment by hand
+        db.session.add(Fee(student_id=school.student_ids[0], fee_type='tuition', amount=500,
+                           due_date=date(2024, 9, 1), status='paid', academic_year=school.year))
+        db.session.flush()
+
+        assert apply_fee_plan(plan, 'class', school.class_ids[0]) == (5, 1)
+        assert apply_fee_plan(plan, 'class', school.class_ids[0]) == (0, 6)
+        assert apply_fee_plan(plan, 'school') == (4, 6)
+        db.session.commit()
+
+        assert Fee.query.count() == 2 * len(school.student_ids)
+        assert len({(fee.student_id, fee.due_date) for fee in Fee.query}) == Fee.query.count()
+        assert Fee.query.filter_by(student_id=school.student_ids[0], status='paid').count() == 1
+
+def test_grade_scope(sample_school):
+    with app.app_context():
+        plan = add_plan(sample_school)
+        assert apply_fee_plan(plan, 'grade', 6) == (4, 0)
+        assert {fee.student_id for fee in Fee.query} == set(sample_school.student_ids[3:])
@@ -109,6 +109,15 @@ def test_teacher_functionality():
     else:
         print("❌ Teacher grades page not accessible")
     
+    # Test batch ingestion rejects invalid rows without saving anything
+    batch = '{"student_id": 1, "subject_id": 1, "date": "2024-01-15", "status": "present"}\n{"student_id": 1}\n'
+    response = session.post(f"{BASE_URL}/api/v1/attendance", data=batch,
+                            headers={'Content-Type': 'application/x-ndjson'})
+    if response.status_code == 422 and any(e['row'] == 2 for e in response.json().get('errors', [])):
+        print("✅ Attendance batch ingestion validates rows")
+    else:
+        print("❌ Attendance batch ingestion not validating rows")
+    
     # Test API endpoint for students
     response = session.get(f"{BASE_URL}/api/students/1")
     if response.status_code == 200:
@@ -214,6 +223,33 @@ def test_api_endpoints():
     else:
         print("❌ Students API endpoint not working")
     
+    # Test widget data answers revalidation with 304 Not Modified
+    response = session.get(f"{BASE_URL}/api/widget-data")
+    etag = response.headers.get('ETag')
+    if response.status_code == 200 and etag:
+        response = session.get(f"{BASE_URL}/api/widget-data", headers={'If-None-Match': etag})
+        if response.status_code == 304:
+            print("✅ Widget data endpoint working with conditional GET")
+        else:
+            print("❌ Widget data endpoint not answering 304 for a matching ETag")
+    else:
+        print("❌ Widget data endpoint not working")
+    
+    # Test keyset-paginated listing API by following next_cursor to the end
+    for resource in ['students', 'fees', 'attendance', 'book-issues']:
+        url = f"{BASE_URL}/api/v1/{resource}?limit=5"
+        rows = 0
+        while url:
+            response = session.get(url)
+            if response.status_code != 200:
+                print(f"❌ Listing API not working for {resource}")
+                break
+            data = response.json()
+            rows += len(data['data'])
+            url = f"{BASE_URL}/api/v1/{resource}?limit=5&cursor={data['next_cursor']}" if data['next_cursor'] else None
+        else:
+            print(f"✅ Listing API working for {resource} ({rows} rows)")
+    
     return True
 
 def test_database_operations():
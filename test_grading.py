@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Grading scale tests for School Management System
+Checks that a new scale rewrites the stored letters of the classes it covers
+and that the teacher's grade page previews letters with the same scale.
+
+Run with: python -m pytest test_grading.py
+"""
+
+import json
+import re
+
+from app import app, db, Grade, GradingScale, GradingScaleBand, regrade_letters
+from conftest import login
+
+PASS_FAIL = [(50, 'P', 1.0), (0, 'NP', 0.0)]
+
+def add_scale(bands, academic_year=None, grade_level=None):
+    with app.app_context():
+        scale = GradingScale(name='Custom', academic_year=academic_year, grade_level=grade_level)
+        for minimum, letter, points in bands:
+            scale.bands.append(GradingScaleBand(min_percentage=minimum, letter=letter, grade_points=points))
+        db.session.add(scale)
+        db.session.commit()
+
+def letters(school):
+    with app.app_context():
+        return dict(db.session.execute(db.select(Grade.student_id, Grade.grade_letter)
+                                       .where(Grade.student_id.in_(school.student_ids[:3]))).all())
+
+def test_regrade_assigns_the_new_scales_letters(sample_school):
+    school = sample_school
+    response = login('teacher').post('/api/v1/grades', json={
+        'subject_id': school.subject_id, 'exam_type': 'final', 'exam_date': '2024-05-20', 'total_marks': 100,
+        'grades': [{'student_id': s, 'marks': marks} for s, marks in zip(school.student_ids, [85, 55, 30])]})
+    assert response.status_code == 200, response.get_json()
+    s1, s2, s3 = school.student_ids[:3]
+    assert letters(school) == {s1: 'A', s2: 'C+', s3: 'F'}
+
+    # A scale for another grade level leaves these grades alone
+    add_scale(PASS_FAIL, grade_level=6)
+    with app.app_context():
+        assert regrade_letters() == 0
+    add_scale(PASS_FAIL, grade_level=5)
+    with app.app_context():
+        assert regrade_letters(grade_level=5) == 3
+        db.session.commit()
+        assert regrade_letters() == 0
+    assert letters(school) == {s1: 'P', s2: 'P', s3: 'NP'}
+
+def preview_scales(page):
+    return json.loads(re.search(r'const gradeScales = (.*);', page).group(1))
+
+def test_grade_page_previews_the_active_scale(sample_school):
+    teacher = login('teacher')
+    page = teacher.get('/teacher/grades').get_data(as_text=True)
+    assert preview_scales(page) == {}
+    assert '"B+"' in re.search(r'const defaultScale = (.*);', page).group(1)
+
+    add_scale(PASS_FAIL, grade_level=5)
+    page = teacher.get('/teacher/grades').get_data(as_text=True)
+    assert preview_scales(page) == {str(sample_school.class_ids[0]): [[50.0, 'P'], [0.0, 'NP']]}
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Student import tests for School Management System
+Checks that invalid rows are rejected without writing any of their accounts
+while the valid rows around them are imported, from CSV and XLSX files.
+
+Run with: python -m pytest test_import.py
+"""
+
+import csv
+import io
+
+from openpyxl import Workbook
+from app import app, User, Student, import_students
+from conftest import login
+
+HEADER = ['student_id', 'first_name', 'last_name', 'email', 'date_of_birth', 'class_id',
+          'parent_email', 'parent_first_name', 'parent_last_name']
+
+def intake(school):
+    first_class = school.class_ids[0]
+    return [
+        ['N1', 'Nia', 'New', 'nia@test.school', '2015-04-01', first_class, 'pat@test.school', 'Pat', 'New'],
+        ['S1', 'Dup', 'Id', 'dup@test.school', '2015-04-01', first_class, '', '', ''],
+        ['N2', 'Used', 'Email', 's2@test.school', '2015-04-01', first_class, '', '', ''],
+        ['N3', 'No', '', 'nolast@test.school', '2015-04-01', first_class, '', '', ''],
+        ['N4', 'Lost', 'Class', 'lost@test.school', '2015-04-01', 999, '', '', ''],
+        ['N5', 'Ola', 'Old', 'ola@test.school', '2015-04-01', '', 'pat@test.school', '', ''],
+    ]
+
+def test_bad_rows_are_rejected_without_partial_writes(sample_school, tmp_path):
+    rows = [(number, dict(zip(HEADER, map(str, values)))) for number, values in enumerate(intake(sample_school), 2)]
+    errors_path = tmp_path / 'errors.csv'
+    with app.app_context():
+        users_before = User.query.count()
+        report = import_students(iter(rows), str(errors_path))
+
+        assert (report['rows'], report['imported'], report['errors'], report['parents_created']) == (6, 2, 4, 1)
+        # Two students and the one new parent they share
+        assert User.query.count() == users_before + 3
+        imported = {s.student_id: s for s in Student.query.filter(Student.student_id.in_(['N1', 'N5']))}
+        assert imported['N1'].parent_id == imported['N5'].parent_id is not None
+        for email in ('dup@test.school', 'nolast@test.school', 'lost@test.school'):
+            assert User.query.filter_by(email=email).first() is None
+
+    with open(errors_path, newline='', encoding='utf-8') as f:
+        assert sorted(int(row['row']) for row in csv.DictReader(f)) == [3, 4, 5, 6]
+
+def test_xlsx_upload(sample_school, monkeypatch, tmp_path):
+    monkeypatch.setattr(app, 'instance_path', str(tmp_path))
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(HEADER)
+    sheet.append(intake(sample_school)[0])
+    upload = io.BytesIO()
+    workbook.save(upload)
+    upload.seek(0)
+
+    response = login('admin').post('/admin/students/import', data={'file': (upload, 'students.xlsx')},
+                                   content_type='multipart/form-data')
+    assert response.status_code == 200
+    with app.app_context():
+        assert Student.query.filter_by(student_id='N1').count() == 1
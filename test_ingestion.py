@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Batch ingestion tests for School Management System
+Checks that teachers can only submit attendance and grades for subjects they
+teach in the student's class, that resubmitting a sheet updates its rows in
+place, and that failures do not leak error details.
+
+Run with: python -m pytest test_ingestion.py
+"""
+
+from datetime import date
+
+import pytest
+from app import app, Attendance, Grade
+from conftest import login
+
+def attendance_sheet(school, student_ids):
+    return {'date': date.today().isoformat(), 'subject_id': school.subject_id,
+            'attendance': [{'student_id': student_id, 'status': 'present'} for student_id in student_ids]}
+
+def grade_sheet(school, student_ids):
+    return {'subject_id': school.subject_id, 'exam_type': 'quiz', 'exam_date': date.today().isoformat(),
+            'total_marks': 50, 'grades': [{'student_id': student_id, 'marks': 40} for student_id in student_ids]}
+
+SHEETS = [('/api/v1/attendance', attendance_sheet, Attendance), ('/api/v1/grades', grade_sheet, Grade)]
+
+@pytest.mark.parametrize('path, sheet, model', SHEETS)
+def test_teacher_writes_own_class(sample_school, path, sheet, model):
+    response = login('teacher').post(path, json=sheet(sample_school, sample_school.student_ids[:3]))
+    assert response.status_code == 200, response.get_json()
+    with app.app_context():
+        assert model.query.count() == 3
+
+@pytest.mark.parametrize('path, sheet, model', SHEETS)
+def test_teacher_cannot_write_other_class(sample_school, path, sheet, model):
+    # Students 4 and 5 are in the second class, which the teacher does not teach
+    response = login('teacher').post(path, json=sheet(sample_school, sample_school.student_ids))
+    assert response.status_code == 422
+    assert [e['row'] for e in response.get_json()['errors']] == [4, 5]
+
+    response = login('outsider').post(path, json=sheet(sample_school, sample_school.student_ids[:1]))
+    assert response.status_code == 422
+    with app.app_context():
+        assert model.query.count() == 0
+
+def test_attendance_resubmission_updates_in_place(sample_school):
+    teacher = login('teacher')
+    sheet = attendance_sheet(sample_school, sample_school.student_ids[:3])
+    assert teacher.post('/api/v1/attendance', json=sheet).status_code == 200
+    for row in sheet['attendance']:
+        row.update(status='late', remarks='bus')
+    assert teacher.post('/api/v1/attendance', json=sheet).status_code == 200
+    with app.app_context():
+        assert {(record.status, record.remarks) for record in Attendance.query} == {('late', 'bus')}
+        assert Attendance.query.count() == 3
+
+def test_grade_resubmission_updates_in_place(sample_school):
+    teacher = login('teacher')
+    sheet = grade_sheet(sample_school, sample_school.student_ids[:3])
+    assert teacher.post('/api/v1/grades', json=sheet).status_code == 200
+    for row in sheet['grades']:
+        row['marks'] = 20
+    assert teacher.post('/api/v1/grades', json=sheet).status_code == 200
+    with app.app_context():
+        assert {(float(grade.marks_obtained), float(grade.percentage), grade.grade_letter)
+                for grade in Grade.query} == {(20.0, 40.0, 'C')}
+        assert Grade.query.count() == 3
+
+def test_failure_does_not_leak_details(sample_school, monkeypatch):
+    def broken(*args):
+        raise RuntimeError('connection to server at "db.internal" failed')
+    monkeypatch.setattr('app.bulk_upsert', broken)
+
+    response = login('teacher').post('/api/v1/attendance', json=attendance_sheet(sample_school, sample_school.student_ids[:1]))
+    assert response.status_code == 500
+    assert 'db.internal' not in response.get_data(as_text=True)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Library circulation tests for School Management System
+Checks that the conditional UPDATEs never lend a copy that is not on the
+shelf and never return the same issue twice.
+
+Run with: python -m pytest test_library.py
+"""
+
+from datetime import date, timedelta
+
+from app import app, db, Book, BookIssue, close_issue, take_copy
+from conftest import login
+
+def add_book(copies=1):
+    with app.app_context():
+        book = Book(title='Matilda', author='Roald Dahl', total_copies=copies, available_copies=copies)
+        db.session.add(book)
+        db.session.commit()
+        return book.id
+
+def issue_form(book_id, student_id):
+    today = date.today()
+    return {'book_id': book_id, 'student_id': student_id, 'issue_date': today.isoformat(),
+            'due_date': (today + timedelta(days=14)).isoformat()}
+
+def test_last_copy_is_lent_once(sample_school):
+    book_id = add_book()
+    with app.app_context():
+        assert take_copy(book_id)
+        assert not take_copy(book_id)
+        db.session.rollback()
+
+    admin = login('admin')
+    first, second = sample_school.student_ids[:2]
+    admin.post('/admin/library/issue', data=issue_form(book_id, first))
+    admin.post('/admin/library/issue', data=issue_form(book_id, second))
+    with app.app_context():
+        assert [issue.student_id for issue in BookIssue.query] == [first]
+        assert db.session.get(Book, book_id).available_copies == 0
+
+def test_issue_is_returned_once(sample_school):
+    book_id = add_book()
+    admin = login('admin')
+    admin.post('/admin/library/issue', data=issue_form(book_id, sample_school.student_ids[0]))
+    with app.app_context():
+        # The loaded issue still reads 'issued' after the first close, like a second request's copy
+        issue = BookIssue.query.one()
+        assert close_issue(issue, date.today())
+        assert not close_issue(issue, date.today())
+        db.session.commit()
+        assert db.session.get(Book, book_id).available_copies == 1
+
+        issue_id = issue.id
+    admin.post(f'/admin/library/return/{issue_id}')
+    with app.app_context():
+        assert db.session.get(Book, book_id).available_copies == 1
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Schema migration tests for School Management System
+Checks that unique-index migrations refuse to run over duplicate rows rather
+than deleting them, and that daily attendance without a subject is unique.
+
+Run with: python -m pytest test_migrations.py
+"""
+
+from datetime import date
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from app import app, db, Attendance
+from migrations import MigrationError, add_daily_attendance_index, add_lookup_indexes, drop_index
+
+def attendance(student_id, subject_id, status='present'):
+    return {'student_id': student_id, 'subject_id': subject_id, 'date': date(2024, 1, 15), 'status': status}
+
+def test_daily_attendance_is_unique(sample_school):
+    student_id = sample_school.student_ids[0]
+    with app.app_context():
+        db.session.execute(insert(Attendance), [attendance(student_id, None), attendance(student_id, sample_school.subject_id)])
+        with pytest.raises(IntegrityError):
+            db.session.execute(insert(Attendance), [attendance(student_id, None, 'absent')])
+        db.session.rollback()
+
+@pytest.mark.parametrize('apply', [add_lookup_indexes, add_daily_attendance_index])
+def test_duplicates_abort_the_migration(sample_school, apply):
+    student_id = sample_school.student_ids[0]
+    with app.app_context(), db.engine.begin() as conn:
+        # As on a database from before the indexes
+        drop_index(conn, 'uq_attendance_student_date_subject', 'attendance')
+        drop_index(conn, 'uq_attendance_student_date_daily', 'attendance')
+        conn.execute(insert(Attendance), [attendance(student_id, None), attendance(student_id, None, 'late')])
+        with pytest.raises(MigrationError, match=f'student_id={student_id}, date=2024-01-15.*: 2 rows'):
+            apply(conn)
+        # Nothing was deleted
+        assert len(conn.execute(Attendance.__table__.select()).all()) == 2
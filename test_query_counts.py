@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Query count regression tests for School Management System
+Renders list and profile pages against a scratch database and checks that
+the number of SQL statements does not grow with the number of rows shown.
+
+Run with: python -m pytest test_query_counts.py
+"""
+
+import os
+import tempfile
+from datetime import date, time, timedelta
+
+# app reads DATABASE_URL at import time, so point it at a scratch database first
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='sms-test-'), 'test.db')
+
+import pytest
+from sqlalchemy import event
+from app import app, db, User, Student, Teacher, SchoolClass, Subject, TeacherSubject, Attendance, Grade
+
+DUMMY_HASH = 'pbkdf2:sha256:1$test$' + '0' * 64
+
+PAGES = [
+    ('admin', '/admin/dashboard'),
+    ('admin', '/admin/students'),
+    ('admin', '/admin/teachers'),
+    ('admin', '/admin/classes'),
+    ('admin', '/admin/subjects'),
+    ('teacher', '/teacher/attendance'),
+    ('teacher', '/teacher/grades'),
+    ('student', '/student/grades'),
+    ('student', '/student/attendance'),
+    ('parent', '/parent/children'),
+]
+
+def add_user(username, role, password=None):
+    user = User(username=username, email=f'{username}@test.school', role=role,
+                first_name=username.title(), last_name='Test', password_hash=DUMMY_HASH)
+    if password:
+        user.set_password(password)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+def add_rows(school, count):
+    """Add count classes, subjects, teachers, children and records for the login accounts"""
+    offset = len(school['classes'])
+    for i in range(offset, offset + count):
+        teacher = Teacher(user_id=add_user(f'teacher{i}', 'teacher').id, teacher_id=f'T{i:04d}')
+        db.session.add(teacher)
+        db.session.flush()
+        school_class = SchoolClass(name=f'Class {i}', grade_level=1, academic_year='2023-2024', class_teacher_id=teacher.id)
+        subject = Subject(name=f'Subject {i}', code=f'SUB{i:04d}')
+        db.session.add_all([school_class, subject])
+        db.session.flush()
+        school['classes'].append(school_class)
+
+        child = Student(user_id=add_user(f'child{i}', 'student').id, student_id=f'C{i:04d}',
+                        class_id=school_class.id, parent_id=school['parent'].id)
+        db.session.add(child)
+        db.session.add(TeacherSubject(teacher_id=school['teacher'].id, subject_id=subject.id, class_id=school_class.id))
+        db.session.add(TeacherSubject(teacher_id=teacher.id, subject_id=subject.id, class_id=school_class.id))
+        db.session.add(Grade(student_id=school['student'].id, subject_id=subject.id, exam_type='final',
+                             marks_obtained=75, total_marks=100, exam_date=date.today(), teacher_id=teacher.id))
+        db.session.add(Attendance(student_id=school['student'].id, subject_id=subject.id, status='present',
+                                  date=date.today() - timedelta(days=i), marked_by=teacher.id, time_in=time(8, 0)))
+    db.session.commit()
+
+@pytest.fixture(scope='module')
+def school():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin = add_user('admin', 'admin', 'admin123')
+        teacher = Teacher(user_id=add_user('teacher', 'teacher', 'teacher123').id, teacher_id='T-LOGIN')
+        parent = add_user('parent', 'parent', 'parent123')
+        db.session.add(teacher)
+        db.session.flush()
+        student = Student(user_id=add_user('student', 'student', 'student123').id, student_id='S-LOGIN')
+        db.session.add(student)
+        db.session.commit()
+        yield {'admin': admin, 'teacher': teacher, 'parent': parent, 'student': student, 'classes': []}
+
+def count_queries(role, path):
+    client = app.test_client()
+    client.post('/login', data={'username': role, 'password': f'{role}123'})
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = client.get(path)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+    assert response.status_code == 200, f'{path} returned {response.status_code}'
+    return len(statements)
+
+def test_query_count_independent_of_row_count(school):
+    with app.app_context():
+        add_rows(school, 2)
+    small = {path: count_queries(role, path) for role, path in PAGES}
+
+    with app.app_context():
+        add_rows(school, 20)
+    large = {path: count_queries(role, path) for role, path in PAGES}
+
+    grown = {path: (small[path], large[path]) for path in small if large[path] > small[path]}
+    assert not grown, f'Query count grows with row count (small, large): {grown}'
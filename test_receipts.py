@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Fee receipt tests for School Management System
+Checks that a receipt is stored once when a fee is paid, is never rewritten
+afterwards, is served from its receipt number with long-lived caching, and
+that archives zip the stored receipts.
+
+Run with: python -m pytest test_receipts.py
+"""
+
+import io
+import os
+import zipfile
+from datetime import date
+
+import pytest
+from app import (app, db, Fee, issue_receipts, receipt_archive_fee_ids, receipt_filename, receipts_dir,
+                 write_receipt_archive)
+from conftest import give_passwords, login
+
+FEE_FORM = {'fee_type': 'tuition', 'amount': '120.00', 'due_date': '2024-01-31', 'status': 'paid',
+            'payment_method': 'cash', 'academic_year': '2023-2024'}
+
+@pytest.fixture
+def receipts(monkeypatch, tmp_path):
+    monkeypatch.setattr(app, 'instance_path', str(tmp_path))
+
+def add_paid_fee(admin, student_id):
+    assert admin.post('/admin/fees/add', data=dict(FEE_FORM, student_id=student_id)).status_code == 302
+    with app.app_context():
+        return Fee.query.order_by(Fee.id.desc()).first().id
+
+def stored_receipt(fee_id):
+    with app.app_context():
+        number = db.session.get(Fee, fee_id).receipt_number
+        with open(os.path.join(receipts_dir(), receipt_filename(number)), encoding='utf-8') as f:
+            return number, f.read()
+
+def test_receipt_is_served_by_number_and_cached(sample_school, receipts):
+    admin = login('admin')
+    fee_id = add_paid_fee(admin, sample_school.student_ids[0])
+    number, _ = stored_receipt(fee_id)
+
+    response = admin.get(f'/admin/fees/{fee_id}/receipt')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith(f'/receipts/{number}')
+
+    response = admin.get(f'/receipts/{number}')
+    assert response.status_code == 200
+    assert number in response.get_data(as_text=True)
+    cache_control = {part.strip() for part in response.headers['Cache-Control'].split(',')}
+    assert {'private', 'immutable', 'max-age=31536000'} <= cache_control
+    assert 'no-cache' not in cache_control
+
+    # Only the fee's own student may download it besides admins
+    give_passwords('s1', 's2')
+    assert login('s1').get(f'/receipts/{number}').status_code == 200
+    assert login('s2').get(f'/receipts/{number}').status_code == 404
+
+def test_editing_a_paid_fee_keeps_its_receipt(sample_school, receipts):
+    admin = login('admin')
+    fee_id = add_paid_fee(admin, sample_school.student_ids[0])
+    number, text = stored_receipt(fee_id)
+
+    admin.post(f'/admin/fees/{fee_id}/edit', data=dict(FEE_FORM, amount='99.00'))
+    assert stored_receipt(fee_id) == (number, text)
+
+    # Marking it unpaid voids the receipt
+    admin.post(f'/admin/fees/{fee_id}/edit', data=dict(FEE_FORM, status='pending'))
+    with app.app_context():
+        assert db.session.get(Fee, fee_id).receipt_number is None
+    assert not os.path.exists(os.path.join(app.instance_path, 'receipts', receipt_filename(number)))
+
+def test_archive_stores_each_receipt_once(sample_school, receipts):
+    school = sample_school
+    with app.app_context():
+        fees = [Fee(student_id=student_id, fee_type='tuition', amount=120, due_date=date(2024, 1, 31),
+                    status=status, payment_date=date(2024, 1, 10), payment_method='cash', academic_year=school.year)
+                for student_id, status in zip(school.student_ids, ['paid', 'paid', 'pending', 'paid'])]
+        db.session.add_all(fees)
+        db.session.commit()
+        fee_ids = [fee.id for fee in fees]
+
+        assert issue_receipts(fee_ids) == 3
+        db.session.commit()
+        assert issue_receipts(fee_ids) == 0
+        numbers = {fee.id: fee.receipt_number for fee in Fee.query}
+        assert numbers[fee_ids[2]] is None
+
+        # The first class has two paid fees; the fourth student is in the second class
+        class_fees = receipt_archive_fee_ids(class_id=school.class_ids[0])
+        assert class_fees == fee_ids[:2]
+        out = io.BytesIO()
+        assert write_receipt_archive(class_fees, out) == 2
+        with zipfile.ZipFile(out) as archive:
+            assert sorted(archive.namelist()) == sorted(receipt_filename(numbers[i]) for i in fee_ids[:2])
+            for fee_id in fee_ids[:2]:
+                assert archive.read(receipt_filename(numbers[fee_id])).decode() == stored_receipt(fee_id)[1]
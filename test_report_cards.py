@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Report card tests for School Management System
+Checks that cards for an academic year list the students who were in the
+class that year, with that year's grades and attendance, after a rollover
+has moved them on.
+
+Run with: python -m pytest test_report_cards.py
+"""
+
+import pytest
+from app import app, SchoolClass, report_card_data, rollover_academic_year
+from conftest import login
+
+# Without attendance, the students are found from the class their grades were entered for
+@pytest.mark.parametrize('with_attendance', [True, False])
+def test_cards_for_last_year_after_rollover(sample_school, with_attendance):
+    school = sample_school
+    old_class = school.class_ids[0]
+    class_students = school.student_ids[:3]
+    teacher = login('teacher')
+    if with_attendance:
+        response = teacher.post('/api/v1/attendance', json={
+            'date': '2024-01-15', 'subject_id': school.subject_id,
+            'attendance': [{'student_id': s, 'status': 'present'} for s in class_students]})
+        assert response.status_code == 200, response.get_json()
+    response = teacher.post('/api/v1/grades', json={
+        'subject_id': school.subject_id, 'exam_type': 'final', 'exam_date': '2024-05-20', 'total_marks': 100,
+        'grades': [{'student_id': s, 'marks': 80} for s in class_students]})
+    assert response.status_code == 200, response.get_json()
+
+    with app.app_context():
+        rollover_academic_year(school.year, '2024-2025')
+        new_class = SchoolClass.query.filter_by(academic_year='2024-2025', grade_level=6).one().id
+
+        cards = report_card_data([old_class], school.year)
+        assert len(cards) == 3
+        for card in cards:
+            assert card['student']['class'] == 'Grade 5'
+            assert [subject['name'] for subject in card['subjects']] == ['Mathematics']
+            assert card['attendance']['total'] == int(with_attendance)
+
+        # The new year's cards list the promoted students without last year's records
+        cards = report_card_data([new_class], '2024-2025')
+        assert sorted(card['student']['student_id'] for card in cards) == ['S1', 'S2', 'S3']
+        assert all(not card['subjects'] and card['attendance']['total'] == 0 for card in cards)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Academic year rollover tests for School Management System
+Checks that a rollover clones the classes, moves each class up a grade,
+graduates the top grade, carries teaching assignments, and that a dry run
+or a second run changes nothing.
+
+Run with: python -m pytest test_rollover.py
+"""
+
+from app import app, db, User, Student, SchoolClass, TeacherSubject, rollover_academic_year
+
+NEW_YEAR = '2099-2100'
+
+def placement(school):
+    """{student id: (class academic year, grade level, account active)}"""
+    return {student_id: (year, level, active) for student_id, year, level, active in db.session.execute(
+        db.select(Student.id, SchoolClass.academic_year, SchoolClass.grade_level, User.is_active)
+        .join(SchoolClass, Student.class_id == SchoolClass.id).join(User, Student.user_id == User.id)
+        .where(Student.id.in_(school.student_ids)))}
+
+def test_rollover_moves_and_graduates(sample_school):
+    school = sample_school
+    with app.app_context():
+        report = rollover_academic_year(school.year, NEW_YEAR)
+        assert (report['classes_created'], report['students_promoted'], report['students_graduated'],
+                report['students_unplaced'], report['assignments_carried']) == (2, 3, 2, 0, 1)
+        assert [row['action'] for row in report['classes']] == ['promote', 'graduate']
+
+        placed = placement(school)
+        # Grade 5 moves into the new year's Grade 6; Grade 6 graduates and keeps its old class
+        assert all(placed[s] == (NEW_YEAR, 6, True) for s in school.student_ids[:3])
+        assert all(placed[s] == (school.year, 6, False) for s in school.student_ids[3:])
+
+        new_grade5 = SchoolClass.query.filter_by(academic_year=NEW_YEAR, grade_level=5).one()
+        assert new_grade5.class_teacher_id == school.teacher_id
+        assert TeacherSubject.query.filter_by(class_id=new_grade5.id, teacher_id=school.teacher_id).count() == 1
+
+        report = rollover_academic_year(school.year, NEW_YEAR)
+        assert (report['classes_created'], report['students_promoted'], report['students_graduated'],
+                report['assignments_carried']) == (0, 0, 0, 0)
+        assert placement(school) == placed
+
+def test_dry_run_changes_nothing(sample_school):
+    school = sample_school
+    with app.app_context():
+        before = placement(school)
+        report = rollover_academic_year(school.year, NEW_YEAR, dry_run=True)
+        assert (report['students_promoted'], report['students_graduated']) == (3, 2)
+        assert placement(school) == before
+        assert SchoolClass.query.filter_by(academic_year=NEW_YEAR).count() == 0
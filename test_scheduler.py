@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Nightly job tests for School Management System
+Checks that the overdue job moves fees and book issues past their due date
+to overdue, accrues fines by the day, and changes nothing when run again.
+
+Run with: python -m pytest test_scheduler.py
+"""
+
+from datetime import date, timedelta
+
+from app import app, db, Book, BookIssue, Fee
+from scheduler import mark_overdue
+
+TODAY = date(2024, 3, 10)
+
+def test_overdue_transitions(sample_school):
+    school = sample_school
+    student_id = school.student_ids[0]
+    fine_per_day = app.config['LIBRARY_FINE_PER_DAY']
+    with app.app_context():
+        book = Book(title='Holes', author='Louis Sachar', total_copies=3, available_copies=1)
+        db.session.add(book)
+        db.session.flush()
+        fees = [Fee(student_id=student_id, fee_type='tuition', amount=100, due_date=TODAY + timedelta(days=days),
+                    status=status, academic_year=school.year)
+                for status, days in [('pending', -1), ('pending', 1), ('paid', -1)]]
+        late = BookIssue(book_id=book.id, student_id=student_id, issue_date=TODAY - timedelta(days=17),
+                         due_date=TODAY - timedelta(days=3), status='issued')
+        on_time = BookIssue(book_id=book.id, student_id=student_id, issue_date=TODAY,
+                            due_date=TODAY + timedelta(days=14), status='issued')
+        db.session.add_all([*fees, late, on_time])
+        db.session.commit()
+
+        assert mark_overdue(TODAY) == {'fees_overdue': 1, 'issues_overdue': 1, 'fines_accrued': 1}
+        assert [fee.status for fee in fees] == ['overdue', 'pending', 'paid']
+        assert (late.status, float(late.fine_amount)) == ('overdue', 3 * fine_per_day)
+        assert on_time.status == 'issued'
+
+        assert mark_overdue(TODAY) == {'fees_overdue': 0, 'issues_overdue': 0, 'fines_accrued': 0}
+        assert mark_overdue(TODAY + timedelta(days=1))['fines_accrued'] == 1
+        db.session.refresh(late)
+        assert float(late.fine_amount) == 4 * fine_per_day
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Timetable clash detection and generation tests for School Management System
+Checks find_clashes and IntervalIndex against timetables with known clashes,
+and that search_timetable solves a small problem without any.
+
+Run with: python -m pytest test_timetable.py
+"""
+
+from datetime import time
+
+import pytest
+from timetable import IntervalIndex, find_clashes, generated_slots, search_timetable, timetable_problem
+
+DAYS = ('monday', 'tuesday')
+PERIODS = [(time(8), time(9)), (time(9), time(10)), (time(10), time(11))]
+
+def slot(class_id, teacher_id, room, day, start, end, subject_id=1):
+    return {'class_id': class_id, 'subject_id': subject_id, 'teacher_id': teacher_id, 'room_number': room,
+            'day_of_week': day, 'start_time': time(*start), 'end_time': time(*end)}
+
+def clash_set(clashes):
+    """{(resource, class of each slot)} so results compare regardless of order"""
+    return {(resource, frozenset((first['class_id'], second['class_id']))) for resource, first, second in clashes}
+
+# Class 1 is the slot every other one is compared with
+BASE = slot(1, 10, '101', 'monday', (9, 0), (10, 0))
+CASES = [
+    (slot(2, 10, '102', 'monday', (9, 30), (10, 30)), {('teacher_id', frozenset((1, 2)))}),
+    (slot(2, 11, '101', 'monday', (8, 30), (9, 15)), {('room_number', frozenset((1, 2)))}),
+    (slot(1, 11, '102', 'monday', (9, 15), (9, 45)), {('class_id', frozenset((1,)))}),
+    (slot(2, 10, '101', 'monday', (8, 0), (11, 0)),
+     {('teacher_id', frozenset((1, 2))), ('room_number', frozenset((1, 2)))}),
+    (slot(2, 10, '101', 'monday', (10, 0), (11, 0)), set()),  # starts as the other ends
+    (slot(2, 10, '101', 'tuesday', (9, 0), (10, 0)), set()),
+    (slot(2, 11, None, 'monday', (9, 0), (10, 0)), set()),
+]
+
+@pytest.mark.parametrize('other, expected', CASES)
+def test_find_clashes(other, expected):
+    assert clash_set(find_clashes([BASE, other])) == expected
+
+@pytest.mark.parametrize('other, expected', CASES)
+def test_interval_index_matches_find_clashes(other, expected):
+    found = IntervalIndex([BASE]).clashes(other)
+    assert {(resource, frozenset((row['class_id'], other['class_id']))) for resource, row in found} == expected
+
+def test_find_clashes_in_a_larger_timetable():
+    slots = [slot(c, 10 + c, f'R{c}', day, (8 + p, 0), (9 + p, 0))
+             for c in range(4) for day in DAYS for p in range(3)]
+    assert find_clashes(slots) == []
+    # Teacher 10 (class 0) also covers class 3 at the same time
+    slots.append(slot(3, 10, 'R9', 'tuesday', (9, 30), (10, 30)))
+    assert clash_set(find_clashes(slots)) == {('teacher_id', frozenset((0, 3))), ('class_id', frozenset((3,)))}
+
+def test_problem_rejects_overloaded_teacher():
+    lessons = [(1, 10, 1, 4), (2, 10, 2, 3)]
+    with pytest.raises(ValueError, match='teacher 10 needs 7 periods but has 6'):
+        timetable_problem(lessons, DAYS, PERIODS)
+
+def test_search_solves_small_problem():
+    # Three classes share two teachers and two rooms; one fixed slot already
+    # takes teacher 10 and room A on Monday morning
+    lessons = [(1, 10, 1, 2), (1, 11, 2, 2), (2, 10, 1, 2), (2, 11, 2, 1), (3, 11, 2, 2)]
+    rooms = ['A', 'B']
+    fixed = [slot(9, 10, 'A', 'monday', (8, 0), (9, 0))]
+    problem = timetable_problem(lessons, DAYS, PERIODS, rooms, fixed)
+    result = search_timetable(problem, seed=1, seconds=5)
+
+    assert result['complete']
+    assert result['placed'] == result['lessons'] == 9
+    slots = generated_slots(problem, result, DAYS, PERIODS, rooms, fixed)
+    assert find_clashes(slots + fixed) == []
+    counts = {}
+    for generated in slots:
+        key = (generated['class_id'], generated['teacher_id'], generated['subject_id'])
+        counts[key] = counts.get(key, 0) + 1
+    assert counts == {(class_id, teacher_id, subject_id): count for class_id, teacher_id, subject_id, count in lessons}
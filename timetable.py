@@ -0,0 +1,457 @@
+"""
+Timetable clash detection and generation for School Management System
+
+A slot is a dict with day_of_week, start_time, end_time and the resources it
+books: teacher_id, room_number and class_id. Two slots clash when they book
+the same resource on the same day at overlapping times; a slot that ends
+exactly when another starts does not clash.
+
+find_clashes audits a whole timetable by sorting once per resource and
+sweeping, and IntervalIndex answers "what would this slot clash with" by
+binary search, for checking slots one at a time as they are placed.
+
+search_timetable generates a clash-free timetable from lessons (a class's
+subject, its teacher and periods a week) by randomized backtracking with
+restarts. It does not import the app, so restarts can run in a process
+pool.
+"""
+
+import random
+import time
+from bisect import bisect_left
+from heapq import heappop, heappush
+
+DAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday')
+RESOURCES = ('teacher_id', 'room_number', 'class_id')
+
+def booked(slot):
+    """(resource, value) for each resource the slot books; a slot without a room books no room"""
+    return [(resource, slot[resource]) for resource in RESOURCES if slot.get(resource) not in (None, '')]
+
+def find_clashes(slots):
+    """[(resource, earlier slot, later slot)] for every pair of slots that clash
+
+    For each resource the slots are sorted by (value, day, start) and swept in
+    that order, keeping the ones still running in a heap keyed by end time.
+    Everything left in the heap when a slot starts overlaps it, so the cost is
+    O(n log n) plus the number of clashes instead of comparing every pair.
+    """
+    clashes = []
+    for resource in RESOURCES:
+        ordered = sorted((slot for slot in slots if slot.get(resource) not in (None, '')),
+                         key=lambda slot: (slot[resource], slot['day_of_week'], slot['start_time']))
+        group = None
+        running = []
+        for number, slot in enumerate(ordered):
+            if (slot[resource], slot['day_of_week']) != group:
+                group = (slot[resource], slot['day_of_week'])
+                running = []
+            while running and running[0][0] <= slot['start_time']:
+                heappop(running)
+            clashes.extend((resource, other, slot) for _, _, other in running)
+            heappush(running, (slot['end_time'], number, slot))
+    return clashes
+
+class IntervalIndex:
+    """Slots grouped by (resource, value, day) and sorted by start time
+
+    Lookups assume the slots in the index do not clash with each other, which
+    holds when each one is checked with clashes() before it is added: the
+    slots of a group are then disjoint, so their ends are sorted too and a
+    lookup stops at the first one that ends before the new slot starts.
+    """
+
+    def __init__(self, slots=()):
+        self.groups = {}
+        for slot in slots:
+            self.add(slot)
+
+    def keys(self, slot):
+        return [(resource, value, slot['day_of_week']) for resource, value in booked(slot)]
+
+    def clashes(self, slot):
+        """[(resource, slot)] for the indexed slots this one would clash with"""
+        found = []
+        for key in self.keys(slot):
+            group = self.groups.get(key)
+            if not group:
+                continue
+            starts, entries = group
+            # The last slot starting before this one ends, then back while they still overlap
+            i = bisect_left(starts, slot['end_time']) - 1
+            while i >= 0 and entries[i]['end_time'] > slot['start_time']:
+                found.append((key[0], entries[i]))
+                i -= 1
+        return found
+
+    def add(self, slot):
+        for key in self.keys(slot):
+            starts, entries = self.groups.setdefault(key, ([], []))
+            i = bisect_left(starts, slot['start_time'])
+            starts.insert(i, slot['start_time'])
+            entries.insert(i, slot)
+
+# Generation
+# A lesson group is one class's subject with its teacher and the number of
+# periods it needs a week. Slots are numbered day * periods per day + period,
+# and a set of slots is an int bitmask, so the slots where a class and its
+# teacher are both free and a room is left is one AND of three masks.
+
+# A subject twice in a day is worse than a free period in the middle of one
+PENALTY_WEIGHTS = {'repeats': 2, 'teacher_gaps': 1, 'class_gaps': 1}
+
+def bits(mask):
+    """Slot numbers set in a mask, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def busy_masks(rows, days, periods):
+    """(class, teacher, room) -> {id: mask} of generated slots that stored slot dicts overlap"""
+    masks = ({}, {}, {})
+    for row in rows:
+        if row['day_of_week'] not in days:
+            continue
+        first = days.index(row['day_of_week']) * len(periods)
+        for period, (start, end) in enumerate(periods):
+            if row['start_time'] < end and row['end_time'] > start:
+                for busy, value in zip(masks, (row['class_id'], row['teacher_id'], row['room_number'])):
+                    if value not in (None, ''):
+                        busy[value] = busy.get(value, 0) | 1 << (first + period)
+    return masks
+
+def timetable_problem(lessons, days, periods, rooms=(), fixed=()):
+    """The picklable problem the search works on
+
+    lessons are (class_id, teacher_id, subject_id, periods a week); fixed are
+    slot dicts that stay as they are and only take up their teachers, classes
+    and rooms. Without rooms, lessons are not given one. Raises ValueError
+    when a class, a teacher or the rooms have more lessons than free slots.
+    """
+    slot_count = len(days) * len(periods)
+    full = (1 << slot_count) - 1
+    class_busy, teacher_busy, room_busy = busy_masks(fixed, days, periods)
+    capacity = None
+    if rooms:
+        capacity = [sum(1 for room in rooms if not room_busy.get(room, 0) >> slot & 1) for slot in range(slot_count)]
+
+    class_load, teacher_load = {}, {}
+    for class_id, teacher_id, _, count in lessons:
+        class_load[class_id] = class_load.get(class_id, 0) + count
+        teacher_load[teacher_id] = teacher_load.get(teacher_id, 0) + count
+    problems = [f'class {class_id} needs {load} periods but has {(full & ~class_busy.get(class_id, 0)).bit_count()}'
+                for class_id, load in class_load.items() if load > (full & ~class_busy.get(class_id, 0)).bit_count()]
+    problems += [f'teacher {teacher_id} needs {load} periods but has {(full & ~teacher_busy.get(teacher_id, 0)).bit_count()}'
+                 for teacher_id, load in teacher_load.items() if load > (full & ~teacher_busy.get(teacher_id, 0)).bit_count()]
+    if capacity is not None and sum(class_load.values()) > sum(capacity):
+        problems.append(f'{sum(class_load.values())} lessons but only {sum(capacity)} room periods')
+    if problems:
+        raise ValueError('; '.join(problems))
+
+    return {
+        'lessons': [tuple(lesson) for lesson in lessons],
+        'days': len(days),
+        'periods_per_day': len(periods),
+        'class_busy': {class_id: class_busy.get(class_id, 0) for class_id in class_load},
+        'teacher_busy': {teacher_id: teacher_busy.get(teacher_id, 0) for teacher_id in teacher_load},
+        'room_capacity': capacity,
+    }
+
+class TimetableSearch:
+    """One randomized backtracking run over a timetable problem
+
+    The next lesson placed is the one with the least slack (free slots minus
+    lessons still to place, fewest first), and its slots are tried cheapest
+    first: avoiding a second lesson of a subject on one day and gaps in the
+    class's and teacher's day, with random tie-breaks that differ per seed.
+    After each placement every group sharing the class or teacher must still
+    have enough free slots, or the placement is undone.
+    """
+
+    def __init__(self, problem, seed):
+        self.rng = random.Random(seed)
+        self.groups = problem['lessons']
+        self.days = problem['days']
+        self.per_day = problem['periods_per_day']
+        self.full = (1 << (self.days * self.per_day)) - 1
+        self.day_masks = [((1 << self.per_day) - 1) << (day * self.per_day) for day in range(self.days)]
+        self.class_busy = dict(problem['class_busy'])
+        self.teacher_busy = dict(problem['teacher_busy'])
+        self.capacity = list(problem['room_capacity']) if problem['room_capacity'] is not None else None
+        self.room_full = 0
+        if self.capacity is not None:
+            self.rooms = max(max(self.capacity), 1)
+            self.room_full = sum(1 << slot for slot, rooms in enumerate(self.capacity) if rooms <= 0)
+
+        self.remaining = [count for *_, count in self.groups]
+        self.allowed = [-(-count // self.days) for *_, count in self.groups]
+        self.day_counts = [[0] * self.days for _ in self.groups]
+        self.placed = [[] for _ in self.groups]
+        self.tiebreak = [self.rng.random() for _ in self.groups]
+        self.by_class, self.by_teacher = {}, {}
+        self.class_left, self.teacher_left = {}, {}
+        for group, (class_id, teacher_id, _, count) in enumerate(self.groups):
+            self.by_class.setdefault(class_id, []).append(group)
+            self.by_teacher.setdefault(teacher_id, []).append(group)
+            self.class_left[class_id] = self.class_left.get(class_id, 0) + count
+            self.teacher_left[teacher_id] = self.teacher_left.get(teacher_id, 0) + count
+        self.open = {group for group, count in enumerate(self.remaining) if count}
+        self.lesson_at = {class_id: {} for class_id in self.by_class}
+        self.backtracks = 0
+
+    def domain(self, group):
+        class_id, teacher_id = self.groups[group][:2]
+        return self.full & ~(self.class_busy[class_id] | self.teacher_busy[teacher_id] | self.room_full)
+
+    def place(self, group, slot):
+        class_id, teacher_id = self.groups[group][:2]
+        self.class_busy[class_id] |= 1 << slot
+        self.teacher_busy[teacher_id] |= 1 << slot
+        self.class_left[class_id] -= 1
+        self.teacher_left[teacher_id] -= 1
+        if self.capacity is not None:
+            self.capacity[slot] -= 1
+            if not self.capacity[slot]:
+                self.room_full |= 1 << slot
+        self.remaining[group] -= 1
+        if not self.remaining[group]:
+            self.open.discard(group)
+        self.day_counts[group][slot // self.per_day] += 1
+        self.placed[group].append(slot)
+        self.lesson_at[class_id][slot] = group
+
+    def unplace(self, group, slot):
+        class_id, teacher_id = self.groups[group][:2]
+        self.class_busy[class_id] &= ~(1 << slot)
+        self.teacher_busy[teacher_id] &= ~(1 << slot)
+        self.class_left[class_id] += 1
+        self.teacher_left[teacher_id] += 1
+        if self.capacity is not None:
+            self.capacity[slot] += 1
+            self.room_full &= ~(1 << slot)
+        self.remaining[group] += 1
+        self.open.add(group)
+        self.day_counts[group][slot // self.per_day] -= 1
+        self.placed[group].remove(slot)
+        del self.lesson_at[class_id][slot]
+
+    def select(self):
+        """(group, free slots, slack) of the most constrained open group, or None when all are placed"""
+        best = None
+        for group in self.open:
+            domain = self.domain(group)
+            key = (domain.bit_count() - self.remaining[group], self.tiebreak[group])
+            if best is None or key < best[0]:
+                best = (key, group, domain)
+        if best is None:
+            return None
+        return best[1], best[2], best[0][0]
+
+    def candidates(self, group, domain):
+        class_id, teacher_id = self.groups[group][:2]
+        counts, allowed = self.day_counts[group], self.allowed[group]
+        class_busy, teacher_busy = self.class_busy[class_id], self.teacher_busy[teacher_id]
+        scored = []
+        for slot in bits(domain):
+            day = slot // self.per_day
+            day_mask = self.day_masks[day]
+            near = ((1 << slot) << 1 | (1 << slot) >> 1) & day_mask
+            cost = 4 * max(0, counts[day] + 1 - allowed)
+            if class_busy & day_mask and not class_busy & near:
+                cost += 1
+            if teacher_busy & day_mask and not teacher_busy & near:
+                cost += 1
+            if self.capacity is not None:
+                # Least constraining first: keep rooms free in periods that are filling up
+                cost += 8 * (1 - self.capacity[slot] / self.rooms) ** 4
+            scored.append((cost + self.rng.random(), slot))
+        scored.sort()
+        return [slot for _, slot in scored]
+
+    def consistent(self, group):
+        class_id, teacher_id = self.groups[group][:2]
+        if self.class_left[class_id] > (self.full & ~(self.class_busy[class_id] | self.room_full)).bit_count():
+            return False
+        if self.teacher_left[teacher_id] > (self.full & ~(self.teacher_busy[teacher_id] | self.room_full)).bit_count():
+            return False
+        for other in self.by_class[class_id] + self.by_teacher[teacher_id]:
+            if self.remaining[other] and self.domain(other).bit_count() < self.remaining[other]:
+                return False
+        return True
+
+    def run(self, deadline, max_backtracks):
+        """Place every lesson; False if the backtrack limit or the deadline is hit first"""
+        stack = []  # [group, slots to try, next index, slot placed or None]
+        while True:
+            selected = self.select()
+            if selected is None:
+                return True
+            group, domain, slack = selected
+            stack.append([group, self.candidates(group, domain) if slack >= 0 else [], 0, None])
+            while True:
+                frame = stack[-1]
+                if frame[3] is not None:
+                    self.unplace(frame[0], frame[3])
+                    frame[3] = None
+                if frame[2] < len(frame[1]):
+                    slot = frame[1][frame[2]]
+                    frame[2] += 1
+                    self.place(frame[0], slot)
+                    frame[3] = slot
+                    if self.consistent(frame[0]):
+                        break
+                else:
+                    stack.pop()
+                    self.backtracks += 1
+                    if not stack or self.backtracks > max_backtracks or time.monotonic() > deadline:
+                        return False
+
+    def day_gaps(self, busy, day):
+        busy &= self.day_masks[day]
+        if not busy:
+            return 0
+        return busy.bit_length() - (busy & -busy).bit_length() + 1 - busy.bit_count()
+
+    def local_penalty(self, class_id, groups, days):
+        """The part of the penalty a move between these groups and days can change"""
+        teachers = {self.groups[group][1] for group in groups}
+        total = sum(self.day_gaps(self.class_busy[class_id], day) for day in days)
+        total += sum(self.day_gaps(self.teacher_busy[teacher_id], day) for teacher_id in teachers for day in days)
+        repeats = sum(max(0, self.day_counts[group][day] - self.allowed[group]) for group in groups for day in days)
+        return total + PENALTY_WEIGHTS['repeats'] * repeats
+
+    def improve(self, deadline, attempts):
+        """Hill-climb a complete timetable, keeping moves that do not make the penalty worse
+
+        A move swaps two lessons of one class, which leaves every period's room
+        count as it was, or moves a lesson to a period the class has free.
+        """
+        class_ids = list(self.by_class)
+        for attempt in range(attempts):
+            if not attempt % 256 and time.monotonic() > deadline:
+                return
+            class_id = self.rng.choice(class_ids)
+            lessons = self.lesson_at[class_id]
+            first = self.rng.choice(list(lessons))
+            second = self.rng.randrange(self.days * self.per_day)
+            if first == second:
+                continue
+            group, other = lessons[first], lessons.get(second)
+            if other is None:
+                # A move into a free period needs the class, the teacher and a room free there
+                teacher_id = self.groups[group][1]
+                if (self.class_busy[class_id] | self.teacher_busy[teacher_id] | self.room_full) >> second & 1:
+                    continue
+            elif other == group:
+                continue
+
+            groups = (group,) if other is None else (group, other)
+            days = {first // self.per_day, second // self.per_day}
+            before = self.local_penalty(class_id, groups, days)
+            self.unplace(group, first)
+            if other is not None:
+                self.unplace(other, second)
+            if self.teacher_busy[self.groups[group][1]] >> second & 1 or (
+                    other is not None and self.teacher_busy[self.groups[other][1]] >> first & 1):
+                allowed = False
+            else:
+                self.place(group, second)
+                if other is not None:
+                    self.place(other, first)
+                allowed = self.local_penalty(class_id, groups, days) <= before
+                if not allowed:
+                    self.unplace(group, second)
+                    if other is not None:
+                        self.unplace(other, first)
+            if not allowed:
+                self.place(group, first)
+                if other is not None:
+                    self.place(other, second)
+
+    def penalties(self):
+        """Soft constraint violations: repeated subjects in a day and gaps in teachers' and classes' days"""
+        repeats = sum(max(0, count - allowed) for counts, allowed in zip(self.day_counts, self.allowed) for count in counts)
+
+        def gaps(busy_masks):
+            total = 0
+            for busy in busy_masks:
+                for day_mask in self.day_masks:
+                    day = busy & day_mask
+                    if day:
+                        first = (day & -day).bit_length()
+                        total += day.bit_length() - first + 1 - day.bit_count()
+            return total
+
+        return {'repeats': repeats, 'teacher_gaps': gaps(self.teacher_busy.values()),
+                'class_gaps': gaps(self.class_busy.values())}
+
+    def result(self, complete):
+        lessons = sum(count for *_, count in self.groups)
+        placed = sum(len(slots) for slots in self.placed)
+        penalties = self.penalties()
+        weighted = sum(PENALTY_WEIGHTS[name] * count for name, count in penalties.items())
+        score = round(100 * max(0.0, 1 - weighted / max(lessons, 1)), 1) if complete else 0.0
+        return {'complete': complete, 'placed': placed, 'lessons': lessons, 'score': score, 'penalties': penalties,
+                'placements': [(group, slot) for group, slots in enumerate(self.placed) for slot in slots],
+                'backtracks': self.backtracks}
+
+def result_rank(result):
+    return (result['complete'], result['placed'], result['score'])
+
+def search_timetable(problem, seed, seed_step=1, seconds=60, target_score=100.0, max_backtracks=None,
+                     improve_attempts=None):
+    """Restart TimetableSearch with seeds seed, seed + seed_step, ... until seconds pass; return the best result
+
+    Each complete timetable short of target_score is hill-climbed before the
+    next restart, and the search stops early once one reaches target_score.
+    Run one call per process with seed_step set to the number of processes to
+    search in parallel without repeating a seed.
+    """
+    deadline = time.monotonic() + seconds
+    if max_backtracks is None:
+        max_backtracks = max(200, len(problem['lessons']))
+    if improve_attempts is None:
+        improve_attempts = 50 * sum(count for *_, count in problem['lessons'])
+    best = None
+    restarts = 0
+    while True:
+        search = TimetableSearch(problem, seed)
+        complete = search.run(deadline, max_backtracks)
+        result = search.result(complete)
+        if complete and result['score'] < target_score:
+            search.improve(deadline, improve_attempts)
+            result = search.result(complete)
+        result['seed'] = seed
+        restarts += 1
+        if best is None or result_rank(result) > result_rank(best):
+            best = result
+        if (best['complete'] and best['score'] >= target_score) or time.monotonic() >= deadline:
+            best['restarts'] = restarts
+            return best
+        seed += seed_step
+
+def generated_slots(problem, result, days, periods, rooms=(), fixed=()):
+    """Slot dicts for a search result, with rooms given out per period
+
+    A class keeps the same room through the week where it can: each class has
+    a preferred room and only moves when that room is taken in a period.
+    """
+    room_busy = busy_masks(fixed, days, periods)[2]
+    class_ids = sorted({class_id for class_id, *_ in problem['lessons']})
+    preferred = {class_id: rooms[i % len(rooms)] for i, class_id in enumerate(class_ids)} if rooms else {}
+    taken = {}
+    slots = []
+    for group, slot in sorted(result['placements'], key=lambda placement: (placement[1], placement[0])):
+        class_id, teacher_id, subject_id, _ = problem['lessons'][group]
+        room = None
+        if rooms:
+            used = taken.setdefault(slot, set())
+            free = [room for room in rooms if room not in used and not room_busy.get(room, 0) >> slot & 1]
+            room = preferred[class_id] if preferred[class_id] in free else free[0]
+            used.add(room)
+        day, period = divmod(slot, len(periods))
+        slots.append({'class_id': class_id, 'subject_id': subject_id, 'teacher_id': teacher_id,
+                      'day_of_week': days[day], 'start_time': periods[period][0], 'end_time': periods[period][1],
+                      'room_number': room})
+    return slots